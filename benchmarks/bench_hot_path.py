@@ -0,0 +1,222 @@
+"""Микробенчмарки функций, через которые проходит каждый пост.
+
+Запуск из корня репозитория (сеть не нужна):
+
+    python -m benchmarks.bench_hot_path --output bench_hot_path.json
+    python -m benchmarks.compare old.json new.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+
+from benchmarks.harness import ROOT_DIR, bench, write_report
+
+SUITE = "hot_path"
+
+
+def make_channels(count: int) -> dict:
+    """Генерирует реестр каналов в формате channels.json"""
+    rnd = random.Random(count)
+    channels = {}
+    for i in range(count):
+        channels[f"@channel_{i}"] = {
+            "timezone": rnd.choice([0, 3.0, 5.0, -2.5]),
+            "subscribers": rnd.randint(100, 500_000),
+            "title": f"Тестовый канал №{i}",
+            "posts": [],
+            "chat_id": -1001000000000 - i,
+            "admins": [rnd.randint(10_000, 10_000_000) for _ in range(rnd.randint(1, 3))]
+        }
+    return channels
+
+
+def make_metrics_batch(count: int) -> list:
+    """Генерирует пачку данных для analyze_metrics_with_gpt"""
+    rnd = random.Random(count)
+    batch = []
+    for i in range(count):
+        subscribers = rnd.randint(100, 500_000)
+        views = rnd.randint(0, subscribers)
+        batch.append({
+            "channel_info": {"name": f"Канал {i}", "subscribers": subscribers},
+            "metrics": {
+                "views": views,
+                "reactions": rnd.randint(0, max(1, views // 10)),
+                "forwards": rnd.randint(0, max(1, views // 20)),
+            }
+        })
+    return batch
+
+
+def make_spelling_payload(errors: int) -> dict:
+    """Ответ GPT в формате, который ожидает check_spelling"""
+    return {
+        "has_errors": errors > 0,
+        "categories": {
+            "spelling": errors > 0,
+            "grammar": errors > 0,
+            "readability": {"score": 5, "level": "средний"}
+        },
+        "details": {
+            "spelling_details": [f"«слво{i}» → «слово{i}»" for i in range(errors)],
+            "grammar_details": [f"Неверное согласование в предложении {i}" for i in range(errors)],
+            "readability_details": "Длинные предложения затрудняют чтение."
+        },
+        "improvements": {
+            "corrections": [f"Исправить «слво{i}» на «слово{i}»" for i in range(errors)],
+            "structure": ["Разбить текст на абзацы", "Добавить заголовок"],
+            "readability": ["Сократить предложения"],
+            "engagement": ["Добавить вопрос к аудитории"]
+        },
+        "moderation_decision": "/false_no"
+    }
+
+
+def bench_channel_lookup(results: list) -> None:
+    from utils.database import find_channel_by_chat_id
+
+    for count in (10, 1_000, 100_000):
+        channels = make_channels(count)
+        last_chat_id = str(-1001000000000 - (count - 1))
+        results.append(bench(
+            "find_channel_by_chat_id", lambda: find_channel_by_chat_id(channels, last_chat_id),
+            params={"channels": count, "case": "last"}
+        ))
+        results.append(bench(
+            "find_channel_by_chat_id", lambda: find_channel_by_chat_id(channels, "-1"),
+            params={"channels": count, "case": "miss"}
+        ))
+
+
+def bench_analyze_metrics(results: list) -> None:
+    from utils.checks import analyze_metrics_with_gpt
+
+    loop = asyncio.new_event_loop()
+    try:
+        for count in (1_000, 10_000):
+            batch = make_metrics_batch(count)
+
+            async def run_batch():
+                for metrics_data in batch:
+                    await analyze_metrics_with_gpt(metrics_data, "test-key")
+
+            results.append(bench(
+                "analyze_metrics_with_gpt", lambda: loop.run_until_complete(run_batch()),
+                params={"batch": count}, repeat=3, items=count
+            ))
+    finally:
+        loop.close()
+
+
+def bench_json_store(results: list, workdir: str) -> None:
+    from utils.database import load_json, save_json
+
+    for count in (10, 100, 1_000):
+        channels = make_channels(count)
+        path = os.path.join(workdir, f"channels_{count}.json")
+        save_json(path, channels)
+        results.append(bench(
+            "save_json", lambda: save_json(path, channels),
+            params={"channels": count, "bytes": os.path.getsize(path)}, items=count
+        ))
+        results.append(bench(
+            "load_json", lambda: load_json(path),
+            params={"channels": count, "bytes": os.path.getsize(path)}, items=count
+        ))
+
+
+def bench_spelling_response(results: list) -> None:
+    from utils.checks import parse_spelling_response
+
+    for errors in (0, 10):
+        raw = json.dumps(make_spelling_payload(errors), ensure_ascii=False, indent=4)
+        fenced = f"```json\n{raw}\n```"
+        results.append(bench(
+            "parse_spelling_response", lambda: parse_spelling_response(raw),
+            params={"errors": errors, "fenced": False}
+        ))
+        results.append(bench(
+            "parse_spelling_response", lambda: parse_spelling_response(fenced),
+            params={"errors": errors, "fenced": True}
+        ))
+
+
+def bench_spelling_report(results: list) -> None:
+    from utils.notifications import build_spelling_report
+
+    post_text = "Пример текста поста с ошибками. " * 50
+    for errors in (1, 10, 50):
+        payload = make_spelling_payload(errors)
+        results.append(bench(
+            "build_spelling_report",
+            lambda: build_spelling_report("Тестовый канал", "-1001000000001", 42, post_text, payload),
+            params={"errors": errors}
+        ))
+
+
+def bench_logger(results: list) -> None:
+    from utils.logging import setup_logger
+
+    root = logging.getLogger()
+    saved_handlers = root.handlers[:]
+    root.handlers.clear()
+    devnull = open(os.devnull, "w", encoding='utf-8')
+    try:
+        # Консольный вывод отправляем в /dev/null, чтобы не мешать отчету
+        with contextlib.redirect_stdout(devnull):
+            logger = setup_logger()
+
+        channel_id, count = "@channel_1", 12345
+        results.append(bench(
+            "logger.info", lambda: logger.info(f"Обновлено количество подписчиков для {channel_id}: {count}"),
+            params={"handlers": len(logger.handlers)}
+        ))
+        results.append(bench(
+            "logger.debug", lambda: logger.debug(f"Отладка {channel_id}: {count}"),
+            params={"handlers": len(logger.handlers)}
+        ))
+    finally:
+        for handler in root.handlers:
+            handler.close()
+        root.handlers[:] = saved_handlers
+        devnull.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Микробенчмарки горячего пути бота")
+    parser.add_argument("--output", "-o", help="путь к JSON-файлу с результатами")
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output) if args.output else None
+    sys.path.insert(0, ROOT_DIR)
+
+    # Логи и временные файлы пишем во временный каталог, а не в рабочий
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        logging.disable(logging.CRITICAL)
+        try:
+            results = []
+            bench_channel_lookup(results)
+            bench_analyze_metrics(results)
+            bench_json_store(results, workdir)
+            bench_spelling_response(results)
+            bench_spelling_report(results)
+            logging.disable(logging.NOTSET)
+            bench_logger(results)
+        finally:
+            logging.disable(logging.NOTSET)
+            os.chdir(cwd)
+
+    write_report(SUITE, results, output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""Память на один отслеживаемый пост (tracemalloc).
+
+    python -m benchmarks.bench_memory --posts 20000 --channels 100 --output bench_memory.json
+
+Для каждого поста бот держит отложенную проверку метрик (сутки), запись
+метрик из обновлений и пост на раннем прогнозе. Бенчмарк заполняет эти
+структуры так же, как process_channel_post, и делит прирост памяти по
+tracemalloc на число постов. Для сравнения замеряется прежняя схема -
+спящая сутки корутина со словарем задачи на каждый пост.
+"""
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+from benchmarks.harness import ROOT_DIR, bench, write_report
+
+SUITE = "memory"
+
+CURVES_PATH = "growth_curves.bench.json"
+
+
+def chat_id_for(index: int, channels: int) -> str:
+    # Как в обработчике: у каждого поста своя строка str(message.chat.id)
+    return str(-1001000000000 - index % channels)
+
+
+def measure(fill) -> float:
+    """Прирост памяти (байт) после fill(); объекты должны оставаться живыми до возврата"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    keep = fill()
+    gc.collect()
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del keep
+    return allocated
+
+
+def legacy_pending(posts: int, channels: int) -> float:
+    """Прежняя схема: задача asyncio с корутиной, спящей до проверки, и словарь задачи в реестре"""
+    pending = {}
+
+    async def check_post_metrics_later(pool, bot, chat_id, message_id, channel_title, subscribers, admins,
+                                       super_admin_id, message_ids=None, due_at=None, text_checked=False,
+                                       posted_at=None):
+        message_ids = message_ids or [message_id]
+        job = pending[(str(chat_id), message_id)] = {
+            "chat_id": chat_id, "message_id": message_id, "channel_title": channel_title,
+            "subscribers": subscribers, "admins": admins, "message_ids": message_ids,
+            "due_at": due_at or time.time() + 86400, "text_checked": text_checked, "posted_at": posted_at,
+        }
+        try:
+            await asyncio.sleep(max(0.0, job["due_at"] - time.time()))
+        finally:
+            pending.pop((str(chat_id), message_id), None)
+
+    async def run() -> float:
+        tasks = []
+        admins = [1, 2]
+
+        def fill():
+            for message_id in range(posts):
+                tasks.append(asyncio.create_task(check_post_metrics_later(
+                    None, None, chat_id_for(message_id, channels), message_id + 1000, "Канал", 5000, admins, 1,
+                    message_ids=[message_id + 1000], posted_at=time.time()
+                )))
+            return tasks
+
+        # Задачи должны успеть дойти до sleep, поэтому замер - внутри loop
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        fill()
+        await asyncio.sleep(0)
+        gc.collect()
+        allocated = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return allocated
+
+    return asyncio.run(run())
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк памяти на отслеживаемый пост")
+    parser.add_argument("--posts", type=int, default=20000)
+    parser.add_argument("--channels", type=int, default=100)
+    parser.add_argument("--output", "-o", help="путь к JSON-файлу с результатами")
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output) if args.output else None
+    sys.path.insert(0, ROOT_DIR)
+    from utils.forecast import EarlyForecaster, GrowthCurves
+    from utils.live_metrics import LiveMetrics
+    from utils.records import MetricJob, MetricJobQueue
+
+    posts, channels = args.posts, args.channels
+    now = time.time()
+
+    def fill_jobs():
+        queue = MetricJobQueue()
+        for message_id in range(posts):
+            queue.push(MetricJob(chat_id_for(message_id, channels), message_id + 1000, 5000, now + 86400,
+                                 [message_id + 1000], now))
+        return queue
+
+    def fill_live():
+        live = LiveMetrics()
+        for message_id in range(posts):
+            live.watch(chat_id_for(message_id, channels), [message_id + 1000], now)
+        return live
+
+    def fill_forecast():
+        forecaster = EarlyForecaster(GrowthCurves(CURVES_PATH), [1800])
+        for message_id in range(posts):
+            forecaster.track(chat_id_for(message_id, channels), [message_id + 1000], now, 5000)
+        return forecaster
+
+    sizes = {
+        "legacy_pending_task": legacy_pending(posts, channels),
+        "MetricJobQueue": measure(fill_jobs),
+        "LiveMetrics.watch": measure(fill_live),
+        "EarlyForecaster.track": measure(fill_forecast),
+    }
+    print(f"Постов: {posts:,}, каналов: {channels}")
+    for name, size in sizes.items():
+        print(f"{name:<28} {size / posts:>8.0f} байт/пост")
+    tracked = sizes["MetricJobQueue"] + sizes["LiveMetrics.watch"] + sizes["EarlyForecaster.track"]
+    print(f"{'итого на пост':<28} {tracked / posts:>8.0f} байт/пост")
+    print(f"Отложенная проверка: в {sizes['legacy_pending_task'] / sizes['MetricJobQueue']:.1f} раза меньше прежней")
+
+    params = {"posts": posts, "channels": channels}
+    results = [
+        bench("MetricJobQueue.push+pop_due", lambda: fill_jobs().pop_due(now + 86400),
+              params=params, repeat=3, items=posts),
+    ]
+    for result in results:
+        result["bytes_per_post"] = {name: size / posts for name, size in sizes.items()}
+    write_report(SUITE, results, output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""Поиск похожих постов (utils/near_duplicates.py).
+
+    python -m benchmarks.bench_near_duplicates --posts 5000 --output bench_near_duplicates.json
+
+Заполняет индекс случайными постами, затем ищет слегка переписанные копии
+части из них (два замененных слова и новое предложение) и посты, которых
+в индексе нет. Печатает долю найденных копий, долю ложных совпадений и
+сколько предложений ушло бы в GPT при проверке копий; замеряет подпись
+и поиск.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+
+from benchmarks.harness import ROOT_DIR, bench, write_report
+
+SUITE = "near_duplicates"
+
+WORDS = (
+    "канал новости рынок цена рост падение компания проект запуск команда пользователь сервис "
+    "сегодня завтра неделя месяц город страна эксперт мнение данные отчет результат событие "
+    "решение вопрос ответ причина итог план задача работа время система модель продукт"
+).split()
+
+
+def make_post(rnd: random.Random, sentences: int = 8) -> str:
+    return " ".join(
+        " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(8, 14))).capitalize() + "."
+        for _ in range(sentences)
+    )
+
+
+def rewrite(rnd: random.Random, text: str) -> str:
+    """Копия поста для другого канала: в одном предложении заменены два слова, в конце добавлено свое"""
+    sentences = text.split(". ")
+    index = rnd.randrange(len(sentences))
+    words = sentences[index].split(" ")
+    for position in rnd.sample(range(1, len(words) - 1), 2):
+        words[position] = rnd.choice(WORDS)
+    sentences[index] = " ".join(words)
+    return ". ".join(sentences) + " " + make_post(rnd, 1)
+
+
+def empty_result() -> dict:
+    return {
+        "decision": "/true_yes",
+        "categories": {"spelling": False, "grammar": False, "readability": {"score": 8, "level": "легкий"}},
+        "details": {"spelling_details": [], "grammar_details": [], "readability_details": ""},
+        "improvements": {"corrections": [], "structure": [], "readability": [], "engagement": []},
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк поиска похожих постов")
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--copies", type=int, default=500)
+    parser.add_argument("--output", "-o", help="путь к JSON-файлу с результатами")
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output) if args.output else None
+    sys.path.insert(0, ROOT_DIR)
+    from utils.chunking import split_sentences
+    from utils.near_duplicates import NearDuplicateIndex, minhash_signature
+
+    rnd = random.Random(args.posts)
+    index = NearDuplicateIndex(max_posts=args.posts)
+    originals = [make_post(rnd) for _ in range(args.posts)]
+
+    async def check(text: str) -> dict:
+        return empty_result()
+
+    async def fill() -> None:
+        for text in originals:
+            await index.check(text, check)
+
+    asyncio.run(fill())
+    print(f"Постов в индексе: {len(index):,}")
+
+    copies = [rewrite(rnd, text) for text in rnd.sample(originals, args.copies)]
+    unrelated = [make_post(rnd) for _ in range(args.copies)]
+    copy_signatures = [minhash_signature(text) for text in copies]
+    unrelated_signatures = [minhash_signature(text) for text in unrelated]
+    found = sum(index.find(signature) is not None for signature in copy_signatures)
+    false_matches = sum(index.find(signature) is not None for signature in unrelated_signatures)
+    print(f"Найдено копий: {found} из {args.copies}, ложных совпадений: {false_matches} из {args.copies}")
+
+    async def check_copies() -> int:
+        sent = 0
+        for text in copies:
+            _, sentences = await index.check(text, check)
+            sent += sentences
+        return sent
+
+    total = sum(len(split_sentences(text)) for text in copies)
+    sent = asyncio.run(check_copies())
+    print(f"Предложений копий отправлено в GPT: {sent} из {total} ({sent / total:.0%})")
+
+    params = {"posts": args.posts}
+    results = [
+        bench("minhash_signature", lambda: [minhash_signature(text) for text in copies],
+              params=params, repeat=3, items=len(copies)),
+        bench("NearDuplicateIndex.find", lambda: [index.find(signature) for signature in copy_signatures],
+              params=params, repeat=3, items=len(copies)),
+        bench("NearDuplicateIndex.find.miss", lambda: [index.find(signature) for signature in unrelated_signatures],
+              params=params, repeat=3, items=len(unrelated)),
+    ]
+    for result in results:
+        result["recall"] = found / args.copies
+        result["false_positive_rate"] = false_matches / args.copies
+        result["sentences_sent"] = sent / total
+    write_report(SUITE, results, output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
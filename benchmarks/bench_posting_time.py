@@ -0,0 +1,86 @@
+"""Скорость отчета о лучшем времени для постов (utils/posting_time.py).
+
+    python -m benchmarks.bench_posting_time --channels 300 --days 1095 --posts-per-day 4
+
+Заполняет журнал метрик постами каналов с разными часовыми поясами; у
+каждого канала посты в «хороший» местный час набирают больше просмотров.
+Замеряет группировку по всем каналам и проверяет, что отчет находит
+этот час.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import ROOT_DIR, bench, write_report
+
+SUITE = "posting_time"
+
+START_TS = 1_700_000_000
+
+
+def fill_store(path: str, channels: int, days: int, posts_per_day: int) -> dict:
+    """Пишет посты в журнал; возвращает chat_id -> (часовой пояс, хороший час)"""
+    from utils.metrics_store import MetricsStore
+
+    rnd = random.Random(channels)
+    store = MetricsStore(path)
+    plan = {}
+    for index in range(channels):
+        chat_id = str(-1001000000000 - index)
+        timezone, good_hour = rnd.choice([-5, 0, 3, 5, 5.5, 9]), rnd.randint(8, 22)
+        plan[chat_id] = (timezone, good_hour)
+        rows = []
+        for message_id in range(days * posts_per_day):
+            ts = START_TS + rnd.uniform(0, days * 86400)
+            local_hour = int((ts + timezone * 3600) % 86400 // 3600)
+            views = int(rnd.gauss(1000, 150) * (1.5 if local_hour == good_hour else 1))
+            rows.append((message_id, ts, {"views": max(views, 0), "reactions": rnd.randint(0, 40),
+                                          "forwards": rnd.randint(0, 10)}, False))
+        store.record_posts(chat_id, rows)
+    store.close()
+    return plan
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк отчета о лучшем времени для постов")
+    parser.add_argument("--channels", type=int, default=300)
+    parser.add_argument("--days", type=int, default=1095)
+    parser.add_argument("--posts-per-day", type=int, default=4)
+    parser.add_argument("--output", "-o", help="путь к JSON-файлу с результатами")
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output) if args.output else None
+    sys.path.insert(0, ROOT_DIR)
+    from utils.posting_time import PostingTimeReport, engagement_by_local_time
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "metrics.db")
+        started = time.perf_counter()
+        plan = fill_store(path, args.channels, args.days, args.posts_per_day)
+        posts = args.channels * args.days * args.posts_per_day
+        print(f"Каналов: {args.channels}, постов: {posts:,}, журнал заполнен за {time.perf_counter() - started:.1f} с")
+
+        offsets = {chat_id: timezone for chat_id, (timezone, _) in plan.items()}
+        stats = engagement_by_local_time(path, offsets)
+        found = sum(
+            PostingTimeReport(stats[chat_id]).best_hours(1)[0][0] == good_hour
+            for chat_id, (_, good_hour) in plan.items()
+        )
+        print(f"Хороший час найден у {found} из {args.channels} каналов")
+
+        params = {"channels": args.channels, "posts": posts}
+        results = [
+            bench("engagement_by_local_time", lambda: engagement_by_local_time(path, offsets),
+                  params=params, repeat=3, items=posts),
+            bench("PostingTimeReport", lambda: [PostingTimeReport(cells).best_cells() for cells in stats.values()],
+                  params=params, repeat=3, items=args.channels),
+        ]
+    write_report(SUITE, results, output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""Стоимость маршрутизации одного сообщения: цепочка lambda-фильтров против TextRouter.
+
+    python -m benchmarks.bench_router --output bench_router.json
+
+Замеряется как сам поиск обработчика, так и полный проход update через
+Dispatcher aiogram с пустыми обработчиками (сеть не используется).
+"""
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime
+
+from benchmarks.harness import ROOT_DIR, bench, write_report
+
+SUITE = "router"
+
+BUTTONS = [
+    "📋 Мои каналы", "➕ Добавить канал", "🕒 Изменить часовой пояс",
+    "📊 Статистика", "◀️ Назад", "❓ Помощь", "🗑 Удалить канал",
+]
+
+# Тексты сообщений: первая кнопка, последняя кнопка, префиксы и промах
+SAMPLES = {
+    "exact_first": "📋 Мои каналы",
+    "exact_last": "🗑 Удалить канал",
+    "prefix_first": "📌 Тестовый канал №1",
+    "prefix_last": "❌ @channel_1",
+    "miss": "просто текст сообщения",
+}
+
+
+async def noop(message, *args, **kwargs):
+    pass
+
+
+def legacy_filters():
+    """Фильтры в том порядке, в каком они были объявлены через @dp.message(lambda ...)"""
+    waiting_for_timezone = False
+    return [
+        lambda message: message.text == "📋 Мои каналы",
+        lambda message: message.text.startswith("📌 "),
+        lambda message: message.text == "➕ Добавить канал",
+        lambda message: message.text == "🕒 Изменить часовой пояс",
+        lambda message: waiting_for_timezone and message.text not in ["◀️ Назад", "◀️ Назад к настройкам"],
+        lambda message: message.text == "📊 Статистика",
+        lambda message: message.text == "◀️ Назад",
+        lambda message: message.text == "❓ Помощь",
+        lambda message: message.text == "🗑 Удалить канал",
+        lambda message: message.text.startswith("❌ "),
+    ]
+
+
+def build_text_router():
+    from utils.router import TextRouter
+
+    router = TextRouter()
+    for text in BUTTONS:
+        router.exact(text)(noop)
+    router.prefix("📌 ")(noop)
+    router.prefix("❌ ")(noop)
+    return router
+
+
+def make_update(update_id: int, text):
+    from aiogram import types
+
+    message = {
+        "message_id": update_id,
+        "date": int(datetime.now().timestamp()),
+        "chat": {"id": 1000, "type": "private"},
+        "from": {"id": 1000, "is_bot": False, "first_name": "Admin"},
+    }
+    if text is None:
+        message["photo"] = [{"file_id": "x", "file_unique_id": "x", "width": 1, "height": 1}]
+    else:
+        message["text"] = text
+    return types.Update(update_id=update_id, message=message)
+
+
+def bench_resolve(results: list) -> None:
+    router = build_text_router()
+    filters = legacy_filters()
+
+    class Message:
+        def __init__(self, text):
+            self.text = text
+
+    def legacy_resolve(message):
+        for check in filters:
+            if check(message):
+                return check
+        return None
+
+    for case, text in SAMPLES.items():
+        message = Message(text)
+        results.append(bench("resolve", lambda: legacy_resolve(message), params={"router": "lambda_chain", "case": case}))
+        results.append(bench("resolve", lambda: router.resolve(text), params={"router": "text_router", "case": case}))
+
+
+def bench_dispatch(results: list) -> None:
+    from aiogram import Bot, Dispatcher
+    from utils.router import TextRouteFilter
+
+    bot = Bot(token="123456:bench-token")
+
+    legacy = Dispatcher()
+    for check in legacy_filters():
+        legacy.message.register(noop, check)
+
+    routed = Dispatcher()
+    routed.message.register(noop, TextRouteFilter(build_text_router()))
+
+    loop = asyncio.new_event_loop()
+    try:
+        cases = dict(SAMPLES, no_text=None)
+        for case, text in cases.items():
+            update = make_update(1, text)
+            if text is not None:
+                # Старые фильтры падают на сообщениях без текста, поэтому этот случай не замеряется
+                results.append(bench(
+                    "dispatch", lambda: loop.run_until_complete(legacy.feed_update(bot, update)),
+                    params={"router": "lambda_chain", "case": case}
+                ))
+            results.append(bench(
+                "dispatch", lambda: loop.run_until_complete(routed.feed_update(bot, update)),
+                params={"router": "text_router", "case": case}
+            ))
+    finally:
+        loop.run_until_complete(bot.session.close())
+        loop.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк маршрутизации кнопок")
+    parser.add_argument("--output", "-o", help="путь к JSON-файлу с результатами")
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output) if args.output else None
+    sys.path.insert(0, ROOT_DIR)
+
+    results = []
+    bench_resolve(results)
+    bench_dispatch(results)
+    write_report(SUITE, results, output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
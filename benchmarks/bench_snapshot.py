@@ -0,0 +1,106 @@
+"""Размер и скорость снимка состояния для теплого перезапуска (utils/snapshot.py).
+
+    python -m benchmarks.bench_snapshot --posts 5000 --jobs 10000 --output bench_snapshot.json
+
+Заполняет кэш проверок текста, ранний прогноз, метрики из обновлений и
+реестр отложенных проверок так, как они выглядят у бота под нагрузкой,
+и замеряет сохранение снимка и восстановление из него.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import ROOT_DIR, bench, write_report
+
+SUITE = "snapshot"
+
+# Кривые роста в бенчмарке не обучаются, файл не создается
+CURVES_PATH = "growth_curves.bench.json"
+
+WORDS = "канал пост новости сегодня рынок обзор команда запуск итоги неделя прогноз".split()
+
+
+def make_result(rnd: random.Random) -> dict:
+    from utils.checks import apply_moderation_decision
+
+    return apply_moderation_decision({
+        "categories": {"spelling": True, "grammar": False, "readability": {"score": rnd.randint(5, 10)}},
+        "details": {"spelling_details": [f"'{rnd.choice(WORDS)}ы' -> '{rnd.choice(WORDS)}'"],
+                    "grammar_details": [], "readability_details": ""},
+        "improvements": {"corrections": [], "style": "", "structure": ""},
+    })
+
+
+def make_state(posts: int, jobs: int) -> dict:
+    from utils.forecast import EarlyForecaster, GrowthCurves
+    from utils.live_metrics import LiveMetrics
+    from utils.post_checks import PostCheckCache
+    from utils.records import MetricJob, MetricJobQueue
+
+    rnd = random.Random(posts)
+    now = time.time()
+    cache, live = PostCheckCache(max_posts=posts), LiveMetrics()
+    forecaster = EarlyForecaster(GrowthCurves(CURVES_PATH), [1800])
+    for message_id in range(posts):
+        chat_id = -1001000000000 - message_id % 100
+        text = "\n".join(" ".join(rnd.choices(WORDS, k=12)) for _ in range(rnd.randint(2, 6)))
+        cache.remember(chat_id, {message_id: text}, make_result(rnd))
+        forecaster.track(chat_id, [message_id], now - rnd.randint(0, 86400), rnd.randint(1000, 100000))
+        live.watch(chat_id, [message_id], now)
+        live.observe(chat_id, message_id, {"views": rnd.randint(0, 10000), "reactions": 5, "forwards": 1}, now)
+
+    queue = MetricJobQueue()
+    for i in range(jobs):
+        queue.push(MetricJob(-1001000000000 - i % 100, i, 5000, now + rnd.randint(0, 86400), [i], now, True))
+    return {
+        "saved_at": now,
+        "pending_metric_checks": queue.dump_state(),
+        "post_checks": cache.dump_state(),
+        "forecast": forecaster.dump_state(),
+        "live_metrics": live.dump_state(),
+    }
+
+
+def restore(state: dict) -> None:
+    from utils.forecast import EarlyForecaster, GrowthCurves
+    from utils.live_metrics import LiveMetrics
+    from utils.post_checks import PostCheckCache
+    from utils.records import MetricJobQueue
+
+    MetricJobQueue().load_state(state["pending_metric_checks"])
+    PostCheckCache(max_posts=len(state["post_checks"])).load_state(state["post_checks"])
+    EarlyForecaster(GrowthCurves(CURVES_PATH), [1800]).load_state(state["forecast"])
+    LiveMetrics().load_state(state["live_metrics"])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк снимка состояния для теплого перезапуска")
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--jobs", type=int, default=10000)
+    parser.add_argument("--output", "-o", help="путь к JSON-файлу с результатами")
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output) if args.output else None
+    sys.path.insert(0, ROOT_DIR)
+    from utils.snapshot import load_snapshot, save_snapshot
+
+    state = make_state(args.posts, args.jobs)
+    params = {"posts": args.posts, "jobs": args.jobs}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "state.snapshot")
+        size = save_snapshot(path, state)
+        print(f"Постов: {args.posts}, отложенных проверок: {args.jobs}, снимок: {size / 1024:.0f} КБ")
+        results = [
+            bench("save_snapshot", lambda: save_snapshot(path, state), params=params, repeat=3),
+            bench("load_snapshot", lambda: load_snapshot(path), params=params, repeat=3),
+            bench("load_snapshot+load_state", lambda: restore(load_snapshot(path)), params=params, repeat=3),
+        ]
+    write_report(SUITE, results, output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""Размер и скорость запросов истории подписчиков (utils/subscriber_history.py).
+
+    python -m benchmarks.bench_subscribers --channels 1000 --days 365 --output bench_subscribers.json
+
+Каждый канал получает ежечасные замеры за days дней со случайным
+опозданием обновления на несколько секунд; часть каналов растет, часть
+стоит на месте, часть теряет подписчиков.
+"""
+import argparse
+import os
+import random
+import sys
+
+from benchmarks.harness import ROOT_DIR, bench, write_report
+
+SUITE = "subscribers"
+
+HOUR = 3600
+
+
+def make_series(rnd: random.Random, days: int):
+    from utils.subscriber_history import SubscriberSeries
+
+    series = SubscriberSeries()
+    ts, count = 1_700_000_000, rnd.randint(100, 500_000)
+    trend = rnd.choice([0, 0, 1, 5, -1])
+    for _ in range(days * 24):
+        ts += HOUR + rnd.randint(0, 3)
+        if trend and rnd.random() < 0.5:
+            count = max(0, count + rnd.randint(-1, 2) * trend)
+        series.append(ts, count)
+    return series
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк сжатой истории подписчиков")
+    parser.add_argument("--channels", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--output", "-o", help="путь к JSON-файлу с результатами")
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output) if args.output else None
+    sys.path.insert(0, ROOT_DIR)
+
+    rnd = random.Random(args.channels)
+    all_series = [make_series(rnd, args.days) for _ in range(args.channels)]
+    samples = sum(len(series) for series in all_series)
+    encoded = sum(series.nbytes for series in all_series)
+    # Заголовок блока в SQLite: пять целых чисел и ключ канала
+    headers = sum(len(series.blocks) for series in all_series) * 48
+    print(f"Каналов: {args.channels}, замеров: {samples:,}, "
+          f"данные: {encoded / 2**20:.2f} МБ, с заголовками блоков: {(encoded + headers) / 2**20:.2f} МБ "
+          f"({encoded / samples:.2f} байт на замер)")
+
+    series = all_series[-1]
+    now = series.last[0]
+    params = {"days": args.days}
+    results = [
+        bench("SubscriberSeries.delta", lambda: series.delta(30, now), params={**params, "window": 30}),
+        bench("SubscriberSeries.value_at", lambda: series.value_at(now - 100 * 86400), params=params),
+        bench("SubscriberSeries.samples", lambda: sum(1 for _ in series.samples(now - 7 * 86400, now)),
+              params={**params, "window": 7}),
+        bench("SubscriberSeries.downsample", lambda: series.downsample(now - 30 * 86400, now, 86400),
+              params={**params, "window": 30, "step": "1d"}),
+        bench("SubscriberSeries.downsample", lambda: series.downsample(now - args.days * 86400, now, 7 * 86400),
+              params={**params, "window": args.days, "step": "7d"}),
+        bench("SubscriberSeries.append", lambda: make_series(random.Random(0), 30),
+              params={"days": 30}, repeat=3, items=30 * 24),
+    ]
+    write_report(SUITE, results, output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""Сравнение двух JSON-отчетов бенчмарков (например, до и после коммита).
+
+    python -m benchmarks.compare base.json new.json --threshold 10
+
+Код возврата 1, если хотя бы один бенчмарк замедлился больше порога.
+"""
+import argparse
+import json
+import sys
+
+from benchmarks.harness import result_key
+
+
+def load_report(path: str) -> dict:
+    with open(path, "r", encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(base: dict, new: dict, threshold: float) -> int:
+    """Печатает изменения медианы и возвращает количество регрессий"""
+    base_results = {result_key(r): r for r in base["results"]}
+    regressions = 0
+
+    print(f"База: {base['meta'].get('commit')}  Новый: {new['meta'].get('commit')}")
+    for result in new["results"]:
+        key = result_key(result)
+        old = base_results.get(key)
+        new_median = result["ns_per_op"]["median"]
+        if old is None:
+            print(f"{key:<60} {new_median / 1000:>12.2f} µs/op  (новый)")
+            continue
+
+        old_median = old["ns_per_op"]["median"]
+        change = (new_median - old_median) / old_median * 100 if old_median else 0.0
+        marker = ""
+        if change > threshold:
+            marker = "  ❌ регрессия"
+            regressions += 1
+        elif change < -threshold:
+            marker = "  ✅ ускорение"
+        print(f"{key:<60} {old_median / 1000:>12.2f} → {new_median / 1000:>12.2f} µs/op "
+              f"({change:+.1f}%){marker}")
+
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Сравнение результатов бенчмарков")
+    parser.add_argument("base", help="отчет базового коммита")
+    parser.add_argument("new", help="отчет нового коммита")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="допустимое замедление медианы, %% (по умолчанию 10)")
+    args = parser.parse_args(argv)
+
+    base, new = load_report(args.base), load_report(args.new)
+    if base.get("suite") != new.get("suite"):
+        print(f"Разные наборы бенчмарков: {base.get('suite')} и {new.get('suite')}")
+        return 2
+
+    regressions = compare(base, new, args.threshold)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
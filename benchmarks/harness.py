@@ -0,0 +1,106 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Минимальное время одного замера, по нему подбирается число итераций
+MIN_SAMPLE_TIME = 0.05
+
+
+def _calibrate(func: Callable[[], Any], min_time: float) -> int:
+    """Подбирает число вызовов, чтобы один замер длился не меньше min_time"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 10_000_000:
+            return number
+        number *= 10 if elapsed < min_time / 10 else 2
+
+
+def bench(name: str, func: Callable[[], Any], params: Optional[Dict[str, Any]] = None,
+          repeat: int = 5, number: Optional[int] = None, items: int = 1) -> Dict[str, Any]:
+    """Замеряет функцию без аргументов и возвращает результат в виде словаря.
+
+    items - сколько единиц работы выполняет один вызов (например, размер пачки),
+    чтобы можно было сравнивать стоимость в пересчете на один элемент.
+    """
+    func()  # прогрев
+    if number is None:
+        number = _calibrate(func, MIN_SAMPLE_TIME)
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter_ns() - start) / number)
+
+    return make_result(name, samples, params, number=number, items=items)
+
+
+def make_result(name: str, samples: List[float], params: Optional[Dict[str, Any]] = None,
+                number: int = 1, items: int = 1) -> Dict[str, Any]:
+    """Собирает результат из готовых замеров (нс на операцию)"""
+    median = statistics.median(samples)
+    return {
+        "name": name,
+        "params": params or {},
+        "number": number,
+        "repeat": len(samples),
+        "items": items,
+        "ns_per_op": {
+            "min": min(samples),
+            "median": median,
+            "mean": statistics.fmean(samples),
+            "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        },
+        "ns_per_item": median / items,
+    }
+
+
+def result_key(result: Dict[str, Any]) -> str:
+    """Уникальный ключ результата: имя + параметры"""
+    params = ",".join(f"{k}={v}" for k, v in sorted(result["params"].items()))
+    return f"{result['name']}[{params}]" if params else result["name"]
+
+
+def collect_meta() -> Dict[str, Any]:
+    """Собирает сведения об окружении и текущем коммите"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+    }
+
+
+def write_report(suite: str, results: List[Dict[str, Any]], output: Optional[str]) -> None:
+    """Печатает таблицу результатов и сохраняет их в JSON"""
+    for result in results:
+        stats = result["ns_per_op"]
+        print(f"{result_key(result):<60} {stats['median'] / 1000:>12.2f} µs/op "
+              f"±{stats['stdev'] / 1000:.2f}  ({result['ns_per_item']:.0f} ns/item)")
+
+    if output:
+        report = {"suite": suite, "meta": collect_meta(), "results": results}
+        with open(output, "w", encoding='utf-8') as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+        print(f"Результаты сохранены в {output}")
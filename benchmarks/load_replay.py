@@ -0,0 +1,373 @@
+"""Нагрузочный прогон: воспроизводит поток channel_post через настоящий dp из bot.py.
+
+Bot API, OpenAI и Telethon заменяются локальными заглушками (см. standins.py),
+поэтому сеть не нужна. Пример:
+
+    python -m benchmarks.load_replay --posts 500 --channels 50 --rate 5 --speed 10 \\
+        --openai-latency 0.3 --openai-error-rate 0.05 --output load.json
+
+Поток можно записать (--save-stream) и воспроизвести повторно (--stream).
+Формат потока - JSONL: {"offset": секунды от начала, "update": <Telegram Update>}.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+from benchmarks.harness import ROOT_DIR, collect_meta
+from benchmarks.standins import StandInSettings, StandInTelethonClient, serve
+
+SUITE = "load_replay"
+
+# Тексты для синтетических постов
+SAMPLE_SENTENCES = [
+    "Сегодня в городе открылась новая выставка современного искусства.",
+    "Синоптики обещают потепление до +10°С к концу недели.",
+    "Администрация сообщила о ремонте дорог в центральном районе.",
+    "Подписывайтесь на канал, чтобы не пропустить важные новости!",
+    "В субботу пройдет благотворительный забег, сбор у фонтана в 9:00.",
+]
+
+
+def generate_stream(posts: int, channels: int, rate: float, text_length: int, seed: int) -> List[dict]:
+    """Синтетический поток: пуассоновские интервалы между постами"""
+    rnd = random.Random(seed)
+    events, offset = [], 0.0
+    message_ids: Dict[int, int] = {}
+    for update_id in range(1, posts + 1):
+        chat_id = -1002000000000 - rnd.randrange(channels)
+        message_ids[chat_id] = message_ids.get(chat_id, 0) + 1
+        text = ""
+        while len(text) < text_length:
+            text += rnd.choice(SAMPLE_SENTENCES) + " "
+        events.append({
+            "offset": round(offset, 6),
+            "update": {
+                "update_id": update_id,
+                "channel_post": {
+                    "message_id": message_ids[chat_id],
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "channel", "title": f"Load test {chat_id}"},
+                    "text": text.strip(),
+                }
+            }
+        })
+        offset += rnd.expovariate(rate)
+    return events
+
+
+def load_stream(path: str) -> List[dict]:
+    with open(path, "r", encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_stream(path: str, events: List[dict]) -> None:
+    with open(path, "w", encoding='utf-8') as f:
+        for event in events:
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+
+def build_registry(events: List[dict]) -> dict:
+    """Реестр channels.json для всех каналов, встречающихся в потоке"""
+    registry = {}
+    for event in events:
+        chat = event["update"]["channel_post"]["chat"]
+        key = f"@load_{abs(chat['id'])}"
+        registry.setdefault(key, {
+            "timezone": 0,
+            "subscribers": 10_000,
+            "title": chat.get("title", key),
+            "posts": [],
+            "chat_id": chat["id"],
+            "admins": [100_000 + len(registry)]
+        })
+    return registry
+
+
+def build_config(metrics_delay: float) -> dict:
+    """Конфигурация бота для прогона; токены фиктивные"""
+    return {
+        "API_TOKEN": "123456:stand-in-token",
+        "API_ID": 12345,
+        "API_HASH": "0" * 32,
+        "OPENAI_API_KEY": "sk-stand-in",
+        "POST_SETTINGS": {
+            "CHECK_DELAY": metrics_delay,
+            "VIEW_NORM_PERCENT": 10.0,
+            "REACTION_NORM_PERCENT": 6.0,
+            "FORWARD_NORM_PERCENT": 15.0,
+            "CONTENT_CHECK": {"SPELLING_CHECK": True, "GRAMMAR_CHECK": True, "MIN_READABILITY_SCORE": 8}
+        },
+        "UPDATE_INTERVALS": {"SUBSCRIBERS": 3600, "POSTS": 300},
+        "NOTIFICATIONS": {"SEND_TO_OWNER": True, "NOTIFY_ON_ERRORS": True, "NOTIFY_ON_LOW_METRICS": True},
+        "CHECK_INTERVAL": 60,
+        "MAX_RETRIES": 3,
+        "TIMEOUT": 30
+    }
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Перцентиль методом ближайшего ранга"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/max в миллисекундах"""
+    return {
+        "count": len(values),
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "max_ms": max(values) * 1000 if values else 0.0,
+    }
+
+
+async def monitor_loop_lag(interval: float, samples: List[float], stop: asyncio.Event) -> None:
+    """Сторож event loop: насколько позже заказанного просыпается sleep"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - started - interval))
+
+
+async def replay(bot_module, events: List[dict], speed: float, args) -> dict:
+    dp, bot = bot_module.dp, bot_module.bot
+    ingest: Dict[Tuple[str, int], float] = {}
+    verdict_latency: List[float] = []
+    metrics_latency: List[float] = []
+    jobs = {"started": 0, "finished": 0}
+    all_jobs_done = asyncio.Event()
+    feeding_done = False
+
+    original_schedule, original_check = bot_module.schedule_metric_check, bot_module.run_metric_check
+
+    def tracked_schedule(chat_id, message_id, *job_args, **job_kwargs):
+        jobs["started"] += 1
+        return original_schedule(chat_id, message_id, *job_args, **job_kwargs)
+
+    async def tracked_check(job):
+        try:
+            await original_check(job)
+        finally:
+            jobs["finished"] += 1
+            scheduled = ingest.get((str(job.chat_id), job.message_id))
+            if scheduled is not None:
+                metrics_latency.append(time.perf_counter() - scheduled - args.metrics_delay)
+            if feeding_done and jobs["finished"] >= jobs["started"]:
+                all_jobs_done.set()
+
+    bot_module.schedule_metric_check, bot_module.run_metric_check = tracked_schedule, tracked_check
+    checks_task = asyncio.create_task(bot_module.metric_checks_loop())
+
+    async def process(update: dict, scheduled: float):
+        await dp.feed_raw_update(bot, update)
+        verdict_latency.append(time.perf_counter() - scheduled)
+
+    lag_samples: List[float] = []
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(monitor_loop_lag(args.lag_interval, lag_samples, stop))
+
+    started = time.perf_counter()
+    tasks = []
+    for event in events:
+        scheduled = started + event["offset"] / speed
+        wait = scheduled - time.perf_counter()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        post = event["update"]["channel_post"]
+        ingest[(str(post["chat"]["id"]), post["message_id"])] = scheduled
+        tasks.append(asyncio.create_task(process(event["update"], scheduled)))
+
+    await asyncio.gather(*tasks)
+    feeding_finished = time.perf_counter()
+    feeding_done = True
+    if jobs["finished"] < jobs["started"]:
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(all_jobs_done.wait(), timeout=args.drain_timeout)
+    finished = time.perf_counter()
+
+    stop.set()
+    await lag_task
+    checks_task.cancel()
+    bot_module.schedule_metric_check, bot_module.run_metric_check = original_schedule, original_check
+
+    return {
+        "posts": len(events),
+        "duration_s": feeding_finished - started,
+        "posts_per_second": len(events) / (feeding_finished - started) if events else 0.0,
+        "ingest_to_verdict": summarize(verdict_latency),
+        "ingest_to_metrics_verdict": summarize(metrics_latency),
+        "metrics_jobs": {**jobs, "drain_s": finished - feeding_finished},
+        "event_loop_lag": summarize(lag_samples),
+    }
+
+
+def start_standins(settings: StandInSettings):
+    """Запускает процесс заглушек и возвращает (процесс, порт)"""
+    context = multiprocessing.get_context("spawn")
+    port_queue = context.Queue()
+    process = context.Process(target=serve, args=(settings.as_dict(), port_queue), daemon=True)
+    process.start()
+    return process, port_queue.get(timeout=30)
+
+
+async def fetch_standin_stats(port: int) -> dict:
+    from aiohttp import ClientSession
+
+    async with ClientSession() as session:
+        async with session.get(f"http://127.0.0.1:{port}/stats") as response:
+            return await response.json()
+
+
+def run(args) -> dict:
+    if args.stream:
+        events = load_stream(args.stream)
+    else:
+        events = generate_stream(args.posts, args.channels, args.rate, args.text_length, args.seed)
+    if args.save_stream:
+        save_stream(args.save_stream, events)
+
+    settings = StandInSettings(
+        bot_latency=args.bot_latency, openai_latency=args.openai_latency,
+        openai_latency_per_kchar=args.openai_latency_per_kchar,
+        telethon_latency=args.telethon_latency, bot_error_rate=args.bot_error_rate,
+        openai_error_rate=args.openai_error_rate, telethon_error_rate=args.telethon_error_rate,
+        telethon_flood_session=args.flood_session,
+        bad_post_rate=args.bad_post_rate, seed=args.seed
+    )
+    process, port = start_standins(settings)
+    base_url = f"http://127.0.0.1:{port}"
+
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="load_replay_")
+    try:
+        with open(os.path.join(workdir, "config.json"), "w", encoding='utf-8') as f:
+            json.dump(build_config(args.metrics_delay), f)
+        with open(os.path.join(workdir, "channels.json"), "w", encoding='utf-8') as f:
+            json.dump(build_registry(events), f, ensure_ascii=False)
+
+        os.environ["BOT_CONFIG"] = os.path.join(workdir, "config.json")
+        os.environ["OPENAI_BASE_URL"] = f"{base_url}/v1"
+        os.chdir(workdir)
+        sys.path.insert(0, ROOT_DIR)
+
+        # Консольные логи бота не нужны: файловые логи остаются во временном каталоге
+        devnull = open(os.devnull, "w", encoding='utf-8')
+        with contextlib.redirect_stdout(devnull):
+            import bot as bot_module
+        rss_after_import = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+        from aiogram.client.session.aiohttp import AiohttpSession
+        from aiogram.client.telegram import TelegramAPIServer
+
+        async def main():
+            bot_module.bot.session = AiohttpSession(api=TelegramAPIServer.from_base(base_url))
+            bot_module.client_pool = bot_module.ClientPool(
+                {f"standin_{i}": StandInTelethonClient(base_url, name=f"standin_{i}") for i in range(args.sessions)},
+                bot_module.CONFIG["TELETHON"]["CONCURRENCY"]
+            )
+            try:
+                result = await replay(bot_module, events, args.speed, args)
+                result["standin_calls"] = await fetch_standin_stats(port)
+                result["sessions"] = bot_module.client_pool.health()
+                return result
+            finally:
+                await bot_module.bot.session.close()
+                await bot_module.client_pool.disconnect()
+
+        result = asyncio.run(main())
+        result["rss"] = {
+            "after_import_bytes": rss_after_import,
+            "peak_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        }
+        result["settings"] = {
+            "speed": args.speed, "metrics_delay": args.metrics_delay,
+            "stream": args.stream or "synthetic", **settings.as_dict()
+        }
+        return result
+    finally:
+        # Закрываем файловые логи бота до удаления временного каталога
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            handler.close()
+            root.removeHandler(handler)
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+        process.terminate()
+        process.join(timeout=5)
+
+
+def print_report(result: dict) -> None:
+    print(f"Постов: {result['posts']} за {result['duration_s']:.2f} с "
+          f"→ {result['posts_per_second']:.1f} постов/с")
+    for name in ("ingest_to_verdict", "ingest_to_metrics_verdict", "event_loop_lag"):
+        stats = result[name]
+        print(f"{name:<26} p50={stats['p50_ms']:.1f} мс  p95={stats['p95_ms']:.1f} мс  "
+              f"p99={stats['p99_ms']:.1f} мс  max={stats['max_ms']:.1f} мс  (n={stats['count']})")
+    jobs = result["metrics_jobs"]
+    print(f"Проверок метрик: {jobs['finished']}/{jobs['started']}")
+    print(f"Пиковый RSS: {result['rss']['peak_bytes'] / 2**20:.1f} МБ "
+          f"(после импорта {result['rss']['after_import_bytes'] / 2**20:.1f} МБ)")
+    print(f"Вызовы заглушек: {result['standin_calls']}")
+    for session in result["sessions"]:
+        print(f"Сессия {session['name']}: каналов {session['share']:.0%}, запросов {session['requests']}, "
+              f"FloodWait {session['flood_waits']}, ошибок {session['errors']}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон channel_post через dp")
+    parser.add_argument("--stream", help="JSONL-файл с записанным потоком обновлений")
+    parser.add_argument("--save-stream", help="сохранить сгенерированный поток в JSONL")
+    parser.add_argument("--posts", type=int, default=200, help="число синтетических постов")
+    parser.add_argument("--channels", type=int, default=20, help="число синтетических каналов")
+    parser.add_argument("--rate", type=float, default=1.0, help="постов в секунду в исходном потоке")
+    parser.add_argument("--text-length", type=int, default=600, help="длина текста поста, символов")
+    parser.add_argument("--speed", type=float, default=1.0, help="ускорение воспроизведения (N×)")
+    parser.add_argument("--metrics-delay", type=float, default=0.0,
+                        help="задержка проверки метрик вместо 24 часов, с")
+    parser.add_argument("--drain-timeout", type=float, default=120.0,
+                        help="сколько ждать завершения проверок метрик, с")
+    parser.add_argument("--lag-interval", type=float, default=0.01, help="период сторожа event loop, с")
+    parser.add_argument("--bot-latency", type=float, default=0.02)
+    parser.add_argument("--openai-latency", type=float, default=0.5)
+    parser.add_argument("--openai-latency-per-kchar", type=float, default=0.0,
+                        help="доп. задержка OpenAI на 1000 символов текста поста, с")
+    parser.add_argument("--telethon-latency", type=float, default=0.05)
+    parser.add_argument("--bot-error-rate", type=float, default=0.0)
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--telethon-error-rate", type=float, default=0.0)
+    parser.add_argument("--sessions", type=int, default=1, help="число сессий Telethon в пуле")
+    parser.add_argument("--flood-session", help="сессия, которая получает FloodWait на каждый запрос "
+                                                "(например, standin_0)")
+    parser.add_argument("--bad-post-rate", type=float, default=0.3,
+                        help="доля постов, в которых заглушка OpenAI находит ошибки")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", "-o", help="путь к JSON-файлу с результатами")
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output) if args.output else None
+    result = run(args)
+    print_report(result)
+    if output:
+        with open(output, "w", encoding='utf-8') as f:
+            json.dump({"suite": SUITE, "meta": collect_meta(), "result": result}, f, indent=4, ensure_ascii=False)
+        print(f"Результаты сохранены в {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""Моделирование расписания обновления подписчиков (utils/refresh.py).
+
+    python -m benchmarks.sim_refresh --channels 1000 --days 7
+
+Сравнивает фиксированный интервал UPDATE_INTERVALS.SUBSCRIBERS с
+адаптивным расписанием на смеси каналов: быстро растущие, обычные,
+спящие и каналы с всплесками после постов. Печатает число запросов к
+Bot API, среднее отставание показанного числа подписчиков от истинного
+и самую большую пачку запросов за одну минуту.
+"""
+import argparse
+import random
+import sys
+from collections import Counter
+
+from benchmarks.harness import ROOT_DIR
+
+STEP = 60  # шаг моделирования, секунд
+
+
+class SimChannel:
+    """Канал с заданной скоростью роста (подписчиков в час) и постами"""
+
+    def __init__(self, rnd: random.Random, kind: str):
+        self.kind = kind
+        self.count = rnd.randint(1_000, 200_000)
+        self.rate = {"fast": 200.0, "normal": 5.0, "dormant": 0.0, "bursty": 1.0}[kind] / 3600
+        self.posts_per_day = {"fast": 6, "normal": 2, "dormant": 0, "bursty": 3}[kind]
+        self.boost = 0.0
+        self.value = float(self.count)
+
+    def step(self, rnd: random.Random) -> bool:
+        """Сдвигает модель на STEP секунд; True, если вышел пост"""
+        posted = self.posts_per_day and rnd.random() < self.posts_per_day * STEP / 86400
+        if posted and self.kind == "bursty":
+            self.boost = 300 / 3600
+        self.value += (self.rate + self.boost) * STEP
+        self.boost *= 0.97
+        self.count = int(self.value)
+        return bool(posted)
+
+
+def simulate(channels_count: int, days: int, adaptive: bool, settings: dict) -> dict:
+    from utils.refresh import RefreshScheduler
+
+    rnd = random.Random(channels_count)
+    kinds = ["fast"] * 5 + ["normal"] * 45 + ["dormant"] * 40 + ["bursty"] * 10
+    channels = {str(-1001000000000 - i): SimChannel(rnd, rnd.choice(kinds)) for i in range(channels_count)}
+    shown = {chat_id: channel.count for chat_id, channel in channels.items()}
+
+    scheduler = RefreshScheduler(settings["SUBSCRIBERS_MIN"], settings["SUBSCRIBERS_MAX"], settings["SUBSCRIBERS"])
+    scheduler.sync({chat_id: channel.count for chat_id, channel in channels.items()}, 0)
+    calls, per_minute = 0, Counter()
+    lag = Counter()
+    for tick in range(days * 86400 // STEP):
+        now = tick * STEP
+        for chat_id, channel in channels.items():
+            if channel.step(rnd) and adaptive:
+                scheduler.touch(chat_id, now)
+
+        if adaptive:
+            due = scheduler.pop_due(now)
+        else:
+            # Прежнее поведение: все каналы подряд раз в SUBSCRIBERS секунд
+            due = list(channels) if now % settings["SUBSCRIBERS"] == 0 else []
+        for chat_id in due:
+            shown[chat_id] = channels[chat_id].count
+            if adaptive:
+                scheduler.record(chat_id, shown[chat_id], now)
+        calls += len(due)
+        per_minute[now // 60] += len(due)
+
+        for chat_id, channel in channels.items():
+            lag[channel.kind] += abs(channel.count - shown[chat_id])
+
+    ticks = days * 86400 // STEP
+    by_kind = Counter(channel.kind for channel in channels.values())
+    return {
+        "calls": calls,
+        "burst": max(per_minute.values()),
+        "lag": {kind: lag[kind] / ticks / by_kind[kind] for kind in sorted(by_kind)},
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Моделирование расписания обновления подписчиков")
+    parser.add_argument("--channels", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--interval", type=int, default=3600)
+    parser.add_argument("--min-interval", type=int, default=600)
+    parser.add_argument("--max-interval", type=int, default=43200)
+    args = parser.parse_args(argv)
+    sys.path.insert(0, ROOT_DIR)
+
+    settings = {
+        "SUBSCRIBERS": args.interval,
+        "SUBSCRIBERS_MIN": args.min_interval,
+        "SUBSCRIBERS_MAX": args.max_interval,
+    }
+    for name, adaptive in (("фиксированный", False), ("адаптивный", True)):
+        result = simulate(args.channels, args.days, adaptive, settings)
+        lag = ", ".join(f"{kind} {value:.1f}" for kind, value in result["lag"].items())
+        print(f"{name:<14} запросов: {result['calls']:>8,}  пачка за минуту: {result['burst']:>5}  "
+              f"отставание (подписчиков): {lag}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
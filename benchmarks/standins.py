@@ -0,0 +1,274 @@
+"""Локальные заглушки Bot API, OpenAI и Telethon для нагрузочного прогона.
+
+Сервер заглушек запускается в отдельном процессе, чтобы синхронные вызовы
+в боте (например, OpenAI-клиент) не блокировали его собственный event loop
+и чтобы потребление памяти бота измерялось отдельно.
+"""
+import asyncio
+import json
+import random
+import time
+import zlib
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+from aiohttp import ClientSession, ClientTimeout, web
+
+
+class StandInSettings:
+    """Задержки (в секундах) и доля ошибок для каждой заглушки"""
+
+    def __init__(self, bot_latency: float = 0.02, openai_latency: float = 0.5,
+                 openai_latency_per_kchar: float = 0.0, telethon_latency: float = 0.05, bot_error_rate: float = 0.0,
+                 openai_error_rate: float = 0.0, telethon_error_rate: float = 0.0,
+                 telethon_flood_session: Optional[str] = None,
+                 bad_post_rate: float = 0.3, seed: Optional[int] = None):
+        self.bot_latency = bot_latency
+        self.openai_latency = openai_latency
+        # Дополнительная задержка на каждую 1000 символов запроса (модель отвечает дольше на длинный текст)
+        self.openai_latency_per_kchar = openai_latency_per_kchar
+        self.telethon_latency = telethon_latency
+        self.bot_error_rate = bot_error_rate
+        self.openai_error_rate = openai_error_rate
+        self.telethon_error_rate = telethon_error_rate
+        # Сессия, которая получает FloodWait на каждый запрос (ограниченный аккаунт)
+        self.telethon_flood_session = telethon_flood_session
+        self.bad_post_rate = bad_post_rate
+        self.seed = seed
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+
+def _spelling_content(rnd: random.Random, bad: bool) -> str:
+    """Ответ модели в формате, который ожидает check_spelling"""
+    errors = rnd.randint(1, 5) if bad else 0
+    return json.dumps({
+        "has_errors": bad,
+        "categories": {
+            "spelling": bad,
+            "grammar": bad,
+            "readability": {"score": 5 if bad else 8, "level": "средний" if bad else "легкий"}
+        },
+        "details": {
+            "spelling_details": [f"«слво{i}» → «слово{i}»" for i in range(errors)],
+            "grammar_details": [f"Неверное согласование {i}" for i in range(errors)],
+            "readability_details": "Синтетический ответ нагрузочного теста"
+        },
+        "improvements": {
+            "corrections": [f"Исправить «слво{i}»" for i in range(errors)],
+            "structure": [],
+            "readability": [],
+            "engagement": []
+        },
+        "moderation_decision": "/false_no" if bad else "/true_go"
+    }, ensure_ascii=False)
+
+
+def _chat_id(value: str) -> int:
+    """chat_id из запроса; для @username выдается стабильный синтетический id"""
+    try:
+        return int(value)
+    except ValueError:
+        return -1003000000000 - zlib.crc32(value.encode()) % 10**9
+
+
+def build_app(settings: StandInSettings) -> web.Application:
+    """Собирает aiohttp-приложение со всеми заглушками"""
+    rnd = random.Random(settings.seed)
+    counters = {"bot": 0, "openai": 0, "telethon": 0, "errors": 0}
+    message_ids = iter(range(1, 1 << 62))
+
+    async def delay(latency: float):
+        if latency > 0:
+            await asyncio.sleep(latency * rnd.uniform(0.5, 1.5))
+
+    def failed(rate: float) -> bool:
+        if rate > 0 and rnd.random() < rate:
+            counters["errors"] += 1
+            return True
+        return False
+
+    async def bot_api(request: web.Request) -> web.Response:
+        counters["bot"] += 1
+        await delay(settings.bot_latency)
+        if failed(settings.bot_error_rate):
+            return web.json_response(
+                {"ok": False, "error_code": 500, "description": "Internal Server Error"}, status=500
+            )
+
+        method = request.match_info["method"].lower()
+        data = dict(await request.post())
+        if method == "sendmessage":
+            result = {
+                "message_id": next(message_ids),
+                "date": int(time.time()),
+                "chat": {"id": _chat_id(data.get("chat_id", "0")), "type": "private"},
+                "text": data.get("text", ""),
+            }
+        elif method == "getchatmembercount":
+            result = rnd.randint(1_000, 100_000)
+        elif method == "getchat":
+            result = {"id": _chat_id(data.get("chat_id", "0")), "type": "channel", "title": "Stand-in channel"}
+        elif method == "getme":
+            result = {"id": 1, "is_bot": True, "first_name": "stand-in", "username": "standin_bot"}
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def chat_completions(request: web.Request) -> web.Response:
+        counters["openai"] += 1
+        body = await request.json()
+        length = sum(len(message.get("content") or "") for message in body.get("messages", [])[1:])
+        await delay(settings.openai_latency + settings.openai_latency_per_kchar * length / 1000)
+        if failed(settings.openai_error_rate):
+            return web.json_response({"error": {"message": "stand-in failure", "type": "server_error"}}, status=500)
+
+        content = _spelling_content(rnd, rnd.random() < settings.bad_post_rate)
+        return web.json_response({
+            "id": f"chatcmpl-{counters['openai']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "stand-in",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        })
+
+    async def telethon_messages(request: web.Request) -> web.Response:
+        counters["telethon"] += 1
+        session = request.query.get("session", "")
+        counters[f"telethon:{session}"] = counters.get(f"telethon:{session}", 0) + 1
+        await delay(settings.telethon_latency)
+        if session == settings.telethon_flood_session or failed(settings.telethon_error_rate):
+            return web.json_response({"error": "FLOOD_WAIT_X"}, status=420)
+
+        views = rnd.randint(0, 50_000)
+        return web.json_response({
+            "id": int(request.query["id"]),
+            "views": views,
+            "forwards": rnd.randint(0, max(1, views // 20)),
+            "reactions": [{"reaction": "👍", "count": rnd.randint(0, max(1, views // 10))}],
+            "date": int(time.time()),
+            "text": "Синтетический текст поста для повторной проверки.",
+        })
+
+    async def stats(request: web.Request) -> web.Response:
+        return web.json_response(counters)
+
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", bot_api)
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_get("/telethon/messages", telethon_messages)
+    app.router.add_get("/stats", stats)
+    return app
+
+
+def serve(settings: Dict[str, Any], port_queue) -> None:
+    """Точка входа процесса заглушек: сообщает порт через очередь и работает до завершения"""
+
+    async def run():
+        runner = web.AppRunner(build_app(StandInSettings(**settings)), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port_queue.put(runner.addresses[0][1])
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+class FloodWaitError(Exception):
+    """Аналог telethon.errors.FloodWaitError: пул сессий узнает его по имени класса"""
+
+    def __init__(self, seconds: int):
+        super().__init__(f"A wait of {seconds} seconds is required")
+        self.seconds = seconds
+
+
+class StandInTelethonClient:
+    """Замена TelegramClient: те же методы, но данные берутся у локальной заглушки"""
+
+    # Пауза, которую заглушка требует при FloodWait
+    FLOOD_WAIT_SECONDS = 5
+
+    def __init__(self, base_url: str, history_size: int = 1000, name: str = "standin"):
+        self._base_url = base_url.rstrip("/")
+        self.name = name
+        # Сколько постов отдает iter_messages
+        self.history_size = history_size
+        self._session: Optional[ClientSession] = None
+
+    def is_connected(self) -> bool:
+        return True
+
+    async def connect(self):
+        pass
+
+    async def start(self):
+        pass
+
+    async def is_user_authorized(self) -> bool:
+        return True
+
+    async def disconnect(self):
+        if self._session is not None:
+            await self._session.close()
+
+    async def get_entity(self, peer):
+        return SimpleNamespace(id=peer, title=f"Stand-in {peer}")
+
+    async def iter_messages(self, entity, limit=None, offset_id=0, wait_time=None):
+        """Синтетическая история канала: по посту в час, от новых к старым"""
+        rnd = random.Random(f"{getattr(entity, 'id', entity)}:{offset_id}")
+        newest = self.history_size
+        start = min(offset_id - 1, newest) if offset_id else newest
+        now = time.time()
+        for count, message_id in enumerate(range(start, 0, -1)):
+            if limit is not None and count >= limit:
+                break
+            if count and count % 100 == 0:
+                await asyncio.sleep(wait_time or 0)
+            views = rnd.randint(0, 50_000)
+            yield SimpleNamespace(
+                id=message_id,
+                date=datetime.fromtimestamp(now - (newest - message_id + 1) * 3600, tz=timezone.utc),
+                views=views,
+                forwards=rnd.randint(0, max(1, views // 20)),
+                reactions=SimpleNamespace(results=[SimpleNamespace(reaction="👍", count=rnd.randint(0, max(1, views // 10)))]),
+                grouped_id=message_id // 4 if message_id // 4 % 5 == 0 else None,
+                action=None,
+            )
+
+    async def get_messages(self, entity, ids):
+        if isinstance(ids, list):
+            return [await self.get_messages(entity, message_id) for message_id in ids]
+
+        chat_id = getattr(entity, "id", entity)
+        if self._session is None:
+            self._session = ClientSession(timeout=ClientTimeout(total=30))
+        async with self._session.get(
+            f"{self._base_url}/telethon/messages",
+            params={"chat_id": str(chat_id), "id": str(ids), "session": self.name}
+        ) as response:
+            if response.status != 200:
+                raise FloodWaitError(self.FLOOD_WAIT_SECONDS)
+            data = await response.json()
+
+        reactions = SimpleNamespace(results=[
+            SimpleNamespace(reaction=r["reaction"], count=r["count"]) for r in data["reactions"]
+        ])
+        return SimpleNamespace(
+            id=data["id"],
+            views=data["views"],
+            forwards=data["forwards"],
+            replies=None,
+            post_author=None,
+            reactions=reactions,
+            date=datetime.fromtimestamp(data["date"], tz=timezone.utc),
+            text=data["text"],
+        )
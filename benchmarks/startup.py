@@ -0,0 +1,161 @@
+"""Время старта бота: отчет в стиле `python -X importtime` и бенчмарк импорта.
+
+    python -m benchmarks.startup --repeat 10 --budget-ms 1500 --output startup.json
+
+Каждый замер выполняется в отдельном процессе с фиктивной конфигурацией.
+Код возврата 1, если медиана импорта превышает бюджет или при старте
+были импортированы модули, которые должны загружаться лениво.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from benchmarks.harness import ROOT_DIR, collect_meta, make_result, write_report
+from benchmarks.load_replay import build_config
+
+SUITE = "startup"
+
+# Модули, которые не должны импортироваться при старте бота
+DEFERRED_MODULES = ["openai", "telethon", "requests", "httpx"]
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def _environment(workdir: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env["BOT_CONFIG"] = os.path.join(workdir, "config.json")
+    env["PYTHONPATH"] = ROOT_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def _run_python(args: List[str], workdir: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args], cwd=workdir, env=_environment(workdir),
+        capture_output=True, text=True, timeout=120
+    )
+
+
+def parse_importtime(stderr: str) -> List[dict]:
+    """Разбирает вывод -X importtime в список записей"""
+    entries = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append({
+                "module": module,
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+                "depth": len(indent) // 2,
+            })
+    return entries
+
+
+def importtime_report(workdir: str, target: str, top: int) -> dict:
+    """Запускает импорт под -X importtime и группирует время по пакетам"""
+    result = _run_python(["-X", "importtime", "-c", f"import {target}"], workdir)
+    if result.returncode != 0:
+        raise RuntimeError(f"Импорт {target} завершился ошибкой:\n{result.stderr[-2000:]}")
+
+    entries = parse_importtime(result.stderr)
+    by_package: Dict[str, int] = defaultdict(int)
+    for entry in entries:
+        by_package[entry["module"].split(".")[0]] += entry["self_us"]
+
+    return {
+        "total_us": sum(entry["self_us"] for entry in entries),
+        "modules": len(entries),
+        "top_cumulative": sorted(
+            (e for e in entries if e["depth"] == 0), key=lambda e: e["cumulative_us"], reverse=True
+        )[:top],
+        "top_packages": sorted(
+            ({"package": name, "self_us": us} for name, us in by_package.items()),
+            key=lambda e: e["self_us"], reverse=True
+        )[:top],
+    }
+
+
+def deferred_imports(workdir: str, target: str) -> List[str]:
+    """Какие из лениво загружаемых модулей все-таки импортированы при старте"""
+    code = (f"import json, sys, {target}; "
+            f"print(json.dumps([m for m in {DEFERRED_MODULES!r} if m in sys.modules]))")
+    result = _run_python(["-c", code], workdir)
+    if result.returncode != 0:
+        raise RuntimeError(f"Импорт {target} завершился ошибкой:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure_startup(workdir: str, target: str, repeat: int) -> List[float]:
+    """Время импорта в наносекундах за вычетом пустого запуска интерпретатора"""
+    def wall(args):
+        start = time.perf_counter_ns()
+        completed = _run_python(args, workdir)
+        elapsed = time.perf_counter_ns() - start
+        if completed.returncode != 0:
+            raise RuntimeError(completed.stderr[-2000:])
+        return elapsed
+
+    baseline = statistics.median(wall(["-c", "pass"]) for _ in range(3))
+    return [max(0.0, wall(["-c", f"import {target}"]) - baseline) for _ in range(repeat)]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Время импорта и старта бота")
+    parser.add_argument("--target", default="bot", help="модуль для импорта (по умолчанию bot)")
+    parser.add_argument("--repeat", type=int, default=5, help="число замеров старта")
+    parser.add_argument("--top", type=int, default=15, help="сколько модулей показывать в отчете")
+    parser.add_argument("--budget-ms", type=float, help="бюджет на импорт, мс")
+    parser.add_argument("--output", "-o", help="путь к JSON-файлу с результатами")
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output) if args.output else None
+    with tempfile.TemporaryDirectory() as workdir:
+        with open(os.path.join(workdir, "config.json"), "w", encoding='utf-8') as f:
+            json.dump(build_config(86400), f)
+
+        report = importtime_report(workdir, args.target, args.top)
+        eager = deferred_imports(workdir, args.target)
+        samples = measure_startup(workdir, args.target, args.repeat)
+
+    print(f"Импорт {args.target}: {report['modules']} модулей, "
+          f"сумма self-времени {report['total_us'] / 1000:.1f} мс")
+    print("\nСамые тяжелые импорты верхнего уровня (cumulative):")
+    for entry in report["top_cumulative"]:
+        print(f"  {entry['cumulative_us'] / 1000:>9.1f} мс  {entry['module']}")
+    print("\nСамые тяжелые пакеты (self):")
+    for entry in report["top_packages"]:
+        print(f"  {entry['self_us'] / 1000:>9.1f} мс  {entry['package']}")
+    print(f"\nЛенивые модули, загруженные при старте: {', '.join(eager) or 'нет'}\n")
+
+    results = [make_result(f"import {args.target}", samples)]
+    write_report(SUITE, results, None)
+    if output:
+        with open(output, "w", encoding='utf-8') as f:
+            json.dump({
+                "suite": SUITE,
+                "meta": collect_meta(),
+                "results": results,
+                "importtime": report,
+                "eager_deferred_modules": eager,
+            }, f, indent=4, ensure_ascii=False)
+        print(f"Результаты сохранены в {output}")
+
+    failed = bool(eager)
+    median_ms = results[0]["ns_per_op"]["median"] / 1e6
+    if args.budget_ms is not None and median_ms > args.budget_ms:
+        print(f"❌ Медиана импорта {median_ms:.1f} мс превышает бюджет {args.budget_ms:.1f} мс")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
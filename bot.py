@@ -1,18 +1,38 @@
-import json
 import logging
 import asyncio
 import os
-from aiogram import Bot, Dispatcher, types
-from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
+import tempfile
+from aiogram import Bot, Dispatcher, F, types
+from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove, FSInputFile, BufferedInputFile
 from aiogram.filters import Command
-from utils.database import load_json, save_json
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from utils.database import load_json, save_json, find_channel_by_chat_id
 from utils.logging import setup_logger
-from utils.checks import check_spelling, check_post_metrics, analyze_metrics_with_gpt
-from utils.notifications import notify_admins
-from telethon import TelegramClient
+from utils.checks import check_spelling, check_post_metrics, analyze_metrics_with_gpt, openai_client
+from utils.notifications import notify_admins, build_spelling_report
 from datetime import datetime, timedelta
-import aiohttp
 from utils.api import set_bot_getter
+from utils.router import TextRouter, TextRouteFilter
+from utils.fsm_storage import create_fsm_storage
+from utils.pagination import ChannelPager, ChannelPageCallback, ChannelActionCallback, NOOP_CALLBACK, format_channel_stats
+from utils.metrics_store import MetricsStore
+from utils.albums import AlbumCoalescer, LogicalPost, join_texts, merge_post_metrics
+from utils.post_checks import PostCheckCache
+from utils.near_duplicates import NearDuplicateIndex
+from utils.backfill import backfill_channel
+from utils.forecast import EarlyForecaster, GrowthCurves
+from utils.refresh import RefreshScheduler
+from utils.telethon_pool import ClientPool
+from utils.live_metrics import LiveMetrics
+from utils.seen_posts import SeenPosts
+from utils.snapshot import InFlight, load_snapshot, save_snapshot
+from utils.export import DATASETS, FORMATS, export, parquet_available, parse_date
+from utils.subscriber_history import DAY
+from utils.posting_time import PostingTimeReport, engagement_by_local_time, format_posting_time
+from utils.findings import result_findings
+from utils.profiling import SamplingProfiler, StallDetector
+from utils.records import MetricJob, MetricJobQueue
 import time
 from utils.config import CONFIG
 import re
@@ -23,35 +43,66 @@ SUPER_ADMIN_ID = 1914567632
 # Настройка логирования
 logger = setup_logger()
 
-# Загрузка конфигурации
-with open("config.json") as config_file:
-    CONFIG = json.load(config_file)
-
-# В начале файла, где определены константы
-CONFIG.update({
-    "METRICS_CHECK_DELAY": 86400,  # 24 часа
-    "TEXT_CHECK_DELAY": 0  # Мгновенная проверка
-})
-
 bot = Bot(token=CONFIG["API_TOKEN"])
-dp = Dispatcher()
+# Состояние диалога хранится отдельно для каждого пользователя (см. ChannelForm)
+dp = Dispatcher(storage=create_fsm_storage(CONFIG["FSM"]))
 dp.bot = bot
 
+# Кнопки клавиатуры маршрутизируются одним поиском по словарю/trie.
+# Обработчик регистрируется раньше обработчиков состояний, поэтому
+# нажатие кнопки всегда имеет приоритет над ожиданием ввода.
+text_router = TextRouter()
+
+async def dispatch_text_route(message: types.Message, route, **kwargs):
+    """Вызывает обработчик кнопки, найденный TextRouter"""
+    await route.call(message, **kwargs)
+
+dp.message.register(dispatch_text_route, TextRouteFilter(text_router))
+
 # Загрузка данных о каналах
 channels = load_json("channels.json")
 
-# Глобальная переменная для отслеживания состояния
-waiting_for_channel = False
-waiting_for_timezone = False
-current_channel = None
-current_channel_title = None
+# Состояния диалога с админом; выбранный канал хранится в данных состояния
+# (current_channel, current_channel_title)
+class ChannelForm(StatesGroup):
+    waiting_for_channel = State()
+    waiting_for_timezone = State()
+
+# Пул сессий Telethon создается при первом обращении, чтобы не импортировать telethon при старте
+client_pool = None
+
+def get_client_pool() -> ClientPool:
+    """Возвращает пул сессий Telethon, создавая его при первом вызове"""
+    global client_pool
+    if client_pool is None:
+        client_pool = ClientPool.from_config(CONFIG["TELETHON"], CONFIG["API_ID"], CONFIG["API_HASH"])
+    return client_pool
+
+# Журнал замеров и агрегаты по каналам для /stats
+metrics_store = MetricsStore(CONFIG["METRICS"]["PATH"], CONFIG["NORMS"], CONFIG["METRICS"]["HISTORY_DAYS"],
+                             CONFIG["LIVE_METRICS"]["SAMPLES_DAYS"])
 
-# Добавляем в начало файла инициализацию клиента Telethon
-client = TelegramClient('bot_session', CONFIG["API_ID"], CONFIG["API_HASH"])
+# Уже обработанные посты: повторная доставка не запускает проверки второй раз
+seen_posts = SeenPosts(CONFIG["IDEMPOTENCY"]["PATH"], CONFIG["IDEMPOTENCY"]["CAPACITY"],
+                       CONFIG["IDEMPOTENCY"]["ERROR_RATE"])
+# Посты, принятые в обработку, но еще не проверенные: повтор, пришедший в это время, отбрасывается
+processing_posts = set()
+
+# Метрики свежих постов из обновлений, которые Telegram присылает сессиям Telethon
+live_metrics = LiveMetrics(CONFIG["LIVE_METRICS"]["WATCH_HOURS"])
+
+# Сторож event loop и профилировщик для /profile
+stall_detector = StallDetector(CONFIG["PROFILING"]["STALL_THRESHOLD"])
+profiler = SamplingProfiler(CONFIG["PROFILING"]["SAMPLE_INTERVAL"])
+profile_lock = asyncio.Lock()
+
+# Постраничные списки каналов, кэш сбрасывается при каждом изменении реестра
+channel_pager = ChannelPager(page_size=10, metrics=metrics_store)
 
 # Функция для сохранения данных
 def save_channels():
     save_json("channels.json", channels)
+    channel_pager.invalidate()
 
 @dp.message(Command("start"))
 async def start_command(message: types.Message):
@@ -89,7 +140,10 @@ async def help_command(message: types.Message):
             "   `/add_channel -100123456789 -02:30`\n"
             "- `/cancel` - отменить текущую операцию\n"
             "- `/channels` - управление каналами\n"
-            "- `/stats` - статистика по каналам\n\n"
+            "- `/stats` - статистика по каналам\n"
+            "- `/best_time` - лучшее время для постов по часовому поясу канала\n"
+            "- `/export posts csv 2026-01-01 2026-01-31` - выгрузка метрик постов, "
+            "замеров (`samples`) или подписчиков (`subscribers`) в CSV или Parquet\n\n"
             "**Связь с разработчиком:**\n"
             "Telegram: [t.me/ctrltg](t.me/ctrltg)\n"
             "Сайт: [whomever.tech](https://whomever.tech)",
@@ -100,10 +154,9 @@ async def help_command(message: types.Message):
         await message.reply("Произошла ошибка при обработке вашего запроса.")
 
 @dp.message(Command("add_channel"))
-async def add_channel_command(message: types.Message):
+async def add_channel_command(message: types.Message, state: FSMContext):
     try:
-        global waiting_for_channel
-        waiting_for_channel = True
+        await state.set_state(ChannelForm.waiting_for_channel)
         await message.reply(
             "Отправьте ID или username канала, который нужно добавить.\n"
             "Формат: @username +05:00 или -100123456789 -02:30"
@@ -117,7 +170,8 @@ async def channels_command(message: types.Message):
     """Обработчик команды /channels"""
     await handle_my_channels(message)
 
-@dp.message(lambda message: message.text == "📋 Мои каналы")
+@text_router.exact("📋 Мои каналы")
+@text_router.exact("◀️ Назад к списку")
 async def handle_my_channels(message: types.Message):
     try:
         if not channels:
@@ -134,85 +188,77 @@ async def handle_my_channels(message: types.Message):
             )
             return
 
-        keyboard = []
-        for channel_id, data in channels.items():
-            channel_name = data.get('title', 'Неизвестно')
-            keyboard.append([KeyboardButton(text=f"📌 {channel_name}")])
-        keyboard.append([KeyboardButton(text="◀️ Назад")])
-        
-        await message.reply(
-            "📋 Выберите канал для управления:",
-            reply_markup=ReplyKeyboardMarkup(
-                keyboard=keyboard,
-                resize_keyboard=True
-            )
-        )
+        text, markup = channel_pager.render("list", 0, channels)
+        await message.reply(text, reply_markup=markup)
     except Exception as e:
         logger.error(f"Ошибка при отображении списка каналов: {e}")
         await message.reply("Произошла ошибка при обработке запроса")
 
-@dp.message(lambda message: message.text.startswith("📌 "))
-async def handle_channel_settings(message: types.Message):
+async def show_channel_settings(message: types.Message, channel_id: str, state: FSMContext):
+    """Показывает настройки канала и запоминает его как выбранный"""
+    channel_data = channels.get(channel_id)
+    if not channel_data:
+        await message.answer("Канал не найден")
+        return
+    channel_title = channel_data.get('title', channel_id)
+        
+    # Запоминаем выбранный канал для кнопок настроек
+    await state.update_data(current_channel=channel_id, current_channel_title=channel_title)
+        
+    keyboard = [
+        [KeyboardButton(text="🕒 Изменить часовой пояс")],
+        [KeyboardButton(text="🗑 Удалить канал")],
+        [KeyboardButton(text="◀️ Назад к списку")]
+    ]
+    
+    # Формируем ссылку на канал
+    channel_link = f"https://t.me/{channel_data.get('username', channel_id[1:])}" if channel_id.startswith('@') else f"https://t.me/c/{str(channel_data['chat_id'])[4:]}"
+    
+    text = (
+        f"⚙️ Настройки канала {channel_title}\n\n"
+        f"👥 Подписчиков: {channel_data.get('subscribers', 0):,}\n"
+        f"🕒 Часовой пояс: {channel_data.get('timezone', 0):+.2f}\n"
+        f"🔗 Ссылка: {channel_link}"
+    )
+    
+    await message.answer(
+        text,
+        reply_markup=ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
+    )
+
+@text_router.prefix("📌 ")
+async def handle_channel_settings(message: types.Message, state: FSMContext):
     try:
         channel_title = message.text[2:].strip()  # Убираем эмодзи и пробелы
         channel_id = None
-        channel_data = None
         
         for cid, data in channels.items():
             if data.get('title') == channel_title:
                 channel_id = cid
-                channel_data = data
                 break
                 
-        if not channel_data:
+        if not channel_id:
             await message.reply("Канал не найден")
             return
             
-        keyboard = [
-            [KeyboardButton(text="🕒 Изменить часовой пояс")],
-            [KeyboardButton(text="🗑 Удалить канал")],
-            [KeyboardButton(text="◀️ Назад к списку")]
-        ]
-        
-        # Формируем ссылку на канал
-        channel_link = f"https://t.me/{channel_data.get('username', channel_id[1:])}" if channel_id.startswith('@') else f"https://t.me/c/{str(channel_data['chat_id'])[4:]}"
-        
-        text = (
-            f"⚙️ Настройки канала {channel_title}\n\n"
-            f"👥 Подписчиков: {channel_data.get('subscribers', 0):,}\n"
-            f"🕒 Часовой пояс: {channel_data.get('timezone', 0):+.2f}\n"
-            f"🔗 Ссылка: {channel_link}"
-        )
-        
-        await message.reply(
-            text,
-            reply_markup=ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
-        )
+        await show_channel_settings(message, channel_id, state)
         
     except Exception as e:
         logger.error(f"Ошибка при отображении настроек канала: {e}")
         await message.reply("Произошла ошибка при обработке запроса")
 
-@dp.message(lambda message: message.text == "➕ Добавить канал")
-async def handle_add_channel_button(message: types.Message):
+@text_router.exact("➕ Добавить канал")
+async def handle_add_channel_button(message: types.Message, state: FSMContext):
     """Обработчик кнопки добавления канала"""
-    await add_channel_command(message)
+    await add_channel_command(message, state)
 
-@dp.message(lambda message: message.text == "🕒 Изменить часовой пояс")
-async def change_timezone_handler(message: types.Message):
+@text_router.exact("🕒 Изменить часовой пояс")
+async def change_timezone_handler(message: types.Message, state: FSMContext):
     try:
-        global waiting_for_timezone, current_channel
-        waiting_for_timezone = True
-        
-        # Получаем текущий канал из сообщения
-        channel_title = None
-        for cid, data in channels.items():
-            if data.get('title') == message.text[2:].strip():  # Убираем эмодзи
-                current_channel = cid
-                channel_title = data.get('title')
-                break
+        # Канал, выбранный этим пользователем в меню настроек
+        current_channel = (await state.get_data()).get("current_channel")
                 
-        if not current_channel:
+        if not current_channel or current_channel not in channels:
             await message.reply(
                 "Ошибка: канал не найден",
                 reply_markup=ReplyKeyboardMarkup(
@@ -222,6 +268,7 @@ async def change_timezone_handler(message: types.Message):
             )
             return
             
+        await state.set_state(ChannelForm.waiting_for_timezone)
         await message.reply(
             "Отправьте новый часовой пояс в формате: +05:00 или -02:30",
             reply_markup=ReplyKeyboardMarkup(
@@ -233,11 +280,13 @@ async def change_timezone_handler(message: types.Message):
         logger.error(f"Ошибка при запросе часового пояса: {e}")
         await message.reply("Произошла ошибка при обработке запроса")
 
-@dp.message(lambda message: waiting_for_timezone and message.text not in ["◀️ Назад", "◀️ Назад к настройкам"])
-async def process_timezone_change(message: types.Message):
+# Команды (/cancel, /stats и другие) в состоянии ожидания обрабатываются своими обработчиками
+@dp.message(ChannelForm.waiting_for_timezone, F.text, ~F.text.startswith("/"),
+            ~F.text.in_({"◀️ Назад", "◀️ Назад к настройкам"}))
+async def process_timezone_change(message: types.Message, state: FSMContext):
     """Обработчик изменения часового пояса"""
     try:
-        global waiting_for_timezone, current_channel
+        current_channel = (await state.get_data()).get("current_channel")
         
         # Проверяем формат часового пояса
         timezone_str = message.text
@@ -270,8 +319,7 @@ async def process_timezone_change(message: types.Message):
             )
             
             # Сбрасываем состояние
-            waiting_for_timezone = False
-            current_channel = None
+            await state.clear()
         else:
             await message.reply(
                 "Ошибка: канал не найден",
@@ -290,32 +338,183 @@ async def stats_command(message: types.Message):
     """Обработчик команды /stats"""
     await handle_stats(message)
 
-@dp.message(lambda message: message.text == "📊 Статистика")
+@dp.message(Command("sessions"))
+async def sessions_command(message: types.Message):
+    """Состояние сессий Telethon (только для супер-админа)"""
+    if message.from_user.id != SUPER_ADMIN_ID:
+        return
+    try:
+        text = "🔌 Сессии Telethon:\n\n"
+        for session in get_client_pool().health():
+            status = "✅" if session["available"] else f"⏸ пауза {session['cooldown']:.0f} с"
+            text += (
+                f"{status} {session['name']}: каналов {session['share']:.0%}, "
+                f"в работе {session['in_flight']}, запросов {session['requests']:,}, "
+                f"FloodWait {session['flood_waits']}, ошибок {session['errors']}\n"
+            )
+        await message.reply(text)
+    except Exception as e:
+        logger.error(f"Ошибка в команде /sessions: {e}", exc_info=True)
+        await message.reply("Произошла ошибка при обработке вашего запроса.")
+
+def admin_channels(user_id: int, names: list = None) -> dict:
+    """Каналы, данные которых доступны пользователю: супер-админу все, остальным - где они админы.
+
+    names - фильтр по ключу канала (@username) или chat_id.
+    """
+    allowed = {
+        channel_id: data for channel_id, data in channels.items()
+        if "chat_id" in data and (user_id == SUPER_ADMIN_ID or user_id in data.get("admins", []))
+    }
+    if names:
+        allowed = {
+            channel_id: data for channel_id, data in allowed.items()
+            if channel_id in names or str(data["chat_id"]) in names
+        }
+    return allowed
+
+# Bot API не принимает от бота файлы больше 50 МБ
+EXPORT_MAX_BYTES = 50 * 1024 * 1024
+
+@dp.message(Command("export"))
+async def export_command(message: types.Message):
+    """Выгрузка журнала метрик: /export posts|samples|subscribers [csv|parquet] [с ГГГГ-ММ-ДД] [по ГГГГ-ММ-ДД] [канал]"""
+    usage = (
+        "Использование: /export <набор> [формат] [с] [по] [канал]\n"
+        f"Наборы: {', '.join(DATASETS)}; форматы: {', '.join(FORMATS)}; даты - ГГГГ-ММ-ДД (UTC), "
+        "по умолчанию последние 30 дней; без канала выгружаются все ваши каналы"
+    )
+    path = None
+    try:
+        args = message.text.split()[1:]
+        if not args or args[0] not in DATASETS:
+            await message.reply(usage)
+            return
+        dataset, args = args[0], args[1:]
+        fmt = args.pop(0) if args and args[0] in FORMATS else "csv"
+        if fmt == "parquet" and not parquet_available():
+            await message.reply("Выгрузка в Parquet недоступна: на сервере не установлен pyarrow")
+            return
+        dates = [parse_date(arg) for arg in args if re.fullmatch(r"\d{4}-\d{2}-\d{2}", arg)]
+        names = [arg for arg in args if not re.fullmatch(r"\d{4}-\d{2}-\d{2}", arg)]
+        end = dates[1] + DAY if len(dates) > 1 else time.time()
+        start = dates[0] if dates else end - 30 * DAY
+
+        allowed = admin_channels(message.from_user.id, names)
+        if not allowed:
+            await message.reply("Нет доступных каналов для выгрузки")
+            return
+
+        suffix = ".csv.gz" if fmt == "csv" else ".parquet"
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        os.close(fd)
+        # Строки идут из базы в файл пачками в отдельном потоке, event loop не блокируется
+        written = await asyncio.to_thread(
+            export, CONFIG["METRICS"]["PATH"], dataset, fmt, path,
+            [str(data["chat_id"]) for data in allowed.values()], start, end
+        )
+        if os.path.getsize(path) > EXPORT_MAX_BYTES:
+            await message.reply("Выгрузка больше 50 МБ: сузьте период или используйте python -m utils.export")
+            return
+        period = f"{datetime.utcfromtimestamp(start):%Y-%m-%d}_{datetime.utcfromtimestamp(end - 1):%Y-%m-%d}"
+        await message.reply_document(
+            FSInputFile(path, filename=f"{dataset}_{period}{suffix}"),
+            caption=f"📤 {dataset}: строк {written:,}, каналов {len(allowed)}"
+        )
+    except Exception as e:
+        logger.error(f"Ошибка в команде /export: {e}", exc_info=True)
+        await message.reply("Произошла ошибка при выгрузке.")
+    finally:
+        if path and os.path.exists(path):
+            os.remove(path)
+
+# Лучшее время считается по постам за последние BEST_TIME_DAYS дней, если период не указан
+BEST_TIME_DAYS = 90
+
+@dp.message(Command("best_time"))
+async def best_time_command(message: types.Message):
+    """Лучшее время для публикаций по часовому поясу канала: /best_time [канал] [дней]"""
+    try:
+        args = message.text.split()[1:]
+        days = int(args.pop()) if args and args[-1].isdigit() else BEST_TIME_DAYS
+        allowed = admin_channels(message.from_user.id, args)
+        if not allowed:
+            await message.reply("Нет доступных каналов")
+            return
+
+        offsets = {str(data["chat_id"]): data.get("timezone", 0) for data in allowed.values()}
+        # Группировка по всем каналам - один запрос к журналу в отдельном потоке
+        stats = await asyncio.to_thread(
+            engagement_by_local_time, CONFIG["METRICS"]["PATH"], offsets, time.time() - days * DAY
+        )
+        reports = []
+        for channel_id, data in allowed.items():
+            cells = stats.get(str(data["chat_id"]))
+            reports.append(format_posting_time(
+                data.get("title", channel_id), PostingTimeReport(cells) if cells else None,
+                data.get("timezone", 0), days
+            ))
+        # Отчеты нескольких каналов склеиваются в сообщения до лимита Telegram
+        text = ""
+        for report in reports:
+            if text and len(text) + len(report) > 4000:
+                await message.reply(text)
+                text = ""
+            text += report + "\n"
+        await message.reply(text)
+    except Exception as e:
+        logger.error(f"Ошибка в команде /best_time: {e}", exc_info=True)
+        await message.reply("Произошла ошибка при обработке вашего запроса.")
+
+@dp.message(Command("profile"))
+async def profile_command(message: types.Message):
+    """Семплирующее профилирование работающего бота: /profile [секунд] (только супер-админ)"""
+    if message.from_user.id != SUPER_ADMIN_ID:
+        await message.reply("Команда доступна только супер-администратору")
+        return
+    try:
+        args = message.text.split()[1:]
+        seconds = min(int(args[0]) if args and args[0].isdigit() else 30, CONFIG["PROFILING"]["MAX_SECONDS"])
+        if profile_lock.locked():
+            await message.reply("Профилирование уже идет")
+            return
+        async with profile_lock:
+            await message.reply(f"🩺 Профилирую {seconds} с...")
+            # Стеки снимаются из отдельного потока, event loop продолжает работать как обычно
+            report = await asyncio.to_thread(profiler.sample, seconds)
+        stats = stall_detector.stats()
+        await message.reply_document(
+            BufferedInputFile(report.render().encode("utf-8"), filename=f"profile_{int(time.time())}.txt"),
+            caption=(
+                f"🩺 Профиль за {report.duration:.0f} с\n"
+                f"Блокировок loop > {stats['threshold']} с: {stats['stalls']}, "
+                f"макс. задержка: {stats['max_lag']:.2f} с"
+            )
+        )
+    except Exception as e:
+        logger.error(f"Ошибка в команде /profile: {e}", exc_info=True)
+        await message.reply("Произошла ошибка при обработке вашего запроса.")
+
+@text_router.exact("📊 Статистика")
 async def handle_stats(message: types.Message):
     try:
-        stats_text = "📊 Статистика каналов:\n\n"
         if not channels:
-            stats_text = "Нет отслеживаемых каналов"
-        else:
-            for chat_id, data in channels.items():
-                stats_text += (
-                    f"📌 {data.get('title', chat_id)}\n"
-                    f"👥 Подписчиков: {data.get('subscribers', 0):,}\n"
-                    f"🕒 Часовой пояс: {data.get('timezone', 0):+.2f}\n\n"
+            await message.reply(
+                "Нет отслеживаемых каналов",
+                reply_markup=ReplyKeyboardMarkup(
+                    keyboard=[[KeyboardButton(text="◀️ Назад")]],
+                    resize_keyboard=True
                 )
-        
-        await message.reply(
-            stats_text,
-            reply_markup=ReplyKeyboardMarkup(
-                keyboard=[[KeyboardButton(text="◀️ Назад")]],
-                resize_keyboard=True
             )
-        )
+            return
+
+        text, markup = channel_pager.render("stats", 0, channels)
+        await message.reply(text, reply_markup=markup)
     except Exception as e:
         logger.error(f"Ошибка при отображении статистики: {e}")
         await message.reply("Произошла ошибка при обработке запроса")
 
-@dp.message(lambda message: message.text == "◀️ Назад")
+@text_router.exact("◀️ Назад")
 async def back_to_main_menu(message: types.Message):
     """Обработчик кнопки Назад - возврат в главное меню"""
     try:
@@ -333,12 +532,12 @@ async def back_to_main_menu(message: types.Message):
         logger.error(f"Ошибка при возврате в главное меню: {e}")
         await message.reply("Произошла ошибка при обработке запроса")
 
-@dp.message(lambda message: message.text == "❓ Помощь")
+@text_router.exact("❓ Помощь")
 async def handle_help(message: types.Message):
     """Обработчик кнопки Помощь"""
     await help_command(message)
 
-@dp.message(lambda message: message.text == "🗑 Удалить канал")
+@text_router.exact("🗑 Удалить канал")
 async def handle_delete_channel(message: types.Message):
     try:
         if not channels:
@@ -352,34 +551,30 @@ async def handle_delete_channel(message: types.Message):
             )
             return
 
-        text = "Выберите канал для удаления:\n\n"
-        keyboard = []
-        
-        for channel_id, data in channels.items():
-            text += f"📌 {data.get('title', channel_id)}\n"
-            text += f"ID: {channel_id}\n\n"
-            keyboard.append([KeyboardButton(text=f"❌ {channel_id}")])
-        
-        keyboard.append([KeyboardButton(text="◀️ Назад")])
-        
-        await message.reply(
-            text,
-            reply_markup=ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
-        )
+        text, markup = channel_pager.render("delete", 0, channels)
+        await message.reply(text, reply_markup=markup)
     except Exception as e:
         logger.error(f"Ошибка при отображении списка каналов для удаления: {e}")
         await message.reply("Произошла ошибка при обработке запроса")
 
-@dp.message(lambda message: message.text.startswith("❌ "))
+def delete_channel(channel_id: str):
+    """Удаляет канал из реестра и возвращает его название (None, если канала нет)"""
+    if channel_id not in channels:
+        return None
+    channel_title = channels[channel_id].get('title', channel_id)
+    if "chat_id" in channels[channel_id]:
+        metrics_store.forget(channels[channel_id]["chat_id"])
+    del channels[channel_id]
+    save_channels()
+    return channel_title
+
+@text_router.prefix("❌ ")
 async def confirm_delete_channel(message: types.Message):
     try:
         channel_id = message.text[2:]  # Убираем "❌ "
+        channel_title = delete_channel(channel_id)
         
-        if channel_id in channels:
-            channel_title = channels[channel_id].get('title', channel_id)
-            del channels[channel_id]
-            save_channels()
-            
+        if channel_title is not None:
             await message.reply(
                 f"✅ Канал {channel_title} успешно удален",
                 reply_markup=ReplyKeyboardMarkup(
@@ -403,143 +598,353 @@ async def confirm_delete_channel(message: types.Message):
         logger.error(f"Ошибка при удалении канала: {e}")
         await message.reply("Произошла ошибка при удалении канала")
 
+@dp.callback_query(ChannelPageCallback.filter())
+async def handle_channel_page(callback: types.CallbackQuery, callback_data: ChannelPageCallback):
+    """Переход между страницами списков каналов"""
+    try:
+        text, markup = channel_pager.render(callback_data.kind, callback_data.page, channels)
+        await callback.message.edit_text(text, reply_markup=markup)
+        await callback.answer()
+    except Exception as e:
+        logger.error(f"Ошибка при переключении страницы: {e}")
+        await callback.answer("Не удалось открыть страницу")
+
+@dp.callback_query(ChannelActionCallback.filter(F.action == "open"))
+async def handle_channel_open(callback: types.CallbackQuery, callback_data: ChannelActionCallback, state: FSMContext):
+    """Открывает настройки канала из списка"""
+    try:
+        await show_channel_settings(callback.message, callback_data.channel_id, state)
+        await callback.answer()
+    except Exception as e:
+        logger.error(f"Ошибка при отображении настроек канала: {e}")
+        await callback.answer("Произошла ошибка при обработке запроса")
+
+@dp.callback_query(ChannelActionCallback.filter(F.action == "stats"))
+async def handle_channel_stats(callback: types.CallbackQuery, callback_data: ChannelActionCallback):
+    """Подробная статистика одного канала"""
+    try:
+        channel_data = channels.get(callback_data.channel_id)
+        if not channel_data:
+            await callback.answer("Канал не найден")
+            return
+
+        aggregate = metrics_store.get(channel_data["chat_id"]) if "chat_id" in channel_data else None
+        await callback.message.answer(
+            format_channel_stats(callback_data.channel_id, channel_data, aggregate, detailed=True)
+        )
+        await callback.answer()
+    except Exception as e:
+        logger.error(f"Ошибка при отображении статистики канала: {e}")
+        await callback.answer("Произошла ошибка при обработке запроса")
+
+@dp.callback_query(ChannelActionCallback.filter(F.action == "delete"))
+async def handle_channel_delete(callback: types.CallbackQuery, callback_data: ChannelActionCallback):
+    """Удаляет канал из списка и обновляет страницу"""
+    try:
+        channel_title = delete_channel(callback_data.channel_id)
+        if channel_title is None:
+            await callback.answer("Канал не найден")
+            return
+
+        await callback.answer(f"✅ Канал {channel_title} удален")
+        if channels:
+            text, markup = channel_pager.render("delete", 0, channels)
+            await callback.message.edit_text(text, reply_markup=markup)
+        else:
+            await callback.message.edit_text("Список отслеживаемых каналов пуст.")
+    except Exception as e:
+        logger.error(f"Ошибка при удалении канала: {e}")
+        await callback.answer("Произошла ошибка при удалении канала")
+
+@dp.callback_query(F.data == NOOP_CALLBACK)
+async def handle_noop_callback(callback: types.CallbackQuery):
+    await callback.answer()
+
+# Расписание обновления подписчиков: у каждого канала свой интервал
+refresh_scheduler = RefreshScheduler(
+    CONFIG["UPDATE_INTERVALS"]["SUBSCRIBERS_MIN"],
+    CONFIG["UPDATE_INTERVALS"]["SUBSCRIBERS_MAX"],
+    CONFIG["UPDATE_INTERVALS"]["SUBSCRIBERS"]
+)
+
+# channels.json сохраняется не чаще раза в минуту, а не после каждого обновления
+CHANNELS_SAVE_INTERVAL = 60
+
+def subscriber_rate(chat_id: str):
+    """Начальная оценка скорости изменения подписчиков канала по суточной истории"""
+    aggregate = metrics_store.get(chat_id)
+    delta = aggregate.subscriber_delta(1) if aggregate else None
+    return None if delta is None else abs(delta) / 86400
+
 async def update_subscribers_count():
+    """Обновляет число подписчиков каждого канала по его собственному расписанию"""
+    changed, saved_at = False, time.monotonic()
     while True:
         try:
-            for channel_id, data in channels.items():
+            channel_ids = {
+                str(data["chat_id"]): channel_id for channel_id, data in channels.items() if "chat_id" in data
+            }
+            refresh_scheduler.sync(
+                {chat_id: channels[channel_id].get("subscribers", 0) for chat_id, channel_id in channel_ids.items()},
+                time.time(), subscriber_rate
+            )
+            for chat_id in refresh_scheduler.pop_due(time.time()):
+                channel_id = channel_ids[chat_id]
                 try:
-                    if "chat_id" in data:
-                        count = await bot.get_chat_member_count(data["chat_id"])
-                        channels[channel_id]["subscribers"] = count
-                        logger.info(f"Обновлено количество подписчиков для {channel_id}: {count}")
+                    count = await bot.get_chat_member_count(channels[channel_id]["chat_id"])
+                    channels[channel_id]["subscribers"] = count
+                    metrics_store.record_subscribers(chat_id, count)
+                    interval = refresh_scheduler.record(chat_id, count, time.time())
+                    changed = True
+                    logger.info(f"Обновлено количество подписчиков для {channel_id}: {count}, "
+                                f"следующее обновление через {interval / 60:.0f} мин")
                 except Exception as e:
+                    refresh_scheduler.retry(chat_id, time.time())
                     logger.error(f"Ошибка при обновлении подписчиков канала {channel_id}: {e}")
-            save_channels()
+            if changed and time.monotonic() - saved_at >= CHANNELS_SAVE_INTERVAL:
+                save_channels()
+                changed, saved_at = False, time.monotonic()
         except Exception as e:
             logger.error(f"Ошибка при обновлении подписчиков: {e}")
-        await asyncio.sleep(CONFIG["UPDATE_INTERVALS"]["SUBSCRIBERS"])
+        # Новые каналы подхватываются не позже чем через минуту
+        next_due = refresh_scheduler.next_due()
+        await asyncio.sleep(min(60, max(1, next_due - time.time())) if next_due else 60)
+
+async def run_backfill(chat_id):
+    """Загружает историю канала в журнал метрик в фоне"""
+    try:
+        channel_data = find_channel_by_chat_id(channels, chat_id)
+        if channel_data is None:
+            return
+        if await backfill_channel(get_client_pool(), metrics_store, chat_id, channel_data.get('subscribers', 0),
+                                  CONFIG["BACKFILL"], CONFIG["METRICS_CHECK_DELAY"]):
+            channel_pager.invalidate()
+    except Exception as e:
+        logger.error(f"Ошибка при загрузке истории канала {chat_id}: {e}", exc_info=True)
+
+def save_state():
+    """Сохраняет кэши и незавершенные проверки метрик в снимок для теплого перезапуска"""
+    started = time.perf_counter()
+    size = save_snapshot(CONFIG["SNAPSHOT"]["PATH"], {
+        "saved_at": time.time(),
+        "pending_metric_checks": metric_jobs.dump_state(),
+        "post_checks": post_check_cache.dump_state(),
+        "near_duplicates": near_duplicates.dump_state(),
+        "forecast": early_forecaster.dump_state(),
+        "live_metrics": live_metrics.dump_state(),
+        "refresh": refresh_scheduler.dump_state(),
+        "sessions": client_pool.dump_state() if client_pool else {},
+    })
+    logger.info(f"Снимок состояния сохранен: {size / 1024:.1f} КБ, проверок метрик: {len(metric_jobs)}, "
+                f"за {time.perf_counter() - started:.3f} с")
+
+def restore_state():
+    """Восстанавливает снимок предыдущего запуска и возобновляет отложенные проверки метрик"""
+    path = CONFIG["SNAPSHOT"]["PATH"]
+    started = time.perf_counter()
+    state = load_snapshot(path)
+    if not state:
+        return
+    post_check_cache.load_state(state.get("post_checks", []))
+    near_duplicates.load_state(state.get("near_duplicates", []))
+    early_forecaster.load_state(state.get("forecast", []))
+    live_metrics.load_state(state.get("live_metrics", []))
+    refresh_scheduler.load_state(state.get("refresh", {}))
+    get_client_pool().load_state(state.get("sessions", {}))
+    jobs = metric_jobs.load_state(state.get("pending_metric_checks", []))
+    for job in jobs:
+        if not job.text_checked:
+            asyncio.create_task(run_text_check(job))
+    # Снимок одноразовый: если следующая остановка будет аварийной, эти проверки не запустятся второй раз
+    os.remove(path)
+    logger.info(f"Снимок состояния от {datetime.fromtimestamp(state.get('saved_at', 0)):%Y-%m-%d %H:%M:%S} "
+                f"восстановлен за {time.perf_counter() - started:.3f} с: проверок метрик {len(jobs)}, "
+                f"постов в кэше проверок {len(post_check_cache)}, на прогнозе {len(early_forecaster)}")
+
+async def shutdown():
+    """Плавная остановка после завершения polling: новые посты уже не принимаются.
+
+    Начатые проверки дорабатываются не дольше SNAPSHOT.DRAIN_TIMEOUT секунд,
+    недособранные альбомы проверяются, после чего сохраняется снимок.
+    """
+    deadline = time.monotonic() + CONFIG["SNAPSHOT"]["DRAIN_TIMEOUT"]
+    await in_flight.wait(deadline - time.monotonic())
+    try:
+        await asyncio.wait_for(album_coalescer.close(), max(0.0, deadline - time.monotonic()))
+    except asyncio.TimeoutError:
+        logger.warning("Остановка: не все недособранные альбомы успели проверить")
+    if not await in_flight.wait(deadline - time.monotonic()):
+        logger.warning(f"Остановка: не завершено проверок: {in_flight.count}; "
+                       f"прерванные проверки метрик повторятся после запуска")
+    try:
+        metrics_store.record_samples(live_metrics.drain())
+        if early_forecaster.curves.dirty:
+            early_forecaster.curves.save()
+        save_state()
+    except Exception as e:
+        logger.error(f"Ошибка при сохранении снимка состояния: {e}", exc_info=True)
 
 async def main():
-    await client.start()
-    logger.info("Клиент Telethon подключен.")
+    await get_client_pool().start()
+    logger.info(f"Клиент Telethon подключен (сессий: {len(get_client_pool().sessions)}).")
+    try:
+        live_metrics.attach(session.client for session in get_client_pool().sessions.values())
+    except Exception as e:
+        logger.error(f"Не удалось подписаться на обновления метрик, остаются только запросы: {e}")
+    # Теплый перезапуск: кэши, расписания и отложенные проверки из снимка предыдущего запуска
+    try:
+        restore_state()
+    except Exception as e:
+        logger.error(f"Ошибка при восстановлении снимка состояния: {e}", exc_info=True)
     print("Бот запущен...")
+    # openai импортируется в фоне заранее, чтобы не задерживать проверку первого поста
+    asyncio.create_task(openai_client(CONFIG["OPENAI_API_KEY"]))
+    asyncio.create_task(stall_detector.run())
+    asyncio.create_task(metric_checks_loop())
     asyncio.create_task(update_subscribers_count())
+    asyncio.create_task(forecast_loop())
+    asyncio.create_task(live_metrics_loop())
+    # Продолжаем прерванные загрузки истории
+    for chat_id in metrics_store.pending_backfills():
+        asyncio.create_task(run_backfill(chat_id))
     try:
         await dp.start_polling(bot)
     finally:
+        await shutdown()
+        await get_client_pool().disconnect()
+        await dp.storage.close()
+        metrics_store.close()
+        seen_posts.close()
         await bot.session.close()
 
 @dp.message(Command("cancel"))
-async def cancel_command(message: types.Message):
-    global waiting_for_channel
-    if waiting_for_channel:
-        waiting_for_channel = False
+async def cancel_command(message: types.Message, state: FSMContext):
+    current_state = await state.get_state()
+    if current_state == ChannelForm.waiting_for_channel.state:
+        await state.clear()
         await message.reply("Добавление канала отменено.")
+    elif current_state is not None:
+        await state.clear()
+        await message.reply("Операция отменена.")
     else:
         await message.reply("Нет активных операций для отмены.")
 
 @dp.channel_post()
 async def handle_channel_post(message: types.Message):
-    """Обрабатывает новые посты в каналах"""
-    try:
-        chat_id = str(message.chat.id)
-        logger.info(f"Получен новый пост из канала {message.chat.title or chat_id}")
+    """Обрабатывает новые посты в каналах; части альбома собираются в один пост"""
+    # Повторная доставка (перезапуск, повтор запроса) отбрасывается до проверки GPT и отложенных задач.
+    # Обработанным пост отмечается только после проверки: если бот упадет раньше, повтор его проверит
+    key = (message.chat.id, message.message_id)
+    if key in processing_posts or key in seen_posts:
+        logger.info(f"Пост {message.message_id} из канала {message.chat.id} уже обработан, пропускаем")
+        return
+    processing_posts.add(key)
+    await album_coalescer.add(message)
+
+async def process_channel_post(post: LogicalPost):
+    """Проверяет пост (одиночный или альбом) и запускает отложенную проверку метрик"""
+    with in_flight.track():
+        try:
+            chat_id = str(post.chat_id)
+            logger.info(f"Получен новый пост из канала {post.first.chat.title or chat_id}")
         
-        channel_data = None
-        for channel_id, data in channels.items():
-            if str(data.get('chat_id')) == chat_id:
-                channel_data = data
-                break
-                
-        if not channel_data:
-            logger.error(f"Канал {chat_id} не найден в базе")
-            return
+            channel_data = find_channel_by_chat_id(channels, chat_id)
+            if not channel_data:
+                logger.error(f"Канал {chat_id} не найден в базе")
+                return
 
-        # Проверяем текст
-        if message.text:
-            # Проверка орфографии и содержания
-            spelling_result = await check_spelling(message.text, CONFIG["OPENAI_API_KEY"])
+            # Проверяем текст и подписи к медиа
+            text = post.text
+            if text:
+                # Проверка орфографии и содержания; у копии уже проверенного поста - только измененных предложений
+                spelling_result, _ = await near_duplicates.check(text, check_text)
+                post_check_cache.remember(
+                    post.chat_id, {part.message_id: part.text or part.caption or "" for part in post.messages},
+                    spelling_result
+                )
             
-            # Проверяем решение GPT
-            if spelling_result["decision"] == "/false_no":
-                error_message = f"📝 Результаты проверки поста:\n\n"
-                error_message += f"📌 Канал: {channel_data.get('title', chat_id)}\n"
-                error_message += f"🔢 ID поста: {message.message_id}\n"
-                error_message += f"🔗 Ссылка: https://t.me/c/{str(chat_id)[4:]}/{message.message_id}\n\n"
-                error_message += f"📄 Текст поста:\n{message.text[:200]}{'...' if len(message.text) > 200 else ''}\n\n"
-                
-                has_serious_issues = False
-                
-                # Проверка орфографии
-                if spelling_result["categories"]["spelling"]:
-                    error_message += "🔍 Орфографические ошибки:\n"
-                    spelling_details = spelling_result['details']['spelling_details']
-                    if isinstance(spelling_details, list):
-                        spelling_details = "\n".join(map(str, spelling_details))
-                    for error in (spelling_details.split('\n') if isinstance(spelling_details, str) else spelling_details):
-                        if isinstance(error, str) and error.strip():
-                            error_message += f"• {error.strip()}\n"
-                    error_message += "\n"
-                    has_serious_issues = True
-                
-                # Проверка грамматики с детальным выводом
-                if spelling_result["categories"]["grammar"]:
-                    error_message += "📝 Грамматические ошибки:\n"
-                    grammar_details = spelling_result['details']['grammar_details']
-                    if isinstance(grammar_details, list):
-                        grammar_details = "\n".join(map(str, grammar_details))
-                    for error in (grammar_details.split('\n') if isinstance(grammar_details, str) else grammar_details):
-                        if isinstance(error, str) and error.strip():
-                            error_message += f"• {error.strip()}\n"
-                    error_message += "\n"
-                    has_serious_issues = True
+                # Проверяем решение GPT
+                if spelling_result["decision"] == "/false_no":
+                    error_message, has_serious_issues = build_spelling_report(
+                        channel_data.get('title', chat_id), chat_id, post.message_id,
+                        text, spelling_result
+                    )
+                    if has_serious_issues:
+                        await notify_admins(channel_data, error_message, bot, SUPER_ADMIN_ID, post.first)
                 
-                # Проверка читабельности
-                readability = spelling_result["categories"]["readability"]
-                error_message += (
-                    f"📚 Читабельность: {readability['score']}/10\n"
-                    f"Уровень: {readability['level']}\n"
-                    f"{spelling_result['details']['readability_details']}\n"
+            # Запускаем отложенную проверку метрик (одну на весь альбом)
+            logger.info("Запуск отложенной проверки метрик")
+            schedule_metric_check(chat_id, post.message_id, channel_data.get('subscribers', 0),
+                                  post.message_ids, post.first.date.timestamp())
+            live_metrics.watch(chat_id, post.message_ids)
+            early_forecaster.track(chat_id, post.message_ids, post.first.date.timestamp(),
+                                   channel_data.get('subscribers', 0))
+            # Свежий пост - повод обновить подписчиков канала раньше
+            refresh_scheduler.touch(chat_id, time.time())
+            
+        except Exception as e:
+            logger.error(f"Ошибка при обработке поста: {e}", exc_info=True)
+        finally:
+            for message_id in post.message_ids:
+                seen_posts.add(post.chat_id, message_id)
+                processing_posts.discard((post.chat_id, message_id))
+
+album_coalescer = AlbumCoalescer(process_channel_post, window=CONFIG["POST_SETTINGS"]["ALBUM_WINDOW"])
+
+# Ранние замеры постов и прогноз метрик через 24 ч
+early_forecaster = EarlyForecaster(
+    GrowthCurves(CONFIG["FORECAST"]["PATH"], CONFIG["FORECAST"]["MIN_SAMPLES"]),
+    CONFIG["FORECAST"]["CHECKPOINTS"], CONFIG["FORECAST"]["CONFIDENCE"]
+)
+
+# Результаты проверок по абзацам: после редактирования перепроверяются только измененные абзацы
+post_check_cache = PostCheckCache()
+
+# Проверенные посты всех каналов для переиспользования вердиктов у похожих постов
+near_duplicates = NearDuplicateIndex(
+    CONFIG["NEAR_DUPLICATES"]["THRESHOLD"], CONFIG["NEAR_DUPLICATES"]["MAX_POSTS"],
+    CONFIG["NEAR_DUPLICATES"]["MAX_AGE_HOURS"], CONFIG["NEAR_DUPLICATES"]["MAX_CHANGED"]
+)
+
+# Выполняющиеся проверки (их дожидается остановка бота) и очередь отложенных проверок метрик
+in_flight = InFlight()
+metric_jobs = MetricJobQueue()
+
+async def check_text(text: str) -> dict:
+    return await check_spelling(text, CONFIG["OPENAI_API_KEY"])
+
+@dp.edited_channel_post()
+async def handle_edited_channel_post(message: types.Message):
+    """Перепроверяет отредактированный пост; в GPT уходят только измененные абзацы"""
+    with in_flight.track():
+        try:
+            chat_id = str(message.chat.id)
+            channel_data = find_channel_by_chat_id(channels, chat_id)
+            if not channel_data:
+                return
+
+            text = message.text or message.caption or ""
+            result, previous, checked = await post_check_cache.recheck(
+                message.chat.id, {message.message_id: text}, check_text
+            )
+            if not checked:
+                logger.info(f"Пост {message.message_id} отредактирован без изменения текста")
+                return
+
+            # Уведомляем только о новых проблемах, о старых админы уже знают
+            new_findings = result_findings(result) - (result_findings(previous) if previous else set())
+            if result["decision"] == "/false_no" and (previous is None or new_findings):
+                error_message, has_serious_issues = build_spelling_report(
+                    channel_data.get('title', chat_id), chat_id, message.message_id, text, result
                 )
-                
-                # Добавляем рекомендации по улучшению
-                if "improvements" in spelling_result:
-                    improvements = spelling_result["improvements"]
-                    if any(improvements.values()):
-                        error_message += "\n💡 Рекомендации по улучшению:\n"
-                        
-                        if improvements["corrections"]:
-                            error_message += "\n✍️ Исправления:\n"
-                            error_message += "\n".join(f"• {correction}" for correction in improvements["corrections"])
-                            
-                        if improvements["structure"]:
-                            error_message += "\n\n📝 Структура текста:\n"
-                            error_message += "\n".join(f"• {suggestion}" for suggestion in improvements["structure"])
-                            
-                        if improvements["readability"]:
-                            error_message += "\n\n📚 Читабельность:\n"
-                            error_message += "\n".join(f"• {tip}" for tip in improvements["readability"])
-                            
-                        if improvements["engagement"]:
-                            error_message += "\n\n🎯 Вовлечение аудитории:\n"
-                            error_message += "\n".join(f"• {idea}" for idea in improvements["engagement"])
-                
                 if has_serious_issues:
-                    await notify_admins(channel_data, error_message, bot, SUPER_ADMIN_ID, message)
-                
-        # Запускаем отложенную проверку метрик
-        logger.info("Запуск отложенной проверки метрик")
-        asyncio.create_task(check_post_metrics_later(client, bot, chat_id, message.message_id, 
-                                                   channel_data.get('title', chat_id), 
-                                                   channel_data.get('subscribers', 0), 
-                                                   channel_data.get('admins', []),
-                                                   SUPER_ADMIN_ID))
-            
-    except Exception as e:
-        logger.error(f"Ошибка при обработке поста: {e}", exc_info=True)
+                    await notify_admins(channel_data, "✏️ Пост отредактирован\n\n" + error_message,
+                                        bot, SUPER_ADMIN_ID, message)
+        except Exception as e:
+            logger.error(f"Ошибка при перепроверке отредактированного поста: {e}", exc_info=True)
 
-@dp.message(lambda message: waiting_for_channel)
-async def process_channel_addition(message: types.Message):
+@dp.message(ChannelForm.waiting_for_channel, F.text, ~F.text.startswith("/"))
+async def process_channel_addition(message: types.Message, state: FSMContext):
     """Обрабатывает добавление канала"""
     try:
         parts = message.text.split()
@@ -586,6 +991,9 @@ async def process_channel_addition(message: types.Message):
             "admins": [message.from_user.id]
         }
         save_channels()
+        metrics_store.record_subscribers(chat.id, subscribers)
+        asyncio.create_task(run_backfill(chat.id))
+        await state.clear()
         
         channel_info = (
             f"✅ Канал успешно добавлен!\n\n"
@@ -617,40 +1025,38 @@ async def process_channel_addition(message: types.Message):
         logger.error(f"Ошибка при добавлении канала: {e}", exc_info=True)
         await message.reply("Произошла ошибка при добавлении канала.")
 
-async def get_post_metrics(client, chat_id: str, message_id: int) -> dict:
-    """Получает метрики поста (просмотры и реакции) используя Telethon"""
+async def get_post_metrics(pool: ClientPool, chat_id: str, message_id: int) -> dict:
+    """Получает метрики поста (просмотры и реакции) через сессию канала в пуле Telethon"""
     try:
         logger.info(f"Начинаем получение метрик для поста {message_id} в канале {chat_id}")
-        
-        # Проверяем подключение к Telethon
-        if not client.is_connected():
-            logger.info("Telethon не подключен, выполняем подключение...")
-            await client.connect()
-            
-        if not await client.is_user_authorized():
-            logger.info("Пользователь не авторизован, выполняем авторизацию...")
-            await client.start()
-            
-        logger.info("Telethon подключен и авторизован")
 
-        # Пробуем получить сущность канала
-        try:
+        async def read_message(client):
+            # Проверяем подключение к Telethon
+            if not client.is_connected():
+                logger.info("Telethon не подключен, выполняем подключение...")
+                await client.connect()
+
+            if not await client.is_user_authorized():
+                logger.info("Пользователь не авторизован, выполняем авторизацию...")
+                await client.start()
+
             channel_entity = await client.get_entity(int(chat_id))
             logger.info(f"Получена сущность канала: {channel_entity.title} (id: {channel_entity.id})")
+            return await client.get_messages(channel_entity, ids=message_id)
+
+        # FloodWait обрабатывает пул: запрос уходит к другой сессии
+        try:
+            message = await pool.call(chat_id, read_message)
         except ValueError as e:
             logger.error(f"Ошибка при получении сущности канала: {e}")
             return None
-
-        # Получаем сообщение
-        try:
-            message = await client.get_messages(channel_entity, ids=message_id)
-            if not message:
-                logger.error(f"Сообщение {message_id} не найдено")
-                return None
-            logger.info(f"Получено сообщение {message_id}")
         except Exception as e:
             logger.error(f"Ошибка при получении сообщения: {e}")
             return None
+        if not message:
+            logger.error(f"Сообщение {message_id} не найдено")
+            return None
+        logger.info(f"Получено сообщение {message_id}")
 
         # Собираем все возможные метрики
         metrics = {
@@ -692,145 +1098,246 @@ async def get_post_metrics(client, chat_id: str, message_id: int) -> dict:
         logger.error(f"Ошибка при получении метрик поста {message_id} из канала {chat_id}: {e}", exc_info=True)
         return None
 
-async def check_post_metrics_later(client, bot, chat_id: str, message_id: int, channel_title: str, subscribers: int, admins: list, super_admin_id: int):
-    """Проверяет метрики поста через 24 часа"""
+async def fetch_post_metrics(pool: ClientPool, chat_id: str, message_ids: list) -> dict:
+    """Метрики поста; для альбома сводятся по всем его сообщениям.
+
+    Если по посту недавно приходили обновления от Telegram, запрос не нужен.
+    """
+    live = live_metrics.snapshot(chat_id, message_ids, CONFIG["LIVE_METRICS"]["MAX_AGE"])
+    if live is not None:
+        return live
+    parts = await asyncio.gather(*(get_post_metrics(pool, chat_id, part_id) for part_id in message_ids))
+    for part_id, metrics in zip(message_ids, parts):
+        live_metrics.observe(chat_id, part_id, metrics)
+    return merge_post_metrics(parts) if len(parts) > 1 else parts[0]
+
+async def live_metrics_loop():
+    """Сбрасывает накопленные обновления метрик в журнал пачками"""
+    while True:
+        await asyncio.sleep(CONFIG["LIVE_METRICS"]["FLUSH_INTERVAL"])
+        try:
+            samples = live_metrics.drain()
+            metrics_store.record_samples(samples)
+            if samples:
+                logger.info(f"Записано точек метрик: {len(samples)}, статистика: {live_metrics.stats}")
+        except Exception as e:
+            logger.error(f"Ошибка при записи обновлений метрик: {e}", exc_info=True)
+
+def channel_baseline(chat_id: str):
+    aggregate = metrics_store.get(chat_id)
+    return aggregate.baseline() if aggregate else None
+
+async def forecast_loop():
+    """Делает ранние замеры постов и предупреждает, если прогноз на 24 ч ниже нормы"""
+    names = {"views": ("👁", "Просмотры"), "reactions": ("❤️", "Реакции"), "forwards": ("🔄", "Пересылки")}
+    while True:
+        try:
+            due = early_forecaster.due(time.time())
+            if due:
+                fetched = await asyncio.gather(
+                    *(fetch_post_metrics(get_client_pool(), post.chat_id, post.message_ids) for post, _ in due)
+                )
+                for (post, checkpoint), metrics in zip(due, fetched):
+                    early_forecaster.add_sample(post, checkpoint, metrics)
+
+                posts = [post for post, _ in due]
+                for post, forecast in zip(posts, early_forecaster.forecast(posts, channel_baseline)):
+                    if not forecast or not forecast["below_norm"] or post.alerted:
+                        continue
+                    post.alerted = True
+                    channel_data = find_channel_by_chat_id(channels, post.chat_id) or {}
+                    text = (
+                        f"⏱ Ранний прогноз поста\n\n"
+                        f"📊 Канал: {channel_data.get('title', post.chat_id)}\n"
+                        f"🔗 https://t.me/c/{post.chat_id[4:]}/{post.message_id}\n\n"
+                        f"Прогноз на 24 ч по замеру через {forecast['checkpoint'] // 60} мин:\n"
+                    )
+                    for metric, (center, low, high) in forecast["prediction"].items():
+                        emoji, name = names[metric]
+                        mark = "❌" if metric in forecast["below_norm"] else "✅"
+                        text += (
+                            f"{mark} {emoji} {name}: ~{center:,.0f} ({low:,.0f}–{high:,.0f}), "
+                            f"норма {forecast['norms'][metric]:,}\n"
+                        )
+                    for admin_id in channel_data.get('admins', []):
+                        try:
+                            await bot.send_message(admin_id, text)
+                        except Exception as e:
+                            logger.error(f"Ошибка при отправке прогноза админу {admin_id}: {e}")
+            # Кривые, обученные на завершенных постах, записываются не чаще раза за цикл и не в event loop
+            curves = early_forecaster.curves
+            if curves.dirty:
+                await asyncio.to_thread(save_json, curves.path, curves.snapshot())
+        except Exception as e:
+            logger.error(f"Ошибка при расчете раннего прогноза: {e}", exc_info=True)
+        await asyncio.sleep(CONFIG["FORECAST"]["INTERVAL"])
+
+def schedule_metric_check(chat_id: str, message_id: int, subscribers: int, message_ids: list = None,
+                          posted_at: float = None) -> MetricJob:
+    """Ставит пост в очередь проверки метрик и запускает этап 1; для альбома message_ids - все его сообщения"""
+    job = MetricJob(chat_id, message_id, subscribers, time.time() + CONFIG["METRICS_CHECK_DELAY"],
+                    message_ids, posted_at)
+    metric_jobs.push(job)
+    asyncio.create_task(run_text_check(job))
+    return job
+
+async def run_text_check(job: MetricJob):
+    """ЭТАП 1 отложенной проверки: текст поста"""
     try:
-        # Ищем канал по chat_id
-        channel_info = None
-        for channel_id, data in channels.items():
-            if str(data.get('chat_id')) == chat_id:
-                channel_info = data
-                break
-        
+        channel_info = find_channel_by_chat_id(channels, job.chat_id)
         if channel_info is None:
-            logger.error(f"Канал {chat_id} не найден в конфигурации")
+            logger.error(f"Канал {job.chat_id} не найден в конфигурации")
             return
-            
-        # ЭТАП 1: Проверка текста
-        logger.info(f"🔄 ЭТАП 1: Проверка текста поста {message_id}")
+        with in_flight.track():
+            await check_post_text(get_client_pool(), bot, job.chat_id, job.message_id, job.ids,
+                                  channel_info.get('title', job.chat_id), channel_info, SUPER_ADMIN_ID)
+        job.text_checked = True
+    except Exception as e:
+        logger.error(f"Ошибка при проверке текста: {e}", exc_info=True)
+
+async def run_metric_check(job: MetricJob):
+    """ЭТАП 2 отложенной проверки: метрики поста, срок которой наступил.
+
+    Название и админы берутся из реестра каналов на момент проверки.
+    """
+    try:
+        channel_info = find_channel_by_chat_id(channels, job.chat_id)
+        if channel_info is None:
+            logger.error(f"Канал {job.chat_id} не найден в конфигурации")
+            return
+        with in_flight.track():
+            await check_metrics(get_client_pool(), bot, job.chat_id, job.message_id, job.ids,
+                                channel_info.get('title', job.chat_id), job.subscribers,
+                                channel_info.get('admins', []), job.posted_at)
+    except Exception as e:
+        logger.error(f"Ошибка при проверке метрик: {e}", exc_info=True)
+    finally:
+        metric_jobs.done(job)
+
+async def metric_checks_loop():
+    """Запускает проверки метрик, срок которых наступил (по умолчанию через 24 часа после публикации).
+
+    Ожидающий пост - запись MetricJob в очереди, а не спящая сутки
+    корутина: одна задача на все отложенные проверки.
+    """
+    while True:
+        now = time.time()
         try:
-            # Получаем сообщение через Telethon
-            message = await client.get_messages(int(chat_id), ids=message_id)
-            if message and message.text:
-                spelling_result = await check_spelling(message.text, CONFIG["OPENAI_API_KEY"])
-                if spelling_result["has_errors"]:
-                    error_message = f"📝 Результаты проверки поста:\n\n"
-                    error_message += f"📌 Канал: {channel_title}\n"
-                    error_message += f"🔢 ID поста: {message_id}\n"
-                    error_message += f"🔗 Ссылка: https://t.me/c/{str(chat_id)[4:]}/{message_id}\n\n"
-                    error_message += f"📄 Текст поста:\n{message.text[:200]}{'...' if len(message.text) > 200 else ''}\n\n"
-                    
-                    has_serious_issues = False
-                    
-                    # Проверка орфографии
-                    if spelling_result["categories"]["spelling"]:
-                        error_message += "🔍 Орфографические ошибки:\n"
-                        spelling_details = spelling_result['details']['spelling_details']
-                        if isinstance(spelling_details, list):
-                            spelling_details = "\n".join(map(str, spelling_details))
-                        for error in (spelling_details.split('\n') if isinstance(spelling_details, str) else spelling_details):
-                            if isinstance(error, str) and error.strip():
-                                error_message += f"• {error.strip()}\n"
-                        error_message += "\n"
-                        has_serious_issues = True
-                    
-                    # Проверка грамматики с детальным выводом
-                    if spelling_result["categories"]["grammar"]:
-                        error_message += "📝 Грамматические ошибки:\n"
-                        grammar_details = spelling_result['details']['grammar_details']
-                        if isinstance(grammar_details, list):
-                            grammar_details = "\n".join(map(str, grammar_details))
-                        for error in (grammar_details.split('\n') if isinstance(grammar_details, str) else grammar_details):
-                            if isinstance(error, str) and error.strip():
-                                error_message += f"• {error.strip()}\n"
-                        error_message += "\n"
-                        has_serious_issues = True
-                    
-                    # Проверка читабельности
-                    readability = spelling_result["categories"]["readability"]
-                    error_message += (
-                        f"📚 Читабельность: {readability['score']}/10\n"
-                        f"Уровень: {readability['level']}\n"
-                        f"{spelling_result['details']['readability_details']}\n"
-                    )
-                    
-                    if has_serious_issues:
-                        await notify_admins(channel_info, error_message, bot, super_admin_id, message)
+            for job in metric_jobs.pop_due(now):
+                asyncio.create_task(run_metric_check(job))
         except Exception as e:
-            logger.error(f"Ошибка при проверке текста: {e}")
-            
-        # Ждем 30 секунд перед проверкой метрик
-        logger.info(f"⏳ Ожидание 86400 секунд перед проверкой метрик")
-        await asyncio.sleep(86400)  # 86400 секунд
+            logger.error(f"Ошибка в очереди проверок метрик: {e}", exc_info=True)
+        await metric_jobs.wait(now, 60)
+
+async def check_post_text(pool: ClientPool, bot, chat_id: str, message_id: int, message_ids: list,
+                          channel_title: str, channel_info: dict, super_admin_id: int):
+    """Этап 1 отложенной проверки: перепроверяет текст поста, если он изменился после публикации"""
+    logger.info(f"🔄 ЭТАП 1: Проверка текста поста {message_id}")
+    try:
+        # Получаем сообщение (или все части альбома) через Telethon
+        if len(message_ids) > 1:
+            parts = await pool.call(chat_id, lambda client: client.get_messages(int(chat_id), ids=message_ids))
+        else:
+            parts = [await pool.call(chat_id, lambda client: client.get_messages(int(chat_id), ids=message_id))]
+        parts = [part for part in parts if part]
+        message = parts[0] if parts else None
+        # raw_text - текст без разметки, как message.text в aiogram: иначе хэши абзацев
+        # форматированного поста не совпадут с закэшированными при публикации
+        text = join_texts(part.raw_text for part in parts)
+        if text:
+            # Текст, уже проверенный при публикации, повторно в GPT не отправляется
+            spelling_result, previous, checked = await post_check_cache.recheck(
+                chat_id, {part.id: part.raw_text or "" for part in parts}, check_text
+            )
+            # Уведомляем только о новых проблемах, о старых админы уже знают
+            new_findings = result_findings(spelling_result) - (result_findings(previous) if previous else set())
+            if checked and spelling_result["has_errors"] and (previous is None or new_findings):
+                error_message, has_serious_issues = build_spelling_report(
+                    channel_title, chat_id, message_id, text, spelling_result,
+                    with_improvements=False
+                )
+                if has_serious_issues:
+                    await notify_admins(channel_info, error_message, bot, super_admin_id, message)
+    except Exception as e:
+        logger.error(f"Ошибка при проверке текста: {e}")
+
+async def check_metrics(pool: ClientPool, bot, chat_id: str, message_id: int, message_ids: list,
+                        channel_title: str, subscribers: int, admins: list, posted_at: float = None):
+    """Этап 2 отложенной проверки: метрики поста через 24 часа, анализ GPT и уведомление админов"""
+    logger.info(f"🔄 ЭТАП 2: Проверка метрик поста {message_id}")
+    try:
+        metrics = await fetch_post_metrics(pool, chat_id, message_ids)
+        if not metrics:
+            logger.error(f"Не удалось получить метрики для поста {message_id}")
+            return
+        early_forecaster.finish(chat_id, message_id, metrics)
+
+        # Подготавливаем данные для анализа; нормы берутся из истории канала
+        metrics_data = {
+            "channel_info": {
+                "name": channel_title,
+                "subscribers": subscribers
+            },
+            "metrics": metrics,
+            "baseline": channel_baseline(chat_id)
+        }
+        
+        # Анализируем метрики
+        analysis = await analyze_metrics_with_gpt(metrics_data, CONFIG["OPENAI_API_KEY"])
+        if not analysis:
+            logger.error("Не удалось проанализировать метрики")
+            return
             
-        # ЭТАП 2: Проверка метрик
-        logger.info(f"🔄 ЭТАП 2: Проверка метрик поста {message_id}")
-        try:
-            metrics = await get_post_metrics(client, chat_id, message_id)
-            if not metrics:
-                logger.error(f"Не удалось получить метрики для поста {message_id}")
-                return
+        logger.info(f"✅ Анализ метрик завершен для поста {message_id}")
 
-            # Подготавливаем данные для анализа
-            metrics_data = {
-                "channel_info": {
-                    "name": channel_title,
-                    "subscribers": subscribers
-                },
-                "metrics": metrics
-            }
+        # Обновляем агрегаты канала для /stats
+        # Замер привязывается ко времени публикации, как и при загрузке истории (см. posting_time)
+        if metrics_store.record_post(chat_id, message_id, metrics, not analysis.get("metrics_ok", False),
+                                     posted_at):
+            channel_pager.invalidate()
             
-            # Анализируем метрики
-            analysis = await analyze_metrics_with_gpt(metrics_data, CONFIG["OPENAI_API_KEY"])
-            if not analysis:
-                logger.error("Не удалось проанализировать метрики")
-                return
-                
-            logger.info(f"✅ Анализ метрик завершен для поста {message_id}")
-                
-            # Отправляем уведомление только если есть проблемы
-            if not analysis.get("metrics_ok", False):
-                message_url = f"https://t.me/c/{str(chat_id)[4:]}/{message_id}"
-                notification = (
-                    f"⚠️ Анализ метрик поста\n\n"
-                    f"📊 Канал: {channel_title}\n"
-                    f"🔗 {message_url}\n\n"
-                    f"📈 Метрики:\n"
-                )
-                
-                metrics_info = analysis.get("metrics", {})
-                for metric_name, metric_data in metrics_info.items():
-                    if isinstance(metric_data, dict):
-                        current = metric_data.get("current", 0)
-                        required = metric_data.get("required", 0)
-                        percent = (current / required * 100) if required > 0 else 0
-                        
-                        emoji = "👁" if metric_name == "views" else "❤️" if metric_name == "reactions" else "🔄"
-                        name_ru = "Просмотры" if metric_name == "views" else "Реакции" if metric_name == "reactions" else "Пересылки"
-                        
-                        notification += (
-                            f"{emoji} {name_ru}: {current}/{required} ({percent:.1f}%)\n"
-                            f"{'✅' if percent >= 100 else '❌'} "
-                            f"Норма: {required}\n\n"
-                        )
-                
-                if "issues" in analysis:
-                    notification += "❌ Проблемы:\n" + "\n".join(f"• {issue}" for issue in analysis["issues"])
-                
-                # Отправляем уведомление админам
-                for admin_id in admins:
-                    try:
-                        await bot.send_message(admin_id, notification)
-                        logger.info(f"📤 Отправлено уведомление админу {admin_id}")
-                    except Exception as e:
-                        logger.error(f"Ошибка при отправке уведомления админу {admin_id}: {e}")
-            else:
-                logger.info(f"✅ Все метрики в норме для поста {message_id}")
-        except Exception as e:
-            logger.error(f"Ошибка при проверке метрик: {e}")
+        # Отправляем уведомление только если есть проблемы
+        if not analysis.get("metrics_ok", False):
+            message_url = f"https://t.me/c/{str(chat_id)[4:]}/{message_id}"
+            notification = (
+                f"⚠️ Анализ метрик поста\n\n"
+                f"📊 Канал: {channel_title}\n"
+                f"🔗 {message_url}\n\n"
+                f"📈 Метрики:\n"
+            )
             
+            metrics_info = analysis.get("metrics", {})
+            for metric_name, metric_data in metrics_info.items():
+                if isinstance(metric_data, dict):
+                    current = metric_data.get("current", 0)
+                    required = metric_data.get("required", 0)
+                    percent = (current / required * 100) if required > 0 else 0
+                    
+                    emoji = "👁" if metric_name == "views" else "❤️" if metric_name == "reactions" else "🔄"
+                    name_ru = "Просмотры" if metric_name == "views" else "Реакции" if metric_name == "reactions" else "Пересылки"
+                    
+                    notification += (
+                        f"{emoji} {name_ru}: {current}/{required} ({percent:.1f}%)\n"
+                        f"{'✅' if percent >= 100 else '❌'} "
+                        f"Норма: {required}\n\n"
+                    )
+            
+            if "issues" in analysis:
+                notification += "❌ Проблемы:\n" + "\n".join(f"• {issue}" for issue in analysis["issues"])
+            if analysis.get("norm_source") == "channel":
+                notification += f"\n\nℹ️ Нормы рассчитаны по истории канала (p{CONFIG['NORMS']['QUANTILE'] * 100:.0f})"
+            
+            # Отправляем уведомление админам
+            for admin_id in admins:
+                try:
+                    await bot.send_message(admin_id, notification)
+                    logger.info(f"📤 Отправлено уведомление админу {admin_id}")
+                except Exception as e:
+                    logger.error(f"Ошибка при отправке уведомления админу {admin_id}: {e}")
+        else:
+            logger.info(f"✅ Все метрики в норме для поста {message_id}")
     except Exception as e:
-        logger.error(f"Ошибка при проверке метрик: {e}", exc_info=True)
+        logger.error(f"Ошибка при проверке метрик: {e}")
 
 def get_bot():
     return bot
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram.types import Message
+
+logger = logging.getLogger(__name__)
+
+# Telegram допускает не больше 10 элементов в альбоме
+MAX_ALBUM_SIZE = 10
+
+
+class LogicalPost:
+    """Пост канала: одно сообщение или альбом из нескольких сообщений"""
+
+    def __init__(self, messages: List[Message]):
+        self.messages = sorted(messages, key=lambda message: message.message_id)
+
+    @property
+    def first(self) -> Message:
+        return self.messages[0]
+
+    @property
+    def chat_id(self) -> int:
+        return self.first.chat.id
+
+    @property
+    def message_id(self) -> int:
+        return self.first.message_id
+
+    @property
+    def message_ids(self) -> List[int]:
+        return [message.message_id for message in self.messages]
+
+    @property
+    def is_album(self) -> bool:
+        return len(self.messages) > 1
+
+    @property
+    def text(self) -> str:
+        """Текст и подписи всех частей поста"""
+        return join_texts(message.text or message.caption for message in self.messages)
+
+
+def join_texts(texts) -> str:
+    return "\n\n".join(text for text in texts if text)
+
+
+def merge_post_metrics(parts: List[Optional[dict]]) -> Optional[dict]:
+    """Сводит метрики частей альбома в метрики одного поста.
+
+    Просмотры и пересылки у частей альбома почти совпадают, поэтому берется
+    максимум; реакции ставятся на отдельные части и суммируются.
+    """
+    parts = [metrics for metrics in parts if metrics]
+    if not parts:
+        return None
+    merged = dict(parts[0])
+    merged["views"] = max(metrics.get("views") or 0 for metrics in parts)
+    merged["forwards"] = max(metrics.get("forwards") or 0 for metrics in parts)
+    merged["reactions"] = sum(metrics.get("reactions") or 0 for metrics in parts)
+    return merged
+
+
+class AlbumCoalescer:
+    """Собирает части альбома (общий media_group_id) в один LogicalPost.
+
+    Части буферизуются, пока между ними не пройдет window секунд тишины
+    (или пока альбом не наберет MAX_ALBUM_SIZE частей), после чего handler
+    вызывается один раз на весь альбом. Сообщения без media_group_id
+    передаются в handler сразу.
+    """
+
+    def __init__(self, handler: Callable[[LogicalPost], Awaitable], window: float = 1.0):
+        self.handler = handler
+        self.window = window
+        self._parts: Dict[Tuple[int, str], List[Message]] = {}
+        self._deadlines: Dict[Tuple[int, str], float] = {}
+        self._timers: Dict[Tuple[int, str], asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._parts)
+
+    async def add(self, message: Message) -> None:
+        if not message.media_group_id:
+            await self.handler(LogicalPost([message]))
+            return
+
+        key = (message.chat.id, message.media_group_id)
+        parts = self._parts.setdefault(key, [])
+        parts.append(message)
+        self._deadlines[key] = asyncio.get_running_loop().time() + self.window
+
+        if len(parts) >= MAX_ALBUM_SIZE:
+            timer = self._timers.pop(key, None)
+            if timer is not None:
+                timer.cancel()
+            await self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = asyncio.create_task(self._flush_later(key))
+
+    async def _flush_later(self, key: Tuple[int, str]) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            delay = self._deadlines.get(key, 0) - loop.time()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        self._timers.pop(key, None)
+        await self._flush(key)
+
+    async def _flush(self, key: Tuple[int, str]) -> None:
+        parts = self._parts.pop(key, None)
+        self._deadlines.pop(key, None)
+        if not parts:
+            return
+        logger.info(f"Альбом {key[1]} из канала {key[0]} собран: частей {len(parts)}")
+        try:
+            await self.handler(LogicalPost(parts))
+        except Exception as e:
+            logger.error(f"Ошибка при обработке альбома {key[1]}: {e}", exc_info=True)
+
+    async def close(self) -> None:
+        """Обрабатывает все недособранные альбомы (при остановке бота)"""
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        for key in list(self._parts):
+            await self._flush(key)
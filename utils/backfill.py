@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import time
+from typing import List, Tuple
+
+from .albums import merge_post_metrics
+from .checks import is_below_norm
+from .metrics_store import MetricsStore
+from .telethon_pool import ClientPool, flood_wait_seconds
+
+logger = logging.getLogger(__name__)
+
+# Загрузки истории идут по одной, чтобы не упираться в лимиты Telegram
+_backfill_lock = asyncio.Lock()
+
+
+def message_metrics(message) -> dict:
+    """Просмотры, реакции и пересылки сообщения Telethon"""
+    reactions = 0
+    if getattr(message, "reactions", None) and getattr(message.reactions, "results", None):
+        reactions = sum(reaction.count for reaction in message.reactions.results)
+    return {
+        "views": getattr(message, "views", 0) or 0,
+        "reactions": reactions,
+        "forwards": getattr(message, "forwards", 0) or 0,
+    }
+
+
+async def backfill_channel(pool: ClientPool, store: MetricsStore, chat_id, subscribers: int,
+                           settings: dict, min_age: float) -> int:
+    """Загружает историю канала в журнал метрик, возвращает число добавленных постов.
+
+    Сообщения читаются потоком через iter_messages (от новых к старым) и
+    пишутся пачками по BATCH_SIZE; в памяти держится не больше одной пачки.
+    После каждой пачки сохраняется самый старый обработанный id, поэтому
+    прерванная загрузка продолжается с того же места. Посты моложе min_age
+    секунд пропускаются: их метрики еще растут. Части альбома сводятся в
+    один пост. При FloodWait сессия уходит на паузу, и загрузка продолжается
+    через следующую сессию пула (или ждет, если на паузе все).
+    """
+    chat_id = str(chat_id)
+    batch_size = settings["BATCH_SIZE"]
+    oldest_ts = time.time() - settings["DAYS"] * 86400
+    newest_ts = time.time() - min_age
+
+    progress = store.get_backfill(chat_id)
+    if progress and progress[2]:
+        return 0
+    aggregate = store.get(chat_id)
+    baseline = aggregate.baseline() if aggregate else None
+    offset_id, posts = (progress[0], progress[1]) if progress else (0, 0)
+    added = 0
+
+    async with _backfill_lock:
+        logger.info(f"Загрузка истории канала {chat_id} (с id {offset_id or 'последнего'})")
+        store.save_backfill(chat_id, offset_id, posts, False)
+        batch: List[Tuple[int, float, dict, bool]] = []
+        album: List = []
+
+        def flush_album():
+            if not album:
+                return
+            metrics = merge_post_metrics([message_metrics(part) for part in album])
+            first = min(album, key=lambda part: part.id)
+            batch.append((first.id, first.date.timestamp(), metrics, is_below_norm(metrics, subscribers, baseline)))
+            album.clear()
+
+        finished = False
+        while not finished:
+            remaining = settings["LIMIT"] - posts if settings["LIMIT"] else None
+            if remaining is not None and remaining <= 0:
+                break
+            session = pool.session_for(chat_id)
+            wait = session.cooldown_until - time.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            try:
+                async for message in session.client.iter_messages(
+                    int(chat_id), limit=remaining, offset_id=offset_id, wait_time=settings["WAIT_TIME"]
+                ):
+                    ts = message.date.timestamp()
+                    if ts < oldest_ts:
+                        break
+                    offset_id = message.id
+                    posts += 1
+                    if getattr(message, "action", None) or ts > newest_ts:
+                        continue
+
+                    grouped_id = getattr(message, "grouped_id", None)
+                    if album and album[-1].grouped_id != grouped_id:
+                        flush_album()
+                    if grouped_id:
+                        album.append(message)
+                    else:
+                        metrics = message_metrics(message)
+                        batch.append((message.id, ts, metrics, is_below_norm(metrics, subscribers, baseline)))
+
+                    if len(batch) >= batch_size:
+                        added += store.record_posts(chat_id, batch)
+                        batch.clear()
+                        # Недособранный альбом после перезапуска читается заново
+                        store.save_backfill(chat_id, album[0].id + 1 if album else offset_id, posts, False)
+                finished = True
+            except Exception as e:
+                wait = flood_wait_seconds(e)
+                if wait is None:
+                    logger.error(f"Ошибка при загрузке истории канала {chat_id}: {e}", exc_info=True)
+                    # Незаписанная пачка будет прочитана заново при следующем запуске
+                    return added
+                logger.warning(f"FloodWait при загрузке истории канала {chat_id} (сессия {session.name})")
+                pool.cooldown(session, wait)
+
+        flush_album()
+        added += store.record_posts(chat_id, batch)
+        store.save_backfill(chat_id, offset_id, posts, True)
+        # История читалась от новых постов к старым, а нормы считаются по последним постам:
+        # агрегат пересобирается в потоке, чтобы не задерживать event loop
+        aggregate, last_rowid = await asyncio.to_thread(store.read_aggregate, chat_id)
+        store.replace_aggregate(chat_id, aggregate, last_rowid)
+
+    logger.info(f"История канала {chat_id} загружена: просмотрено {posts}, добавлено постов {added}")
+    return added
@@ -1,50 +1,160 @@
 import re
-import json
 import logging
-import requests
-from openai import OpenAI
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Tuple
-import aiohttp
+from typing import Dict, Any, List, Optional, Tuple
 from .config import CONFIG
 import asyncio
-from utils.logging import setup_logger
 from .notifications import notify_admins
+from .chunking import split_text
+from .findings import FINDING_FIELDS, as_list, finding_fragment
+from .serialization import DecodeError, decode_spelling_response, dumps, loads, readability_level, spelling_response_from
 
-# Настройка логирования
-logger = setup_logger()
+logger = logging.getLogger(__name__)
+
+# Клиенты OpenAI по ключу API; openai импортируется только при первом запросе
+_openai_clients: Dict[str, Any] = {}
+
+# Общий лимит одновременных запросов проверки текста к OpenAI
+_openai_semaphore = asyncio.Semaphore(CONFIG["POST_SETTINGS"]["CHECK_CONCURRENCY"])
+
+def get_openai_client(api_key: str):
+    """Возвращает общий клиент OpenAI для указанного ключа"""
+    client = _openai_clients.get(api_key)
+    if client is None:
+        from openai import OpenAI
+        client = _openai_clients[api_key] = OpenAI(api_key=api_key)
+    return client
+
+async def openai_client(api_key: str):
+    """Клиент OpenAI без блокировки event loop: первый импорт openai занимает сотни миллисекунд"""
+    client = _openai_clients.get(api_key)
+    if client is None:
+        client = await asyncio.to_thread(get_openai_client, api_key)
+    return client
+
+def parse_spelling_response(result: str) -> dict:
+    """Разбирает JSON-ответ GPT по схеме и принимает решение о модерации (DecodeError, если ответ не той формы)"""
+    return apply_moderation_decision(decode_spelling_response(result))
+
+def empty_spelling_result() -> dict:
+    """Результат без замечаний для пустого текста"""
+    return apply_moderation_decision(spelling_response_from({}))
+
+def failed_spelling_result() -> dict:
+    """Результат без замечаний, когда ответ GPT не получен или не разобран.
+
+    Пост не блокируется, но результат помечен check_failed: его нельзя
+    кэшировать и переиспользовать как проверенный.
+    """
+    result = empty_spelling_result()
+    result["check_failed"] = True
+    return result
+
+def apply_moderation_decision(parsed_result: dict) -> dict:
+    """Выставляет has_errors и решение о модерации по категориям и читабельности"""
+    # Всегда показываем найденные ошибки в уведомлении
+    has_grammar_errors = parsed_result["categories"]["grammar"]
+    has_spelling_errors = parsed_result["categories"]["spelling"]
+    readability_score = parsed_result["categories"]["readability"]["score"]
+    
+    # Устанавливаем has_errors в True, если есть любые ошибки (для отображения)
+    parsed_result["has_errors"] = has_grammar_errors or has_spelling_errors
+    
+    # Решение о модерации принимаем по новой логике
+    if readability_score >= 7:
+        # При хорошей читабельности игнорируем все ошибки
+        parsed_result["moderation_decision"] = "/true_go"
+    else:
+        # При плохой читабельности смотрим на все ошибки
+        parsed_result["moderation_decision"] = "/true_go" if not (has_grammar_errors or has_spelling_errors) else "/false_no"
+    
+    # Для обратной совместимости
+    parsed_result["decision"] = parsed_result["moderation_decision"]
+    
+    return parsed_result
+
+def merge_chunk_results(chunks: List[Tuple[int, str]], results: List[dict]) -> dict:
+    """Сводит результаты проверки частей длинного поста в один результат.
+
+    Находки из перекрывающихся участков совпадают по фрагменту и его
+    смещению в посте и учитываются один раз. Читабельность - среднее по
+    частям с весом по длине их собственного (неперекрытого) текста.
+    """
+    findings: Dict[str, List[str]] = {key: [] for _, key in FINDING_FIELDS}
+    seen = set()
+    advice: Dict[str, List[str]] = {"structure": [], "readability": [], "engagement": []}
+    weighted_score, total_length, covered = 0.0, 0, 0
+    readability_details = ""
+
+    for (start, chunk), result in zip(chunks, results):
+        for section, key in FINDING_FIELDS:
+            for finding in as_list(result.get(section, {}).get(key)):
+                fragment = finding_fragment(finding)
+                position = chunk.casefold().find(fragment.casefold()) if fragment else -1
+                identity = (key, fragment.casefold(), start + position) if position >= 0 else (key, finding)
+                if identity not in seen:
+                    seen.add(identity)
+                    findings[key].append(finding)
+
+        for key, items in advice.items():
+            items.extend(as_list(result.get("improvements", {}).get(key)))
+
+        end = start + len(chunk)
+        own_length = max(0, end - max(start, covered))
+        covered = max(covered, end)
+        weighted_score += result["categories"]["readability"]["score"] * own_length
+        total_length += own_length
+
+        details = result.get("details", {}).get("readability_details") or ""
+        if len(details) > len(readability_details):
+            readability_details = details
+
+    score = round(weighted_score / total_length, 1) if total_length else 7
+    merged = {
+        "categories": {
+            "spelling": bool(findings["spelling_details"]),
+            "grammar": bool(findings["grammar_details"]),
+            "readability": {"score": score, "level": readability_level(score)}
+        },
+        "details": {
+            "spelling_details": findings["spelling_details"],
+            "grammar_details": findings["grammar_details"],
+            "readability_details": readability_details
+        },
+        "improvements": {
+            "corrections": findings["corrections"],
+            **{key: list(dict.fromkeys(items)) for key, items in advice.items()}
+        }
+    }
+    # Без ответа хотя бы на одну часть пост проверен не полностью
+    if any(result.get("check_failed") for result in results):
+        merged["check_failed"] = True
+    return apply_moderation_decision(merged)
 
 # Проверка орфографии и содержания
 async def check_spelling(text: str, api_key: str) -> dict:
-    """Проверяет текст на ошибки и читабельность"""
+    """Проверяет текст на ошибки и читабельность.
+
+    Посты длиннее POST_SETTINGS.MAX_LENGTH делятся на части по абзацам и
+    предложениям, части проверяются параллельно, результаты сводятся.
+    """
+    settings = CONFIG["POST_SETTINGS"]
+    if not text or len(text) <= settings["MAX_LENGTH"]:
+        return await _request_spelling_check(text, api_key)
+
+    chunks = split_text(text, settings["MAX_LENGTH"], settings["CHUNK_OVERLAP"])
+    logger.info(f"Длинный пост ({len(text)} символов) проверяется частями: {len(chunks)}")
+    results = await asyncio.gather(*(_request_spelling_check(chunk, api_key) for _, chunk in chunks))
+    return merge_chunk_results(chunks, results)
+
+async def _request_spelling_check(text: str, api_key: str) -> dict:
+    """Отправляет текст на проверку в GPT (не больше CHECK_CONCURRENCY запросов одновременно)"""
     try:
         # Проверяем входные данные
         if not text or not text.strip():
-            return {
-                "has_errors": False,
-                "categories": {
-                    "spelling": False,
-                    "grammar": False,
-                    "readability": {
-                        "score": 7,
-                        "level": "легкий"
-                    }
-                },
-                "details": {
-                    "spelling_details": "",
-                    "grammar_details": "",
-                    "readability_details": ""
-                },
-                "improvements": {
-                    "corrections": [],
-                    "structure": [],
-                    "readability": [],
-                    "engagement": []
-                },
-                "moderation_decision": "/true_go"
-            }
+            return empty_spelling_result()
             
-        client = OpenAI(api_key=api_key)
+        client = await openai_client(api_key)
 
         system_prompt = """Вы – профессиональный корректор русского языка.
 
@@ -127,99 +237,29 @@ async def check_spelling(text: str, api_key: str) -> dict:
   - Если нет ошибок → "/true_go"
 """
 
-        response = client.chat.completions.create(
-            model="gpt-4-0125-preview",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": text}
-            ],
-            temperature=0,
-            response_format={ "type": "json_object" }
-        )
+        async with _openai_semaphore:
+            response = await asyncio.to_thread(
+                client.chat.completions.create,
+                model="gpt-4-0125-preview",
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": text}
+                ],
+                temperature=0,
+                response_format={ "type": "json_object" }
+            )
         
         result = response.choices[0].message.content
         try:
-            # Очищаем от markdown-форматирования
-            if result.startswith('```json'):
-                result = result[7:-3]
+            return parse_spelling_response(result)
             
-            parsed_result = json.loads(result.strip())
-            
-            # Всегда показываем найденные ошибки в уведомлении
-            has_grammar_errors = parsed_result["categories"]["grammar"]
-            has_spelling_errors = parsed_result["categories"]["spelling"]
-            readability_score = parsed_result["categories"]["readability"]["score"]
-            
-            # Устанавливаем has_errors в True, если есть любые ошибки (для отображения)
-            parsed_result["has_errors"] = has_grammar_errors or has_spelling_errors
-            
-            # Решение о модерации принимаем по новой логике
-            if readability_score >= 7:
-                # При хорошей читабельности игнорируем все ошибки
-                parsed_result["moderation_decision"] = "/true_go"
-            else:
-                # При плохой читабельности смотрим на все ошибки
-                parsed_result["moderation_decision"] = "/true_go" if not (has_grammar_errors or has_spelling_errors) else "/false_no"
-            
-            # Для обратной совместимости
-            parsed_result["decision"] = parsed_result["moderation_decision"]
-            
-            return parsed_result
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"Ошибка парсинга JSON ответа: {result}")
-            logger.error(f"Детали ошибки: {str(e)}")
-            return {
-                "has_errors": False,
-                "categories": {
-                    "spelling": False,
-                    "grammar": False,
-                    "readability": {
-                        "score": 7,
-                        "level": "легкий"
-                    }
-                },
-                "details": {
-                    "spelling_details": "",
-                    "grammar_details": "",
-                    "readability_details": ""
-                },
-                "improvements": {
-                    "corrections": [],
-                    "structure": [],
-                    "readability": [],
-                    "engagement": []
-                },
-                "moderation_decision": "/true_go",
-                "decision": "/true_go"
-            }
+        except DecodeError as e:
+            logger.error(f"Ответ GPT не соответствует схеме: {e}; ответ: {result}")
+            return failed_spelling_result()
             
     except Exception as e:
         logger.error(f"Ошибка при проверке текста: {e}", exc_info=True)
-        return {
-            "has_errors": False,
-            "categories": {
-                "spelling": False,
-                "grammar": False,
-                "readability": {
-                    "score": 7,
-                    "level": "легкий"
-                }
-            },
-            "details": {
-                "spelling_details": "",
-                "grammar_details": "",
-                "readability_details": ""
-            },
-            "improvements": {
-                "corrections": [],
-                "structure": [],
-                "readability": [],
-                "engagement": []
-            },
-            "moderation_decision": "/true_go",
-            "decision": "/true_go"
-        }
+        return failed_spelling_result()
 
 async def get_post_metrics(client, chat_id: int, message_id: int) -> Dict[str, int]:
     """Получает метрики поста через Telethon"""
@@ -253,29 +293,47 @@ async def get_post_metrics(client, chat_id: int, message_id: int) -> Dict[str, i
         logger.error(f"Ошибка при получении метрик: {e}", exc_info=True)
         return None
 
+def metric_norms(subscribers: int, views: int, baseline: Optional[Dict[str, float]] = None) -> Dict[str, int]:
+    """Минимальные просмотры, реакции и пересылки для поста.
+
+    baseline - нормы канала по его истории (см. ChannelAggregate.baseline);
+    без нее используются фиксированные доли от подписчиков и просмотров.
+    """
+    if baseline:
+        return {
+            "views": int(baseline["views"]),
+            "reactions": int(views * baseline["reaction_rate"]),
+            "forwards": int(views * baseline["forward_rate"]),
+        }
+    return {
+        "views": max(1, int(subscribers * 0.1)),  # 10% от подписчиков
+        "reactions": max(1, int(views * 0.06)),   # 6% от просмотров
+        "forwards": max(1, int(views * 0.15)),    # 15% от просмотров
+    }
+
+def is_below_norm(metrics: dict, subscribers: int, baseline: Optional[Dict[str, float]] = None) -> bool:
+    """Проверяет, не выполнена ли хотя бы одна норма"""
+    norms = metric_norms(subscribers, metrics.get("views") or 0, baseline)
+    return any((metrics.get(name) or 0) < required for name, required in norms.items())
+
 async def analyze_metrics_with_gpt(metrics_data: dict, api_key: str) -> dict:
     """Анализирует метрики поста через GPT."""
     try:
-        import openai
-        import json
-        
-        openai.api_key = api_key
-        
         # Подготавливаем данные для анализа
         subscribers = metrics_data["channel_info"]["subscribers"]
         views = metrics_data["metrics"]["views"]
         reactions = metrics_data["metrics"]["reactions"]
         forwards = metrics_data["metrics"]["forwards"]
         
-        # Рассчитываем минимальные требования
-        min_views = max(1, int(subscribers * 0.1))  # 10% от подписчиков
-        min_reactions = max(1, int(views * 0.06))   # 6% от просмотров
-        min_forwards = max(1, int(views * 0.15))    # 15% от просмотров
+        # Рассчитываем минимальные требования (по истории канала, если она есть)
+        baseline = metrics_data.get("baseline")
+        norms = metric_norms(subscribers, views, baseline)
+        min_views, min_reactions, min_forwards = norms["views"], norms["reactions"], norms["forwards"]
         
-        # Рассчитываем проценты выполнения
-        views_percent = (views / min_views * 100) if min_views > 0 else 0
-        reactions_percent = (reactions / min_reactions * 100) if min_reactions > 0 else 0
-        forwards_percent = (forwards / min_forwards * 100) if min_forwards > 0 else 0
+        # Рассчитываем проценты выполнения (нулевая норма считается выполненной)
+        views_percent = (views / min_views * 100) if min_views > 0 else 100
+        reactions_percent = (reactions / min_reactions * 100) if min_reactions > 0 else 100
+        forwards_percent = (forwards / min_forwards * 100) if min_forwards > 0 else 100
         
         # Формируем список проблем
         issues = []
@@ -289,6 +347,7 @@ async def analyze_metrics_with_gpt(metrics_data: dict, api_key: str) -> dict:
         # Формируем результат анализа
         analysis_result = {
             "metrics_ok": len(issues) == 0,
+            "norm_source": "channel" if baseline else "fixed",
             "metrics": {
                 "views": {
                     "current": views,
@@ -367,7 +426,7 @@ async def check_post_metrics(views: int, reactions: int, subscribers: int, forwa
 async def analyze_post_with_gpt(metrics_data: dict, api_key: str) -> dict:
     """Анализирует метрики поста через GPT (Этап 2 - через 24 часа)"""
     try:
-        client = OpenAI(api_key=api_key)
+        client = await openai_client(api_key)
         
         system_prompt = """Ты — эксперт по анализу контента в Telegram. 
         Проанализируй метрики поста и верни результат строго в формате JSON:
@@ -400,17 +459,19 @@ async def analyze_post_with_gpt(metrics_data: dict, api_key: str) -> dict:
             ]
         }"""
 
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo-0125",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": json.dumps(metrics_data, ensure_ascii=False)}
-            ],
-            temperature=0,
-            response_format={ "type": "json_object" }
-        )
+        async with _openai_semaphore:
+            response = await asyncio.to_thread(
+                client.chat.completions.create,
+                model="gpt-3.5-turbo-0125",
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": dumps(metrics_data).decode("utf-8")}
+                ],
+                temperature=0,
+                response_format={ "type": "json_object" }
+            )
         
-        result = json.loads(response.choices[0].message.content)
+        result = loads(response.choices[0].message.content)
         
         # Формируем уведомление
         notification = (
@@ -0,0 +1,70 @@
+import re
+from typing import List, Tuple
+
+# Границы абзацев и предложений
+_BOUNDARY_RE = re.compile(r"\s*\n\s*|(?<=[.!?…])\s+")
+
+
+def split_sentences(text: str) -> List[str]:
+    """Предложения и абзацы текста без лишних пробелов"""
+    return [" ".join(part.split()) for part in _BOUNDARY_RE.split(text) if part.strip()]
+
+
+def _split_long(text: str, start: int, end: int, max_length: int) -> List[Tuple[int, int]]:
+    """Режет слишком длинный фрагмент по пробелам (или жестко, если пробелов нет)"""
+    spans = []
+    while end - start > max_length:
+        cut = text.rfind(" ", start + 1, start + max_length + 1)
+        if cut <= start:
+            cut = start + max_length
+        spans.append((start, cut))
+        start = cut
+        while start < end and text[start].isspace():
+            start += 1
+    if start < end:
+        spans.append((start, end))
+    return spans
+
+
+def _units(text: str, max_length: int) -> List[Tuple[int, int]]:
+    """Абзацы и предложения текста как отрезки (start, end) не длиннее max_length"""
+    units, position = [], 0
+    for match in _BOUNDARY_RE.finditer(text):
+        if match.start() > position:
+            units.extend(_split_long(text, position, match.start(), max_length))
+        position = match.end()
+    if position < len(text):
+        units.extend(_split_long(text, position, len(text), max_length))
+    return units
+
+
+def split_text(text: str, max_length: int, overlap: int = 0) -> List[Tuple[int, str]]:
+    """Делит текст на части не длиннее max_length по границам абзацев и предложений.
+
+    Каждая следующая часть начинается с последних предложений предыдущей
+    (не больше overlap символов), чтобы ошибки на стыке не терялись.
+    Возвращает пары (смещение части в тексте, текст части).
+    """
+    if len(text) <= max_length:
+        return [(0, text)]
+
+    units = _units(text, max_length)
+    chunks: List[Tuple[int, str]] = []
+    i = 0
+    while i < len(units):
+        start = units[i][0]
+        j = i + 1
+        while j < len(units) and units[j][1] - start <= max_length:
+            j += 1
+        chunks.append((start, text[start:units[j - 1][1]]))
+        if j >= len(units):
+            break
+
+        # Перекрытие: следующая часть забирает хвост этой, но обязана вместить units[j]
+        k = j
+        while (k - 1 > i
+               and units[j - 1][1] - units[k - 1][0] <= overlap
+               and units[j][1] - units[k - 1][0] <= max_length):
+            k -= 1
+        i = k
+    return chunks
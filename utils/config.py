@@ -2,15 +2,16 @@ import json
 import os
 
 # Загрузка конфигурации из JSON файла
+# Путь можно переопределить переменной окружения BOT_CONFIG
 def load_config():
-    config_path = os.path.join(os.path.dirname(__file__), '..', 'config.json')
+    config_path = os.environ.get("BOT_CONFIG") or os.path.join(os.path.dirname(__file__), '..', 'config.json')
     try:
         with open(config_path, 'r', encoding='utf-8') as f:
             return json.load(f)
     except Exception as e:
         raise Exception(f"Ошибка при загрузке конфигурации: {e}")
 
-# Загружаем конфигурацию при импорте модуля
+# Загружаем конфигурацию один раз при импорте модуля, остальные модули используют CONFIG
 CONFIG = load_config()
 
 # Проверяем наличие необходимых ключей
@@ -21,6 +22,74 @@ required_keys = [
     "OPENAI_API_KEY",
 ]
 
-for key in required_keys:
-    if key not in CONFIG:
-        raise KeyError(f"В конфигурации отсутствует обязательный ключ: {key}") 
\ No newline at end of file
+# Разделы с настройками по умолчанию
+default_sections = {
+    # ALBUM_WINDOW - сколько секунд ждать следующую часть альбома;
+    # посты длиннее MAX_LENGTH проверяются частями с перекрытием CHUNK_OVERLAP,
+    # одновременно к OpenAI уходит не больше CHECK_CONCURRENCY запросов
+    "POST_SETTINGS": {
+        "CHECK_DELAY": 86400, "ALBUM_WINDOW": 1.0,
+        "MAX_LENGTH": 2000, "CHUNK_OVERLAP": 200, "CHECK_CONCURRENCY": 4
+    },
+    # Подписчики обновляются по расписанию канала: SUBSCRIBERS - первый интервал,
+    # дальше от SUBSCRIBERS_MIN до SUBSCRIBERS_MAX секунд в зависимости от скорости изменения
+    "UPDATE_INTERVALS": {"SUBSCRIBERS": 3600, "SUBSCRIBERS_MIN": 600, "SUBSCRIBERS_MAX": 43200},
+    "NOTIFICATIONS": {"SEND_TO_OWNER": True, "NOTIFY_ON_ERRORS": True, "NOTIFY_ON_LOW_METRICS": True},
+    # Хранилище состояний диалогов: "sqlite" (переживает перезапуск) или "memory"
+    "FSM": {"BACKEND": "sqlite", "PATH": "fsm_state.db", "TTL": 3600, "MAX_ENTRIES": 10000},
+    # Журнал замеров постов и подписчиков для /stats; история подписчиков хранится HISTORY_DAYS дней
+    "METRICS": {"PATH": "metrics.db", "HISTORY_DAYS": 365},
+    # Сессии Telethon для чтения каналов (файлы .session); каналы делятся между ними,
+    # на каждую сессию одновременно идет не больше CONCURRENCY запросов; FloodWait дольше
+    # FLOOD_SLEEP_THRESHOLD секунд не пересыпается внутри Telethon, а уводит сессию на паузу
+    "TELETHON": {"SESSIONS": ["bot_session"], "CONCURRENCY": 4, "FLOOD_SLEEP_THRESHOLD": 0},
+    # Метрики из обновлений Telegram: посты наблюдаются WATCH_HOURS часов, точки кривых
+    # пишутся раз в FLUSH_INTERVAL секунд и хранятся SAMPLES_DAYS дней; запрос к Telegram
+    # нужен, только если обновлений по посту не было дольше MAX_AGE секунд
+    "LIVE_METRICS": {"WATCH_HOURS": 48, "FLUSH_INTERVAL": 60, "MAX_AGE": 300, "SAMPLES_DAYS": 30},
+    # Защита от повторной обработки поста: точный список в PATH и фильтр Блума
+    # на CAPACITY постов в поколении с долей ложных срабатываний ERROR_RATE
+    "IDEMPOTENCY": {"PATH": "seen_posts.db", "CAPACITY": 100000, "ERROR_RATE": 0.001},
+    # Теплый перезапуск: при остановке начатые проверки дорабатываются не дольше DRAIN_TIMEOUT секунд,
+    # затем кэши и отложенные проверки сохраняются в PATH и восстанавливаются при запуске
+    "SNAPSHOT": {"PATH": "state.snapshot", "DRAIN_TIMEOUT": 20},
+    # Диагностика: в лог пишется стек кода, блокирующего event loop дольше STALL_THRESHOLD секунд;
+    # /profile снимает стеки раз в SAMPLE_INTERVAL секунд не дольше MAX_SECONDS секунд
+    "PROFILING": {"STALL_THRESHOLD": 0.5, "SAMPLE_INTERVAL": 0.005, "MAX_SECONDS": 300},
+    # Похожие посты: при сходстве текста не ниже THRESHOLD (0..1) с постом, проверенным за MAX_AGE_HOURS часов,
+    # его вердикт переиспользуется, в GPT уходят только отличающиеся предложения (если их не больше доли
+    # MAX_CHANGED); в индексе не больше MAX_POSTS постов
+    "NEAR_DUPLICATES": {"THRESHOLD": 0.7, "MAX_POSTS": 5000, "MAX_AGE_HOURS": 72, "MAX_CHANGED": 0.5},
+    # Загрузка истории нового канала: не больше LIMIT сообщений за DAYS дней,
+    # пачками по BATCH_SIZE, с паузой WAIT_TIME секунд между запросами к Telegram
+    "BACKFILL": {"LIMIT": 50000, "DAYS": 90, "BATCH_SIZE": 200, "WAIT_TIME": 1},
+    # Нормы канала: пост ниже квантиля QUANTILE своего канала по последним WINDOW постам;
+    # пока постов меньше MIN_SAMPLES, действуют фиксированные доли
+    "NORMS": {"QUANTILE": 0.1, "WINDOW": 500, "MIN_SAMPLES": 30},
+    # Ранний прогноз: замеры через CHECKPOINTS секунд после публикации, проверка каждые INTERVAL секунд;
+    # кривые роста канала используются после MIN_SAMPLES постов, интервал прогноза - CONFIDENCE
+    "FORECAST": {
+        "CHECKPOINTS": [1800, 3600, 10800], "INTERVAL": 60, "MIN_SAMPLES": 20,
+        "CONFIDENCE": 0.9, "PATH": "growth_curves.json"
+    },
+}
+
+def validate_config(config):
+    """Проверяет обязательные ключи и дополняет разделы значениями по умолчанию"""
+    for key in required_keys:
+        if key not in config:
+            raise KeyError(f"В конфигурации отсутствует обязательный ключ: {key}")
+
+    for section, defaults in default_sections.items():
+        values = config.setdefault(section, {})
+        if not isinstance(values, dict):
+            raise TypeError(f"Раздел конфигурации {section} должен быть объектом")
+        for key, value in defaults.items():
+            values.setdefault(key, value)
+
+    # Производные настройки
+    config.setdefault("METRICS_CHECK_DELAY", config["POST_SETTINGS"]["CHECK_DELAY"])  # 24 часа
+    config.setdefault("TEXT_CHECK_DELAY", 0)  # Мгновенная проверка
+    return config
+
+validate_config(CONFIG) 
\ No newline at end of file
@@ -1,11 +1,12 @@
-import json
 import logging
 
+from .serialization import dumps_pretty, loads
+
 # Загрузка данных из JSON
 def load_json(file_path):
     try:
-        with open(file_path, "r", encoding='utf-8') as f:
-            data = json.load(f)
+        with open(file_path, "rb") as f:
+            data = loads(f.read())
         logging.getLogger(__name__).info(f"Данные успешно загружены из {file_path}")
         return data
     except FileNotFoundError:
@@ -18,8 +19,17 @@ def load_json(file_path):
 # Сохранение данных в JSON
 def save_json(file_path, data):
     try:
-        with open(file_path, "w", encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
+        with open(file_path, "wb") as f:
+            f.write(dumps_pretty(data))
         logging.getLogger(__name__).info(f"Данные успешно сохранены в {file_path}")
     except Exception as e:
         logging.getLogger(__name__).error(f"Ошибка при сохранении данных в {file_path}: {e}", exc_info=True)
+
+# Поиск канала по chat_id
+def find_channel_by_chat_id(channels, chat_id):
+    """Возвращает данные канала по его chat_id или None"""
+    chat_id = str(chat_id)
+    for data in channels.values():
+        if str(data.get('chat_id')) == chat_id:
+            return data
+    return None
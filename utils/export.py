@@ -0,0 +1,161 @@
+"""Выгрузка журнала метрик в CSV или Parquet.
+
+    python -m utils.export posts --from 2026-01-01 --to 2026-02-01 --channel -100123 -o posts.csv.gz
+
+Строки читаются из базы пачками через отдельное соединение только для
+чтения и сразу пишутся в файл, поэтому память не зависит от объема
+выгрузки, а бот может выгружать в потоке, не останавливая event loop.
+"""
+import argparse
+import csv
+import gzip
+import importlib.util
+import logging
+import sqlite3
+import sys
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+from .subscriber_history import DAY, SubscriberBlock
+
+logger = logging.getLogger(__name__)
+
+# Набор данных -> столбцы; ts - unix-время в секундах (UTC)
+DATASETS = {
+    "posts": ("channel", "message_id", "ts", "views", "reactions", "forwards", "below_norm"),
+    "samples": ("channel", "message_id", "ts", "views", "reactions", "forwards"),
+    "subscribers": ("channel", "ts", "subscribers"),
+}
+FORMATS = ("csv", "parquet")
+
+# Сколько строк читается из базы и пишется в файл за раз (и размер группы строк Parquet)
+BATCH_SIZE = 10_000
+
+
+def _channel_filter(channels: Optional[Sequence[str]]) -> tuple:
+    if channels is None:
+        return "", ()
+    return f" AND channel IN ({','.join('?' * len(channels))})", tuple(str(channel) for channel in channels)
+
+
+def iter_rows(db_path: str, dataset: str, channels: Optional[Sequence[str]] = None,
+              start: float = 0, end: float = float("inf")) -> Iterator[tuple]:
+    """Строки набора dataset за [start, end) в порядке канал, пост, время; channels=None - все каналы"""
+    if dataset not in DATASETS:
+        raise ValueError(f"Неизвестный набор данных: {dataset}")
+    where, params = _channel_filter(channels)
+    db = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        if dataset == "subscribers":
+            # Блоки раскодируются по одному, в выгрузку идут только замеры из диапазона
+            cursor = db.execute(
+                "SELECT channel, start_ts, start_count, end_ts, end_count, samples, data FROM subscriber_blocks"
+                f" WHERE end_ts >= ? AND start_ts < ?{where} ORDER BY channel, start_ts",
+                (start, end, *params)
+            )
+            for channel, *row in cursor:
+                for ts, count in SubscriberBlock.from_row(*row):
+                    if start <= ts < end:
+                        yield channel, ts, count
+            return
+
+        table = "post_metrics" if dataset == "posts" else "post_metric_samples"
+        order = "channel, message_id" if dataset == "posts" else "channel, message_id, ts"
+        cursor = db.execute(
+            f"SELECT {', '.join(DATASETS[dataset])} FROM {table} WHERE ts >= ? AND ts < ?{where} ORDER BY {order}",
+            (start, end, *params)
+        )
+        while True:
+            rows = cursor.fetchmany(BATCH_SIZE)
+            if not rows:
+                return
+            yield from rows
+    finally:
+        db.close()
+
+
+def _batches(rows: Iterable[tuple]) -> Iterator[List[tuple]]:
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, BATCH_SIZE))
+        if not batch:
+            return
+        yield batch
+
+
+def write_csv(rows: Iterable[tuple], fields: Sequence[str], path: str) -> int:
+    """Пишет строки в CSV (в gzip, если путь оканчивается на .gz); возвращает число строк"""
+    if path.endswith(".gz"):
+        # Быстрый уровень сжатия: по умолчанию gzip сжимает в несколько раз медленнее чтения из базы
+        f = gzip.open(path, "wt", compresslevel=1, encoding="utf-8", newline="")
+    else:
+        f = open(path, "w", encoding="utf-8", newline="")
+    written = 0
+    with f:
+        writer = csv.writer(f)
+        writer.writerow(fields)
+        for batch in _batches(rows):
+            writer.writerows(batch)
+            written += len(batch)
+    return written
+
+
+def parquet_available() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def write_parquet(rows: Iterable[tuple], fields: Sequence[str], path: str) -> int:
+    """Пишет строки в Parquet группами по BATCH_SIZE (нужен pyarrow); возвращает число строк"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Для выгрузки в Parquet установите pyarrow: pip install pyarrow")
+
+    types = {"channel": pa.string(), "ts": pa.float64(), "below_norm": pa.bool_()}
+    schema = pa.schema([(name, types.get(name, pa.int64())) for name in fields])
+    written = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for batch in _batches(rows):
+            columns = [pa.array(column, type=field.type) for column, field in zip(zip(*batch), schema)]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema), row_group_size=BATCH_SIZE)
+            written += len(batch)
+    return written
+
+
+def export(db_path: str, dataset: str, fmt: str, path: str, channels: Optional[Sequence[str]] = None,
+           start: float = 0, end: float = float("inf")) -> int:
+    """Выгружает набор dataset в файл path в формате fmt; возвращает число строк"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат выгрузки: {fmt}")
+    writer = write_csv if fmt == "csv" else write_parquet
+    written = writer(iter_rows(db_path, dataset, channels, start, end), DATASETS[dataset], path)
+    logger.info(f"Выгрузка {dataset} ({fmt}) в {path}: строк {written}")
+    return written
+
+
+def parse_date(value: str) -> float:
+    """Дата ГГГГ-ММ-ДД (полночь UTC) в unix-время"""
+    return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Выгрузка журнала метрик в CSV или Parquet")
+    parser.add_argument("dataset", choices=sorted(DATASETS))
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--from", dest="start", type=parse_date, default=0, help="ГГГГ-ММ-ДД, включительно")
+    parser.add_argument("--to", dest="end", type=parse_date, help="ГГГГ-ММ-ДД, включительно")
+    parser.add_argument("--channel", action="append", help="chat_id канала (можно несколько раз), по умолчанию все")
+    parser.add_argument("--db", default="metrics.db", help="путь к журналу метрик (METRICS.PATH)")
+    parser.add_argument("--output", "-o", required=True, help="файл выгрузки (.csv, .csv.gz или .parquet)")
+    args = parser.parse_args(argv)
+
+    end = args.end + DAY if args.end is not None else float("inf")
+    written = export(args.db, args.dataset, args.format, args.output, args.channel, args.start, end)
+    print(f"Выгружено строк: {written:,} -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+import re
+from typing import List, Optional
+
+# Списки находок в ответе GPT: (раздел, ключ)
+FINDING_FIELDS = (
+    ("details", "spelling_details"),
+    ("details", "grammar_details"),
+    ("improvements", "corrections"),
+)
+
+# Фрагмент текста, на который ссылается находка: «слово», "слово" или “слово”
+_FRAGMENT_RE = re.compile(r"«([^»]+)»|\"([^\"]+)\"|“([^”]+)”")
+
+
+def as_list(value) -> List[str]:
+    """Детали в ответе GPT бывают и строкой, и списком"""
+    if isinstance(value, str):
+        return [line.strip() for line in value.split("\n") if line.strip()]
+    return [str(item) for item in value or [] if str(item).strip()]
+
+
+def finding_fragment(finding: str) -> Optional[str]:
+    """Фрагмент текста, к которому относится находка (или None)"""
+    match = _FRAGMENT_RE.search(finding)
+    if match:
+        return next(group for group in match.groups() if group)
+    if "→" in finding:
+        return finding.split("→", 1)[0].strip() or None
+    return None
+
+
+def result_findings(result: dict) -> set:
+    """Все находки результата проверки одним множеством"""
+    return {
+        finding
+        for section, key in FINDING_FIELDS
+        for finding in as_list(result.get(section, {}).get(key))
+    }
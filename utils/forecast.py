@@ -0,0 +1,202 @@
+import logging
+import math
+from statistics import NormalDist
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .checks import metric_norms
+from .database import load_json, save_json
+from .records import channel_key
+
+logger = logging.getLogger(__name__)
+
+METRICS = ("views", "reactions", "forwards")
+
+# Типичная доля суточного значения метрики к моменту замера (пока у канала мало истории)
+PRIOR_SHARES = {1800: 0.25, 3600: 0.35, 10800: 0.55}
+PRIOR_SHARE_DEFAULT = 0.5
+# Разброс логарифма доли для априорной кривой
+PRIOR_SIGMA = 0.5
+
+# Посты, для которых так и не пришли итоговые метрики, забываются через двое суток
+STALE_AFTER = 2 * 86400
+
+
+class GrowthCurves:
+    """Кривые роста метрик по каналам: статистика log(ранний замер / значение через 24 ч).
+
+    Для каждой пары (замер, метрика) хранятся n, среднее и M2 (алгоритм
+    Уэлфорда), поэтому обучение на новом посте стоит O(1) и память не растет.
+    Файл не переписывается после каждого поста: learn только отмечает
+    изменения (dirty), сохраняются они периодически и при остановке.
+    """
+
+    def __init__(self, path: str = "growth_curves.json", min_samples: int = 20):
+        self.path = path
+        self.min_samples = min_samples
+        # channel -> "checkpoint:metric" -> [n, mean, m2]
+        self._curves: Dict[str, Dict[str, List[float]]] = load_json(path)
+        self.dirty = False
+
+    def params(self, channel: str, checkpoint: int, metric: str) -> Tuple[float, float, int]:
+        """Среднее и стандартное отклонение log-доли и число постов, на которых они получены"""
+        stats = self._curves.get(channel, {}).get(f"{checkpoint}:{metric}")
+        if stats is None or stats[0] < self.min_samples:
+            share = PRIOR_SHARES.get(checkpoint, PRIOR_SHARE_DEFAULT)
+            return math.log(share), PRIOR_SIGMA, 0
+        n, mean, m2 = stats
+        return mean, math.sqrt(m2 / (n - 1)), int(n)
+
+    def learn(self, channel: str, samples: Dict[int, dict], final: dict) -> None:
+        """Учитывает пост, для которого известны ранние замеры и итоговые метрики"""
+        curves = self._curves.setdefault(channel, {})
+        for checkpoint, metrics in samples.items():
+            for metric in METRICS:
+                ratio = math.log(((metrics.get(metric) or 0) + 1) / ((final.get(metric) or 0) + 1))
+                stats = curves.setdefault(f"{checkpoint}:{metric}", [0, 0.0, 0.0])
+                stats[0] += 1
+                delta = ratio - stats[1]
+                stats[1] += delta / stats[0]
+                stats[2] += delta * (ratio - stats[1])
+        self.dirty = True
+
+    def snapshot(self) -> Dict[str, Dict[str, List[float]]]:
+        """Копия кривых для записи в другом потоке; сбрасывает признак изменений"""
+        self.dirty = False
+        return {channel: {key: list(stats) for key, stats in curves.items()}
+                for channel, curves in self._curves.items()}
+
+    def save(self) -> None:
+        save_json(self.path, self.snapshot())
+
+
+class LivePost:
+    """Пост, для которого собираются ранние замеры"""
+
+    __slots__ = ("chat_id", "message_ids", "posted_at", "subscribers", "samples", "next_checkpoint", "alerted")
+
+    def __init__(self, chat_id: str, message_ids: List[int], posted_at: float, subscribers: int):
+        self.chat_id = channel_key(chat_id)
+        self.message_ids = tuple(message_ids)
+        self.posted_at = posted_at
+        self.subscribers = subscribers
+        # Замеры по моментам checkpoints; словарь создается при первом замере
+        self.samples: Optional[Dict[int, dict]] = None
+        self.next_checkpoint = 0
+        self.alerted = False
+
+    @property
+    def message_id(self) -> int:
+        return self.message_ids[0]
+
+
+class EarlyForecaster:
+    """Прогноз метрик поста через 24 ч по ранним замерам.
+
+    Пост замеряется только в моменты checkpoints (секунды после публикации).
+    Прогноз: log(итог + 1) = log(замер + 1) - среднее log-доли канала для
+    последнего замера, интервал - ± z стандартных отклонений. Все посты,
+    получившие замер на очередном шаге, прогнозируются одним проходом.
+    """
+
+    def __init__(self, curves: GrowthCurves, checkpoints: List[int], confidence: float = 0.9):
+        self.curves = curves
+        self.checkpoints = sorted(checkpoints)
+        self.z = NormalDist().inv_cdf((1 + confidence) / 2)
+        self._posts: Dict[Tuple[str, int], LivePost] = {}
+
+    def __len__(self) -> int:
+        return len(self._posts)
+
+    def track(self, chat_id, message_ids: List[int], posted_at: float, subscribers: int) -> None:
+        post = LivePost(chat_id, message_ids, posted_at, subscribers)
+        self._posts[(post.chat_id, post.message_id)] = post
+
+    def dump_state(self) -> list:
+        """Посты на наблюдении и их замеры для снимка при остановке"""
+        return [
+            [post.chat_id, list(post.message_ids), post.posted_at, post.subscribers,
+             {str(checkpoint): metrics for checkpoint, metrics in (post.samples or {}).items()},
+             post.next_checkpoint, post.alerted]
+            for post in self._posts.values()
+        ]
+
+    def load_state(self, state: list) -> None:
+        for chat_id, message_ids, posted_at, subscribers, samples, next_checkpoint, alerted in state:
+            post = LivePost(chat_id, message_ids, posted_at, subscribers)
+            post.samples = {int(checkpoint): metrics for checkpoint, metrics in samples.items()}
+            post.next_checkpoint, post.alerted = next_checkpoint, alerted
+            self._posts[(post.chat_id, post.message_id)] = post
+
+    def due(self, now: float) -> List[Tuple[LivePost, int]]:
+        """Посты, которым пора сделать очередной замер, и момент этого замера"""
+        result, stale = [], []
+        for key, post in self._posts.items():
+            if now - post.posted_at > STALE_AFTER:
+                stale.append(key)
+                continue
+            if post.next_checkpoint >= len(self.checkpoints):
+                continue
+            # Пропущенные замеры (например, после долгой паузы) не догоняем
+            while (post.next_checkpoint + 1 < len(self.checkpoints)
+                   and now - post.posted_at >= self.checkpoints[post.next_checkpoint + 1]):
+                post.next_checkpoint += 1
+            checkpoint = self.checkpoints[post.next_checkpoint]
+            if now - post.posted_at >= checkpoint:
+                result.append((post, checkpoint))
+        for key in stale:
+            del self._posts[key]
+        return result
+
+    def add_sample(self, post: LivePost, checkpoint: int, metrics: Optional[dict]) -> None:
+        post.next_checkpoint += 1
+        if metrics:
+            if post.samples is None:
+                post.samples = {}
+            post.samples[checkpoint] = metrics
+
+    def forecast(self, posts: List[LivePost],
+                 baseline_for: Callable[[str], Optional[dict]]) -> List[Optional[dict]]:
+        """Прогнозы для пачки постов по их последним замерам (None, если замеров нет)"""
+        forecasts = []
+        params: Dict[Tuple[str, int, str], Tuple[float, float, int]] = {}
+        baselines: Dict[str, Optional[dict]] = {}
+        for post in posts:
+            if not post.samples:
+                forecasts.append(None)
+                continue
+            checkpoint = max(post.samples)
+            sample = post.samples[checkpoint]
+            if post.chat_id not in baselines:
+                baselines[post.chat_id] = baseline_for(post.chat_id)
+
+            prediction = {}
+            for metric in METRICS:
+                key = (post.chat_id, checkpoint, metric)
+                if key not in params:
+                    params[key] = self.curves.params(*key)
+                mean, sigma, n = params[key]
+                center = math.log((sample.get(metric) or 0) + 1) - mean
+                spread = self.z * sigma * math.sqrt(1 + 1 / max(n, 1))
+                prediction[metric] = (
+                    max(0, math.exp(center) - 1),
+                    max(0, math.exp(center - spread) - 1),
+                    max(0, math.exp(center + spread) - 1),
+                )
+
+            norms = metric_norms(post.subscribers, int(prediction["views"][0]), baselines[post.chat_id])
+            # Предупреждаем, только если норма недостижима даже по верхней границе интервала
+            below = [metric for metric in METRICS if prediction[metric][2] < norms[metric]]
+            forecasts.append({
+                "checkpoint": checkpoint,
+                "prediction": prediction,
+                "norms": norms,
+                "below_norm": below,
+            })
+        return forecasts
+
+    def finish(self, chat_id, message_id: int, final: dict) -> None:
+        """Итоговые метрики поста получены: обучаем кривую канала и прекращаем замеры"""
+        post = self._posts.pop((str(chat_id), message_id), None)
+        if post is None or not post.samples:
+            return
+        self.curves.learn(post.chat_id, post.samples, final)
@@ -0,0 +1,169 @@
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from .serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+
+def _state_name(state: StateType) -> Optional[str]:
+    return state.state if isinstance(state, State) else state
+
+
+class BoundedMemoryStorage(BaseStorage):
+    """FSM-хранилище в памяти с ограничением размера и временем жизни записей.
+
+    Записи упорядочены по времени последней записи, поэтому устаревшие и
+    самые старые записи всегда находятся в начале и удаляются за O(1) каждая.
+    Пустые состояния (без state и data) не хранятся вовсе.
+    """
+
+    def __init__(self, ttl: float = 3600, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # key -> (state, data, expires_at)
+        self._records: "OrderedDict[StorageKey, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _evict(self, now: float) -> None:
+        records = self._records
+        while records:
+            key, record = next(iter(records.items()))
+            if record[2] > now and len(records) <= self.max_entries:
+                break
+            del records[key]
+
+    def _get(self, key: StorageKey) -> Optional[tuple]:
+        record = self._records.get(key)
+        if record is not None and record[2] <= time.monotonic():
+            del self._records[key]
+            return None
+        return record
+
+    def _put(self, key: StorageKey, state: Optional[str], data: Dict[str, Any]) -> None:
+        now = time.monotonic()
+        self._records.pop(key, None)
+        if state is not None or data:
+            self._records[key] = (state, data, now + self.ttl)
+        self._evict(now)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = self._get(key)
+        self._put(key, _state_name(state), record[1] if record else {})
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = self._get(key)
+        return record[0] if record else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record = self._get(key)
+        self._put(key, record[0] if record else None, data.copy())
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = self._get(key)
+        return record[1].copy() if record else {}
+
+    async def close(self) -> None:
+        self._records.clear()
+
+
+class SQLiteStorage(BaseStorage):
+    """FSM-хранилище в SQLite: переживает перезапуски, записи живут ttl секунд"""
+
+    # Как часто (в записях) удалять устаревшие строки
+    SWEEP_EVERY = 100
+
+    def __init__(self, path: str = "fsm_state.db", ttl: float = 3600, max_entries: int = 10000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._writes = 0
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS fsm_state ("
+            " key TEXT PRIMARY KEY,"
+            " state TEXT,"
+            " data TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS fsm_state_expires ON fsm_state (expires_at)")
+        self._db.commit()
+        self._sweep()
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return f"{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id or ''}:{key.destiny}"
+
+    def _sweep(self) -> None:
+        """Удаляет устаревшие записи и самые старые записи сверх лимита"""
+        self._db.execute("DELETE FROM fsm_state WHERE expires_at <= ?", (time.time(),))
+        self._db.execute(
+            "DELETE FROM fsm_state WHERE key IN ("
+            " SELECT key FROM fsm_state ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        self._db.commit()
+
+    def _get(self, key: StorageKey) -> Optional[tuple]:
+        row = self._db.execute(
+            "SELECT state, data FROM fsm_state WHERE key = ? AND expires_at > ?",
+            (self._key(key), time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], loads(row[1])
+
+    def _put(self, key: StorageKey, state: Optional[str], data: Dict[str, Any]) -> None:
+        if state is None and not data:
+            self._db.execute("DELETE FROM fsm_state WHERE key = ?", (self._key(key),))
+        else:
+            self._db.execute(
+                "INSERT OR REPLACE INTO fsm_state (key, state, data, expires_at) VALUES (?, ?, ?, ?)",
+                (self._key(key), state, dumps(data).decode("utf-8"), time.time() + self.ttl)
+            )
+        self._db.commit()
+
+        self._writes += 1
+        if self._writes % self.SWEEP_EVERY == 0:
+            self._sweep()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = self._get(key)
+        self._put(key, _state_name(state), record[1] if record else {})
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = self._get(key)
+        return record[0] if record else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record = self._get(key)
+        self._put(key, record[0] if record else None, data)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = self._get(key)
+        return record[1] if record else {}
+
+    async def close(self) -> None:
+        self._db.close()
+
+
+def create_fsm_storage(settings: Dict[str, Any]) -> BaseStorage:
+    """Создает FSM-хранилище по разделу конфигурации FSM"""
+    backend = settings.get("BACKEND", "sqlite")
+    ttl = settings.get("TTL", 3600)
+    max_entries = settings.get("MAX_ENTRIES", 10000)
+
+    if backend == "memory":
+        return BoundedMemoryStorage(ttl=ttl, max_entries=max_entries)
+    if backend == "sqlite":
+        return SQLiteStorage(settings.get("PATH", "fsm_state.db"), ttl=ttl, max_entries=max_entries)
+    raise ValueError(f"Неизвестное FSM-хранилище: {backend}")
@@ -0,0 +1,165 @@
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .albums import merge_post_metrics
+from .records import channel_key
+
+logger = logging.getLogger(__name__)
+
+# Типы raw-обновлений Telethon, из которых берутся метрики
+UPDATE_TYPES = ("UpdateChannelMessageViews", "UpdateChannelMessageForwards", "UpdateMessageReactions")
+
+Sample = Tuple[str, int, float, int, int, int]  # channel, message_id, ts, views, reactions, forwards
+
+
+def channel_chat_id(channel_id: int) -> str:
+    """chat_id канала в формате Bot API (-100...) по id из MTProto"""
+    return f"-100{channel_id}"
+
+
+class LivePostMetrics:
+    """Последние известные метрики поста; None - значение еще не приходило"""
+
+    __slots__ = ("watched_at", "views", "reactions", "forwards", "updated_at", "dirty")
+
+    def __init__(self, watched_at: float):
+        self.watched_at = watched_at
+        self.views: Optional[int] = None
+        self.reactions: Optional[int] = None
+        self.forwards: Optional[int] = None
+        self.updated_at = 0.0
+        self.dirty = False
+
+    @property
+    def complete(self) -> bool:
+        return self.views is not None and self.reactions is not None and self.forwards is not None
+
+    def as_dict(self) -> dict:
+        return {"views": self.views or 0, "reactions": self.reactions or 0, "forwards": self.forwards or 0}
+
+
+class LiveMetrics:
+    """Метрики постов из обновлений, которые Telegram сам присылает сессиям Telethon.
+
+    UpdateChannelMessageViews, UpdateChannelMessageForwards и
+    UpdateMessageReactions сводятся в памяти по (chat_id, message_id):
+    сколько бы обновлений ни пришло между сбросами, в журнал попадает
+    одна точка кривой на пост. Учитываются только посты, взятые на
+    наблюдение через watch, и не дольше watch_hours. Запрос get_messages
+    нужен, только если по посту давно не было обновлений (см. snapshot).
+    """
+
+    def __init__(self, watch_hours: float = 48):
+        self.watch_seconds = watch_hours * 3600
+        self._posts: Dict[Tuple[str, int], LivePostMetrics] = {}
+        self.stats = {"updates": 0, "ignored": 0, "flushed": 0, "served": 0, "pulled": 0}
+
+    def __len__(self) -> int:
+        return len(self._posts)
+
+    def watch(self, chat_id, message_ids: Iterable[int], now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        chat_id = channel_key(chat_id)
+        for message_id in message_ids:
+            self._posts.setdefault((chat_id, message_id), LivePostMetrics(now))
+
+    def forget(self, chat_id, message_ids: Iterable[int]) -> None:
+        for message_id in message_ids:
+            self._posts.pop((str(chat_id), message_id), None)
+
+    def dump_state(self) -> list:
+        """Последние метрики постов на наблюдении для снимка при остановке"""
+        return [
+            [chat_id, message_id, post.watched_at, post.views, post.reactions, post.forwards,
+             post.updated_at, post.dirty]
+            for (chat_id, message_id), post in self._posts.items()
+        ]
+
+    def load_state(self, state: list) -> None:
+        for chat_id, message_id, watched_at, views, reactions, forwards, updated_at, dirty in state:
+            post = self._posts.setdefault((channel_key(chat_id), message_id), LivePostMetrics(watched_at))
+            # Обновления, пришедшие после запуска, новее снимка
+            if post.updated_at <= updated_at:
+                post.views, post.reactions, post.forwards = views, reactions, forwards
+                post.updated_at, post.dirty = updated_at, dirty
+
+    def _update(self, chat_id: str, message_id: int, now: float, **values) -> None:
+        post = self._posts.get((chat_id, message_id))
+        if post is None:
+            self.stats["ignored"] += 1
+            return
+        self.stats["updates"] += 1
+        for name, value in values.items():
+            # Просмотры и пересылки не убывают; обновление от другой сессии может прийти с опозданием
+            if name != "reactions" and getattr(post, name) is not None:
+                value = max(value, getattr(post, name))
+            setattr(post, name, value)
+        post.updated_at = now
+        post.dirty = True
+
+    def handle_update(self, update, now: Optional[float] = None) -> None:
+        """Разбирает raw-обновление Telethon (остальные типы пропускаются)"""
+        now = time.time() if now is None else now
+        kind = type(update).__name__
+        if kind == "UpdateChannelMessageViews":
+            self._update(channel_chat_id(update.channel_id), update.id, now, views=update.views)
+        elif kind == "UpdateChannelMessageForwards":
+            self._update(channel_chat_id(update.channel_id), update.id, now, forwards=update.forwards)
+        elif kind == "UpdateMessageReactions":
+            channel_id = getattr(update.peer, "channel_id", None)
+            if channel_id is None:
+                return
+            results = getattr(update.reactions, "results", None) or []
+            self._update(channel_chat_id(channel_id), update.msg_id, now,
+                         reactions=sum(reaction.count for reaction in results))
+
+    async def on_raw_update(self, update) -> None:
+        """Обработчик для client.add_event_handler(..., events.Raw(...))"""
+        self.handle_update(update)
+
+    def attach(self, clients: Iterable) -> None:
+        """Подписывает обработчик на raw-обновления каждой сессии"""
+        from telethon import events, types
+
+        update_types = [getattr(types, name) for name in UPDATE_TYPES]
+        for client in clients:
+            client.add_event_handler(self.on_raw_update, events.Raw(update_types))
+
+    def observe(self, chat_id, message_id: int, metrics: dict, now: Optional[float] = None) -> None:
+        """Учитывает метрики, полученные запросом (заполняет пробелы в обновлениях)"""
+        if metrics:
+            self._update(str(chat_id), message_id, time.time() if now is None else now,
+                         views=int(metrics.get("views") or 0), reactions=int(metrics.get("reactions") or 0),
+                         forwards=int(metrics.get("forwards") or 0))
+
+    def snapshot(self, chat_id, message_ids: List[int], max_age: float,
+                 now: Optional[float] = None) -> Optional[dict]:
+        """Метрики поста (альбом сводится), если по всем частям есть свежие данные, иначе None"""
+        now = time.time() if now is None else now
+        parts = []
+        for message_id in message_ids:
+            post = self._posts.get((str(chat_id), message_id))
+            if post is None or not post.complete or now - post.updated_at > max_age:
+                self.stats["pulled"] += 1
+                return None
+            parts.append(post.as_dict())
+        self.stats["served"] += 1
+        return merge_post_metrics(parts) if len(parts) > 1 else parts[0]
+
+    def drain(self, now: Optional[float] = None) -> List[Sample]:
+        """Точки кривых для постов, изменившихся с прошлого сброса; посты старше watch_hours забываются"""
+        now = time.time() if now is None else now
+        samples: List[Sample] = []
+        expired = []
+        for (chat_id, message_id), post in self._posts.items():
+            if post.dirty:
+                post.dirty = False
+                samples.append((chat_id, message_id, post.updated_at,
+                                post.views or 0, post.reactions or 0, post.forwards or 0))
+            if now - post.watched_at > self.watch_seconds:
+                expired.append((chat_id, message_id))
+        for key in expired:
+            del self._posts[key]
+        self.stats["flushed"] += len(samples)
+        return samples
@@ -3,9 +3,17 @@ import sys
 from logging.handlers import RotatingFileHandler
 from datetime import datetime
 
+# Метка обработчиков, добавленных setup_logger
+_HANDLER_MARK = "_bot_handler"
+
 def setup_logger(log_file='bot.log', error_file='errors.log', debug_file='debug.log'):
     # Создаем основной логгер
     logger = logging.getLogger()
+
+    # Повторный вызов не добавляет обработчики второй раз
+    if any(getattr(handler, _HANDLER_MARK, False) for handler in logger.handlers):
+        return logger
+
     logger.setLevel(logging.DEBUG)  # Устанавливаем самый подробный уровень для логгера
 
     # Форматтер для логов
@@ -49,10 +57,9 @@ def setup_logger(log_file='bot.log', error_file='errors.log', debug_file='debug.
     console_handler.setFormatter(formatter)
 
     # Добавляем все обработчики к логгеру
-    logger.addHandler(file_handler)
-    logger.addHandler(error_handler)
-    logger.addHandler(debug_handler)
-    logger.addHandler(console_handler)
+    for handler in (file_handler, error_handler, debug_handler, console_handler):
+        setattr(handler, _HANDLER_MARK, True)
+        logger.addHandler(handler)
 
     # Добавляем дополнительные методы для удобства
     def log_success(msg, *args, **kwargs):
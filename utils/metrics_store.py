@@ -0,0 +1,393 @@
+import logging
+import os
+import sqlite3
+import time
+from urllib.request import pathname2url
+from typing import Dict, List, Optional, Tuple
+
+from .sketches import P2Quantile, RollingQuantile
+from .subscriber_history import DAY, SubscriberBlock, SubscriberSeries
+
+logger = logging.getLogger(__name__)
+
+
+class ChannelAggregate:
+    """Накопленные показатели одного канала, обновляются при каждом новом замере.
+
+    Суммы дают среднее и доли за O(1), медиана просмотров оценивается
+    P²-эскизом, история подписчиков хранится сжатыми блоками
+    (см. SubscriberSeries). Нормы канала - квантиль
+    quantile просмотров, доли реакций и доли пересылок по последним
+    window постам (см. RollingQuantile), память на канал постоянна.
+    """
+
+    def __init__(self, quantile: float = 0.1, window: int = 500, min_samples: int = 30):
+        self.posts = 0
+        self.views = 0
+        self.reactions = 0
+        self.forwards = 0
+        self.below_norm = 0
+        self.last_post_at: Optional[float] = None
+        self.min_samples = min_samples
+        self._median = P2Quantile(0.5)
+        self._norms = {
+            name: RollingQuantile(quantile, window, min_samples)
+            for name in ("views", "reaction_rate", "forward_rate")
+        }
+        self.subscribers = SubscriberSeries()
+
+    def add_post(self, views: int, reactions: int, forwards: int, below_norm: bool, ts: float) -> None:
+        self.posts += 1
+        self.views += views
+        self.reactions += reactions
+        self.forwards += forwards
+        self.below_norm += bool(below_norm)
+        self.last_post_at = max(ts, self.last_post_at or ts)
+
+        self._median.add(views)
+        self._norms["views"].add(views)
+        if views:
+            self._norms["reaction_rate"].add(reactions / views)
+            self._norms["forward_rate"].add(forwards / views)
+
+    def add_subscribers(self, count: int, ts: float) -> List[SubscriberBlock]:
+        """Добавляет замер подписчиков, возвращает блоки истории, которые нужно сохранить"""
+        return self.subscribers.append(ts, count)
+
+    @property
+    def mean_views(self) -> float:
+        return self.views / self.posts if self.posts else 0.0
+
+    @property
+    def median_views(self) -> float:
+        return self._median.value() or 0.0
+
+    def baseline(self) -> Optional[Dict[str, float]]:
+        """Нормы канала по его собственной истории (None, пока постов меньше min_samples)"""
+        if any(sketch.count < self.min_samples for sketch in self._norms.values()):
+            return None
+        return {name: sketch.value() for name, sketch in self._norms.items()}
+
+    @property
+    def reaction_rate(self) -> float:
+        """Реакции на просмотр"""
+        return self.reactions / self.views if self.views else 0.0
+
+    @property
+    def forward_rate(self) -> float:
+        """Пересылки на просмотр"""
+        return self.forwards / self.views if self.views else 0.0
+
+    @property
+    def below_norm_share(self) -> float:
+        return self.below_norm / self.posts if self.posts else 0.0
+
+    def subscriber_delta(self, days: int, now: Optional[float] = None) -> Optional[int]:
+        """Прирост подписчиков за days дней (None, если замеров за период нет)"""
+        return self.subscribers.delta(days, time.time() if now is None else now)
+
+
+class MetricsStore:
+    """Журнал замеров в SQLite и агрегаты по каналам в памяти.
+
+    Журнал читается один раз при запуске, дальше каждый замер сразу
+    добавляется и в таблицу, и в агрегат канала, поэтому /stats не
+    перечитывает историю. Ключ канала - его числовой chat_id строкой.
+    """
+
+    # Как часто (в замерах подписчиков) удалять устаревшую историю
+    SWEEP_EVERY = 1000
+
+    def __init__(self, path: str = "metrics.db", norms: Optional[dict] = None, history_days: int = 365,
+                 samples_days: int = 30):
+        self.path = path
+        self.history_days = history_days
+        self.samples_days = samples_days
+        norms = norms or {}
+        self._norm_settings = {
+            "quantile": norms.get("QUANTILE", 0.1),
+            "window": norms.get("WINDOW", 500),
+            "min_samples": norms.get("MIN_SAMPLES", 30),
+        }
+        self._writes = 0
+        self._aggregates: Dict[str, ChannelAggregate] = {}
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS post_metrics ("
+            " channel TEXT NOT NULL,"
+            " message_id INTEGER NOT NULL,"
+            " ts REAL NOT NULL,"
+            " views INTEGER NOT NULL,"
+            " reactions INTEGER NOT NULL,"
+            " forwards INTEGER NOT NULL,"
+            " below_norm INTEGER NOT NULL,"
+            " PRIMARY KEY (channel, message_id))"
+        )
+        # История подписчиков: блоки SubscriberBlock, последний блок канала перезаписывается
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS subscriber_blocks ("
+            " channel TEXT NOT NULL,"
+            " start_ts INTEGER NOT NULL,"
+            " start_count INTEGER NOT NULL,"
+            " end_ts INTEGER NOT NULL,"
+            " end_count INTEGER NOT NULL,"
+            " samples INTEGER NOT NULL,"
+            " data BLOB NOT NULL,"
+            " PRIMARY KEY (channel, start_ts)) WITHOUT ROWID"
+        )
+        # Кривые метрик постов: точки из обновлений Telegram (см. LiveMetrics)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS post_metric_samples ("
+            " channel TEXT NOT NULL,"
+            " message_id INTEGER NOT NULL,"
+            " ts REAL NOT NULL,"
+            " views INTEGER NOT NULL,"
+            " reactions INTEGER NOT NULL,"
+            " forwards INTEGER NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS post_metric_samples_post ON post_metric_samples (channel, message_id, ts)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS post_metric_samples_ts ON post_metric_samples (ts)")
+        # Прогресс загрузки истории канала: offset_id - самый старый обработанный пост
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS backfill_progress ("
+            " channel TEXT PRIMARY KEY,"
+            " offset_id INTEGER NOT NULL,"
+            " posts INTEGER NOT NULL,"
+            " done INTEGER NOT NULL)"
+        )
+        self._db.commit()
+        self._load()
+
+    def _aggregate(self, channel: str) -> ChannelAggregate:
+        aggregate = self._aggregates.get(channel)
+        if aggregate is None:
+            aggregate = self._aggregates[channel] = ChannelAggregate(**self._norm_settings)
+        return aggregate
+
+    def _save_blocks(self, channel: str, blocks: List[SubscriberBlock]) -> None:
+        self._db.executemany(
+            "INSERT OR REPLACE INTO subscriber_blocks"
+            " (channel, start_ts, start_count, end_ts, end_count, samples, data)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(channel, block.start_ts, block.start_count, block.end_ts, block.end_count,
+              block.samples, block.data) for block in blocks]
+        )
+
+    def _sweep(self) -> None:
+        """Удаляет блоки истории подписчиков старше history_days дней и точки кривых старше samples_days"""
+        self._db.execute("DELETE FROM post_metric_samples WHERE ts < ?", (time.time() - self.samples_days * DAY,))
+        cutoff = time.time() - self.history_days * DAY
+        for channel, aggregate in self._aggregates.items():
+            first = aggregate.subscribers.trim(cutoff)
+            if first is not None:
+                self._db.execute(
+                    "DELETE FROM subscriber_blocks WHERE channel = ? AND start_ts < ?", (channel, first)
+                )
+        self._db.commit()
+
+    def _migrate_subscriber_history(self) -> None:
+        """Переносит историю подписчиков из старой таблицы построчных замеров в блоки"""
+        if not self._db.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'subscriber_history'"
+        ).fetchone():
+            return
+        series: Dict[str, SubscriberSeries] = {}
+        for channel, ts, subscribers in self._db.execute(
+            "SELECT channel, ts, subscribers FROM subscriber_history ORDER BY channel, ts"
+        ):
+            series.setdefault(channel, SubscriberSeries()).append(ts, subscribers)
+        for channel, history in series.items():
+            self._save_blocks(channel, history.blocks)
+        self._db.execute("DROP TABLE subscriber_history")
+        self._db.commit()
+        logger.info(f"История подписчиков перенесена в блоки: каналов {len(series)}")
+
+    def _load(self) -> None:
+        """Восстанавливает агрегаты из журнала за один проход"""
+        self._migrate_subscriber_history()
+
+        posts = 0
+        for channel, ts, views, reactions, forwards, below_norm in self._db.execute(
+            "SELECT channel, ts, views, reactions, forwards, below_norm FROM post_metrics ORDER BY ts"
+        ):
+            self._aggregate(channel).add_post(views, reactions, forwards, below_norm, ts)
+            posts += 1
+        for channel, *row in self._db.execute(
+            "SELECT channel, start_ts, start_count, end_ts, end_count, samples, data"
+            " FROM subscriber_blocks ORDER BY channel, start_ts"
+        ):
+            self._aggregate(channel).subscribers.load_block(SubscriberBlock.from_row(*row))
+        for aggregate in self._aggregates.values():
+            aggregate.subscribers.reopen()
+        self._sweep()
+        logger.info(f"Загружены агрегаты метрик: каналов {len(self._aggregates)}, постов {posts}")
+
+    def get(self, channel) -> Optional[ChannelAggregate]:
+        return self._aggregates.get(str(channel))
+
+    def record_post(self, channel, message_id: int, metrics: dict, below_norm: bool,
+                    ts: Optional[float] = None) -> bool:
+        """Добавляет замер поста; повторный замер того же поста игнорируется"""
+        channel = str(channel)
+        ts = time.time() if ts is None else ts
+        views = int(metrics.get("views") or 0)
+        reactions = int(metrics.get("reactions") or 0)
+        forwards = int(metrics.get("forwards") or 0)
+
+        cursor = self._db.execute(
+            "INSERT OR IGNORE INTO post_metrics"
+            " (channel, message_id, ts, views, reactions, forwards, below_norm)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (channel, message_id, ts, views, reactions, forwards, int(bool(below_norm)))
+        )
+        self._db.commit()
+        if cursor.rowcount == 0:
+            return False
+
+        self._aggregate(channel).add_post(views, reactions, forwards, below_norm, ts)
+        return True
+
+    def record_posts(self, channel, samples: List[Tuple[int, float, dict, bool]]) -> int:
+        """Добавляет пачку замеров (message_id, ts, metrics, below_norm) одной транзакцией.
+
+        Уже записанные посты пропускаются; возвращает число добавленных.
+        """
+        channel = str(channel)
+        if not samples:
+            return 0
+        message_ids = [sample[0] for sample in samples]
+        existing = {
+            row[0] for row in self._db.execute(
+                f"SELECT message_id FROM post_metrics WHERE channel = ? AND message_id IN "
+                f"({','.join('?' * len(message_ids))})",
+                (channel, *message_ids)
+            )
+        }
+
+        rows = []
+        for message_id, ts, metrics, below_norm in samples:
+            if message_id in existing:
+                continue
+            existing.add(message_id)
+            rows.append((
+                channel, message_id, ts, int(metrics.get("views") or 0), int(metrics.get("reactions") or 0),
+                int(metrics.get("forwards") or 0), int(bool(below_norm))
+            ))
+        self._db.executemany(
+            "INSERT OR IGNORE INTO post_metrics"
+            " (channel, message_id, ts, views, reactions, forwards, below_norm)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        self._db.commit()
+
+        aggregate = self._aggregate(channel)
+        for _, _, ts, views, reactions, forwards, below_norm in rows:
+            aggregate.add_post(views, reactions, forwards, below_norm, ts)
+        return len(rows)
+
+    def read_aggregate(self, channel) -> Tuple[ChannelAggregate, int]:
+        """Собирает агрегат канала из журнала в хронологическом порядке.
+
+        Читает через отдельное соединение только для чтения, поэтому
+        вызывается из потока (asyncio.to_thread): на десятках тысяч постов
+        это доли секунды. Возвращает агрегат и наибольший прочитанный rowid.
+        """
+        db = sqlite3.connect(f"file:{pathname2url(os.path.abspath(self.path))}?mode=ro", uri=True)
+        try:
+            aggregate = ChannelAggregate(**self._norm_settings)
+            last_rowid = 0
+            for rowid, ts, views, reactions, forwards, below_norm in db.execute(
+                "SELECT rowid, ts, views, reactions, forwards, below_norm FROM post_metrics"
+                " WHERE channel = ? ORDER BY ts",
+                (str(channel),)
+            ):
+                aggregate.add_post(views, reactions, forwards, below_norm, ts)
+                last_rowid = max(last_rowid, rowid)
+            return aggregate, last_rowid
+        finally:
+            db.close()
+
+    def replace_aggregate(self, channel, aggregate: ChannelAggregate, last_rowid: int) -> None:
+        """Подменяет агрегат канала собранным read_aggregate.
+
+        Посты, записанные, пока агрегат собирался, дочитываются по rowid;
+        история подписчиков переносится из прежнего агрегата.
+        """
+        channel = str(channel)
+        for ts, views, reactions, forwards, below_norm in self._db.execute(
+            "SELECT ts, views, reactions, forwards, below_norm FROM post_metrics"
+            " WHERE channel = ? AND rowid > ? ORDER BY ts",
+            (channel, last_rowid)
+        ):
+            aggregate.add_post(views, reactions, forwards, below_norm, ts)
+        previous = self._aggregates.get(channel)
+        if previous is not None:
+            aggregate.subscribers = previous.subscribers
+        self._aggregates[channel] = aggregate
+
+    def record_samples(self, samples: List[Tuple[str, int, float, int, int, int]]) -> None:
+        """Добавляет точки кривых (channel, message_id, ts, views, reactions, forwards) одной транзакцией"""
+        if not samples:
+            return
+        self._db.executemany(
+            "INSERT INTO post_metric_samples (channel, message_id, ts, views, reactions, forwards)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            samples
+        )
+        self._db.commit()
+
+    def post_curve(self, channel, message_id: int) -> List[Tuple[float, int, int, int]]:
+        """Кривая метрик поста: (ts, views, reactions, forwards) по времени"""
+        return self._db.execute(
+            "SELECT ts, views, reactions, forwards FROM post_metric_samples"
+            " WHERE channel = ? AND message_id = ? ORDER BY ts",
+            (str(channel), message_id)
+        ).fetchall()
+
+    def get_backfill(self, channel) -> Optional[Tuple[int, int, bool]]:
+        """Прогресс загрузки истории: (offset_id, постов, завершена) или None"""
+        row = self._db.execute(
+            "SELECT offset_id, posts, done FROM backfill_progress WHERE channel = ?", (str(channel),)
+        ).fetchone()
+        return (row[0], row[1], bool(row[2])) if row else None
+
+    def save_backfill(self, channel, offset_id: int, posts: int, done: bool) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO backfill_progress (channel, offset_id, posts, done) VALUES (?, ?, ?, ?)",
+            (str(channel), offset_id, posts, int(done))
+        )
+        self._db.commit()
+
+    def pending_backfills(self) -> List[str]:
+        """Каналы с незавершенной загрузкой истории"""
+        return [row[0] for row in self._db.execute("SELECT channel FROM backfill_progress WHERE done = 0")]
+
+    def record_subscribers(self, channel, count: int, ts: Optional[float] = None) -> None:
+        channel = str(channel)
+        ts = time.time() if ts is None else ts
+        blocks = self._aggregate(channel).add_subscribers(count, ts)
+        if not blocks:
+            return
+        self._save_blocks(channel, blocks)
+        self._db.commit()
+
+        self._writes += 1
+        if self._writes % self.SWEEP_EVERY == 0:
+            self._sweep()
+
+    def forget(self, channel) -> None:
+        """Удаляет историю и агрегаты канала"""
+        channel = str(channel)
+        self._aggregates.pop(channel, None)
+        self._db.execute("DELETE FROM post_metrics WHERE channel = ?", (channel,))
+        self._db.execute("DELETE FROM post_metric_samples WHERE channel = ?", (channel,))
+        self._db.execute("DELETE FROM subscriber_blocks WHERE channel = ?", (channel,))
+        self._db.execute("DELETE FROM backfill_progress WHERE channel = ?", (channel,))
+        self._db.commit()
+
+    def close(self) -> None:
+        self._db.close()
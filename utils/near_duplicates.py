@@ -0,0 +1,230 @@
+import logging
+import re
+import time
+import zlib
+from array import array
+from collections import Counter, OrderedDict
+from operator import eq
+from typing import Dict, List, Optional, Set, Tuple
+
+from .chunking import split_sentences
+from .post_checks import CheckFunc, ParagraphCheck, attribute_findings, merge_paragraph_checks, paragraph_hash
+
+logger = logging.getLogger(__name__)
+
+# Подпись MinHash: SIGNATURE_SIZE корзин, LSH - BANDS полос по ROWS корзин.
+# Пост попадает в кандидаты, если совпала хотя бы одна полоса: при сходстве 0.7
+# это происходит с вероятностью 1 - (1 - 0.7^4)^16 ≈ 0.99, при 0.3 - около 0.12
+SIGNATURE_SIZE = 64
+BANDS = 16
+ROWS = SIGNATURE_SIZE // BANDS
+# Шинглы - тройки слов подряд; в более коротких постах сходство не оценивается
+SHINGLE_WORDS = 3
+MIN_SHINGLES = 8
+# Сколько кандидатов (с наибольшим числом совпавших полос) сравнивается по подписи
+MAX_CANDIDATES = 8
+
+_WORD_RE = re.compile(r"\w+")
+_BIN_SHIFT = 32 - (SIGNATURE_SIZE - 1).bit_length()
+_VALUE_MASK = (1 << _BIN_SHIFT) - 1
+
+
+def minhash_signature(text: str) -> Optional[array]:
+    """Подпись MinHash по шинглам из SHINGLE_WORDS слов (None, если текст слишком короткий).
+
+    Одна хэш-функция вместо SIGNATURE_SIZE: старшие биты хэша шингла
+    выбирают корзину, в корзине хранится минимум остальных бит (one
+    permutation hashing). Пустые корзины заполняются из следующей непустой
+    со сдвигом (densification), поэтому доля совпавших корзин двух подписей -
+    оценка коэффициента Жаккара их множеств шинглов.
+    """
+    words = _WORD_RE.findall(text.casefold())
+    shingles = {
+        zlib.crc32(" ".join(words[i:i + SHINGLE_WORDS]).encode("utf-8"))
+        for i in range(len(words) - SHINGLE_WORDS + 1)
+    }
+    if len(shingles) < MIN_SHINGLES:
+        return None
+
+    bins = [-1] * SIGNATURE_SIZE
+    for shingle in shingles:
+        # crc32 плохо перемешивает старшие биты - домножаем на нечетную константу
+        mixed = (shingle * 0x9E3779B1) & 0xFFFFFFFF
+        index, value = mixed >> _BIN_SHIFT, mixed & _VALUE_MASK
+        if bins[index] < 0 or value < bins[index]:
+            bins[index] = value
+    for index in range(SIGNATURE_SIZE):
+        if bins[index] < 0:
+            for distance in range(1, SIGNATURE_SIZE):
+                value = bins[(index + distance) % SIGNATURE_SIZE]
+                if value >= 0:
+                    bins[index] = (value + distance * 0x01000193) & 0xFFFFFFFF
+                    break
+    return array("I", bins)
+
+
+def similarity(first: array, second: array) -> float:
+    """Оценка коэффициента Жаккара по двум подписям"""
+    return sum(map(eq, first, second)) / SIGNATURE_SIZE
+
+
+def _band_keys(signature: array) -> List[bytes]:
+    data = signature.tobytes()
+    size = ROWS * signature.itemsize
+    return [bytes([band]) + data[band * size:(band + 1) * size] for band in range(BANDS)]
+
+
+class IndexedPost:
+    """Проверенный пост в индексе: подпись, проверки по предложениям и итоговый результат"""
+
+    __slots__ = ("signature", "sentences", "result", "checked_at")
+
+    def __init__(self, signature: array, sentences: List[ParagraphCheck], result: dict, checked_at: float):
+        self.signature = signature
+        self.sentences = sentences
+        self.result = result
+        self.checked_at = checked_at
+
+
+class NearDuplicateIndex:
+    """Индекс проверенных постов для повторного использования вердиктов GPT.
+
+    Сеть каналов публикует слегка переписанные копии одного текста: такой
+    пост находится по подписи MinHash через LSH-корзины за доли миллисекунды.
+    Если сходство не ниже threshold, результаты проверки берутся у найденного
+    поста, а в GPT уходят только предложения, которых в нем не было
+    (или весь пост, если отличается больше max_changed предложений).
+    Индекс хранит не больше max_posts постов не старше max_age_hours часов.
+    """
+
+    def __init__(self, threshold: float = 0.7, max_posts: int = 5000, max_age_hours: float = 72,
+                 max_changed: float = 0.5):
+        self.threshold = threshold
+        self.max_posts = max_posts
+        self.max_age = max_age_hours * 3600
+        self.max_changed = max_changed
+        self._posts: "OrderedDict[int, IndexedPost]" = OrderedDict()
+        self._buckets: Dict[bytes, Set[int]] = {}
+        self._next_id = 0
+        self.stats = {"lookups": 0, "reused": 0, "partial": 0, "checked": 0, "sentences_saved": 0}
+
+    def __len__(self) -> int:
+        return len(self._posts)
+
+    def _evict(self, now: float) -> None:
+        while self._posts:
+            post_id, post = next(iter(self._posts.items()))
+            if len(self._posts) <= self.max_posts and now - post.checked_at <= self.max_age:
+                break
+            del self._posts[post_id]
+            for key in _band_keys(post.signature):
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(post_id)
+                    if not bucket:
+                        del self._buckets[key]
+
+    def add(self, signature: array, sentences: List[ParagraphCheck], result: dict,
+            now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        post_id = self._next_id
+        self._next_id += 1
+        self._posts[post_id] = IndexedPost(signature, sentences, result, now)
+        for key in _band_keys(signature):
+            self._buckets.setdefault(key, set()).add(post_id)
+        self._evict(now)
+
+    def find(self, signature: array, now: Optional[float] = None) -> Optional[Tuple[IndexedPost, float]]:
+        """Самый похожий пост не старше max_age со сходством не ниже threshold"""
+        now = time.time() if now is None else now
+        votes: Counter = Counter()
+        for key in _band_keys(signature):
+            votes.update(self._buckets.get(key, ()))
+        best, best_similarity = None, self.threshold
+        for post_id, _ in votes.most_common(MAX_CANDIDATES):
+            post = self._posts[post_id]
+            if now - post.checked_at > self.max_age:
+                continue
+            score = similarity(signature, post.signature)
+            if score >= best_similarity:
+                best, best_similarity = post, score
+        return (best, best_similarity) if best is not None else None
+
+    async def check(self, text: str, check: CheckFunc, now: Optional[float] = None) -> Tuple[dict, int]:
+        """Проверяет текст поста с учетом уже проверенных похожих постов.
+
+        Возвращает результат и число предложений, отправленных в GPT.
+        """
+        now = time.time() if now is None else now
+        self.stats["lookups"] += 1
+        signature = minhash_signature(text)
+        if signature is None:
+            self.stats["checked"] += 1
+            return await check(text), len(split_sentences(text))
+
+        sentences = split_sentences(text)
+        match = self.find(signature, now)
+        if match is None:
+            return await self._check_full(text, signature, sentences, now, check), len(sentences)
+
+        post, score = match
+        reusable: Dict[str, List[ParagraphCheck]] = {}
+        for sentence in post.sentences:
+            reusable.setdefault(sentence.hash, []).append(sentence)
+        checks: List[Optional[ParagraphCheck]] = []
+        changed: List[int] = []
+        for index, sentence in enumerate(sentences):
+            candidates = reusable.get(paragraph_hash(sentence))
+            if candidates:
+                checks.append(candidates.pop(0))
+            else:
+                checks.append(None)
+                changed.append(index)
+
+        if len(changed) > self.max_changed * len(sentences):
+            return await self._check_full(text, signature, sentences, now, check), len(sentences)
+
+        latest = post.result
+        if changed:
+            changed_sentences = [sentences[index] for index in changed]
+            latest = await check("\n".join(changed_sentences))
+            for index, sentence_check in zip(changed, attribute_findings(changed_sentences, latest)):
+                checks[index] = sentence_check
+            self.stats["partial"] += 1
+        else:
+            self.stats["reused"] += 1
+        self.stats["sentences_saved"] += len(sentences) - len(changed)
+
+        result = merge_paragraph_checks(checks, latest)
+        if not result.get("check_failed"):
+            self.add(signature, checks, result, now)
+        logger.info(
+            f"Похожий пост уже проверен (сходство {score:.2f}): "
+            f"в GPT отправлено предложений {len(changed)} из {len(sentences)}"
+        )
+        return result, len(changed)
+
+    async def _check_full(self, text: str, signature: array, sentences: List[str], now: float,
+                          check: CheckFunc) -> dict:
+        result = await check(text)
+        self.stats["checked"] += 1
+        # Несостоявшаяся проверка (GPT не ответил) не попадает в индекс, иначе ее пустой
+        # результат достался бы всем копиям поста
+        if not result.get("check_failed"):
+            self.add(signature, attribute_findings(sentences, result), result, now)
+        return result
+
+    def dump_state(self) -> list:
+        """Посты индекса для снимка при остановке, от старых к свежим"""
+        return [
+            [list(post.signature), post.result, post.checked_at,
+             [[sentence.hash, sentence.length, sentence.findings, sentence.score] for sentence in post.sentences]]
+            for post in self._posts.values()
+        ]
+
+    def load_state(self, state: list) -> None:
+        now = time.time()
+        for signature, result, checked_at, sentences in state:
+            if now - checked_at <= self.max_age:
+                self.add(array("I", signature), [ParagraphCheck.from_state(*sentence) for sentence in sentences],
+                         result, checked_at)
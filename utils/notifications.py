@@ -1,4 +1,5 @@
 import logging
+from typing import Tuple
 from .config import CONFIG
 
 logger = logging.getLogger(__name__)
@@ -43,4 +44,74 @@ async def notify_admins(channel_data, message_text, bot, super_admin_id, origina
                 logger.error(f"Ошибка при отправке уведомления супер-админу: {e}")
 
     except Exception as e:
-        logger.error(f"Ошибка при отправке уведомлений: {e}") 
\ No newline at end of file
+        logger.error(f"Ошибка при отправке уведомлений: {e}") 
+
+def _format_error_lines(details) -> str:
+    """Превращает детали ошибок (строка или список) в маркированный список"""
+    if isinstance(details, list):
+        details = "\n".join(map(str, details))
+    text = ""
+    for error in (details.split('\n') if isinstance(details, str) else details):
+        if isinstance(error, str) and error.strip():
+            text += f"• {error.strip()}\n"
+    return text
+
+def build_spelling_report(channel_title, chat_id, message_id, post_text, spelling_result,
+                          with_improvements=True) -> Tuple[str, bool]:
+    """Формирует текст уведомления о результатах проверки поста.
+
+    Возвращает текст и флаг наличия серьезных ошибок (орфография/грамматика).
+    """
+    error_message = f"📝 Результаты проверки поста:\n\n"
+    error_message += f"📌 Канал: {channel_title}\n"
+    error_message += f"🔢 ID поста: {message_id}\n"
+    error_message += f"🔗 Ссылка: https://t.me/c/{str(chat_id)[4:]}/{message_id}\n\n"
+    error_message += f"📄 Текст поста:\n{post_text[:200]}{'...' if len(post_text) > 200 else ''}\n\n"
+    
+    has_serious_issues = False
+    
+    # Проверка орфографии
+    if spelling_result["categories"]["spelling"]:
+        error_message += "🔍 Орфографические ошибки:\n"
+        error_message += _format_error_lines(spelling_result['details']['spelling_details'])
+        error_message += "\n"
+        has_serious_issues = True
+    
+    # Проверка грамматики с детальным выводом
+    if spelling_result["categories"]["grammar"]:
+        error_message += "📝 Грамматические ошибки:\n"
+        error_message += _format_error_lines(spelling_result['details']['grammar_details'])
+        error_message += "\n"
+        has_serious_issues = True
+    
+    # Проверка читабельности
+    readability = spelling_result["categories"]["readability"]
+    error_message += (
+        f"📚 Читабельность: {readability['score']}/10\n"
+        f"Уровень: {readability['level']}\n"
+        f"{spelling_result['details']['readability_details']}\n"
+    )
+    
+    # Добавляем рекомендации по улучшению
+    if with_improvements and "improvements" in spelling_result:
+        improvements = spelling_result["improvements"]
+        if any(improvements.values()):
+            error_message += "\n💡 Рекомендации по улучшению:\n"
+            
+            if improvements["corrections"]:
+                error_message += "\n✍️ Исправления:\n"
+                error_message += "\n".join(f"• {correction}" for correction in improvements["corrections"])
+                
+            if improvements["structure"]:
+                error_message += "\n\n📝 Структура текста:\n"
+                error_message += "\n".join(f"• {suggestion}" for suggestion in improvements["structure"])
+                
+            if improvements["readability"]:
+                error_message += "\n\n📚 Читабельность:\n"
+                error_message += "\n".join(f"• {tip}" for tip in improvements["readability"])
+                
+            if improvements["engagement"]:
+                error_message += "\n\n🎯 Вовлечение аудитории:\n"
+                error_message += "\n".join(f"• {idea}" for idea in improvements["engagement"])
+    
+    return error_message, has_serious_issues
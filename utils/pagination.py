@@ -0,0 +1,188 @@
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from utils.metrics_store import ChannelAggregate, MetricsStore
+
+# Кнопка-счетчик страниц ничего не делает
+NOOP_CALLBACK = "noop"
+
+
+class ChannelPageCallback(CallbackData, prefix="chp"):
+    """Переход на страницу списка: kind - list / stats / delete"""
+    kind: str
+    page: int
+
+
+class ChannelActionCallback(CallbackData, prefix="cha"):
+    """Действие с каналом из списка: open - настройки, stats - подробная статистика, delete - удаление"""
+    action: str
+    channel_id: str
+
+
+Page = Tuple[str, InlineKeyboardMarkup]
+Renderer = Callable[[List[str], dict, Optional[MetricsStore]], Tuple[str, List[List[InlineKeyboardButton]]]]
+
+
+# Уровни для графика подписчиков
+SPARK_LEVELS = "▁▂▃▄▅▆▇█"
+
+
+def _signed(value: Optional[int]) -> str:
+    return "н/д" if value is None else f"{value:+,}"
+
+
+def _sparkline(values: List[int]) -> str:
+    low, high = min(values), max(values)
+    if high == low:
+        return SPARK_LEVELS[0] * len(values)
+    scale = (len(SPARK_LEVELS) - 1) / (high - low)
+    return "".join(SPARK_LEVELS[round((value - low) * scale)] for value in values)
+
+
+def format_channel_stats(channel_id: str, data: dict, aggregate: Optional[ChannelAggregate],
+                         detailed: bool = False) -> str:
+    """Текст статистики канала из накопленных агрегатов"""
+    text = f"📌 {data.get('title', channel_id)}\n"
+    text += f"👥 Подписчиков: {data.get('subscribers', 0):,}"
+    if aggregate is not None:
+        text += (
+            f" (7 дн: {_signed(aggregate.subscriber_delta(7))},"
+            f" 30 дн: {_signed(aggregate.subscriber_delta(30))})"
+        )
+    text += f"\n🕒 Часовой пояс: {data.get('timezone', 0):+.2f}\n"
+    if detailed and aggregate is not None:
+        now = time.time()
+        daily = aggregate.subscribers.downsample(now - 30 * 86400, now, 86400)
+        if len(daily) > 1:
+            text += f"📈 30 дн: {_sparkline([count for _, count in daily])}\n"
+
+    if aggregate is None or not aggregate.posts:
+        return text + "📝 Замеров постов пока нет\n"
+
+    text += (
+        f"📝 Постов: {aggregate.posts:,}\n"
+        f"👁 Просмотры: в среднем {aggregate.mean_views:,.0f}, медиана {aggregate.median_views:,.0f}\n"
+        f"❤️ Реакции: {aggregate.reaction_rate:.1%} · 🔄 Пересылки: {aggregate.forward_rate:.1%}\n"
+        f"⚠️ Ниже нормы: {aggregate.below_norm_share:.0%}\n"
+    )
+    if detailed:
+        text += (
+            f"\nВсего просмотров: {aggregate.views:,}\n"
+            f"Всего реакций: {aggregate.reactions:,}\n"
+            f"Всего пересылок: {aggregate.forwards:,}\n"
+            f"Постов ниже нормы: {aggregate.below_norm:,}\n"
+        )
+        if aggregate.last_post_at:
+            text += f"Последний замер: {datetime.fromtimestamp(aggregate.last_post_at):%d.%m.%Y %H:%M}\n"
+    return text
+
+
+def _aggregate(metrics: Optional[MetricsStore], data: dict) -> Optional[ChannelAggregate]:
+    if metrics is None or "chat_id" not in data:
+        return None
+    return metrics.get(data["chat_id"])
+
+
+def _render_list(ids: List[str], channels: dict, metrics: Optional[MetricsStore]):
+    rows = [
+        [InlineKeyboardButton(
+            text=f"📌 {channels[cid].get('title', 'Неизвестно')}",
+            callback_data=ChannelActionCallback(action="open", channel_id=cid).pack()
+        )]
+        for cid in ids
+    ]
+    return "📋 Выберите канал для управления:", rows
+
+
+def _render_stats(ids: List[str], channels: dict, metrics: Optional[MetricsStore]):
+    text = "📊 Статистика каналов:\n\n"
+    rows = []
+    for cid in ids:
+        data = channels[cid]
+        text += format_channel_stats(cid, data, _aggregate(metrics, data)) + "\n"
+        rows.append([InlineKeyboardButton(
+            text=f"🔎 {data.get('title', cid)}",
+            callback_data=ChannelActionCallback(action="stats", channel_id=cid).pack()
+        )])
+    return text, rows
+
+
+def _render_delete(ids: List[str], channels: dict, metrics: Optional[MetricsStore]):
+    text = "Выберите канал для удаления:\n\n"
+    rows = []
+    for cid in ids:
+        text += f"📌 {channels[cid].get('title', cid)}\n"
+        text += f"ID: {cid}\n\n"
+        rows.append([InlineKeyboardButton(
+            text=f"❌ {cid}",
+            callback_data=ChannelActionCallback(action="delete", channel_id=cid).pack()
+        )])
+    return text, rows
+
+
+class ChannelPager:
+    """Постраничные списки каналов для /channels, /stats и меню удаления.
+
+    Страницы строятся лениво, по одной, и кэшируются до изменения реестра
+    каналов (invalidate вызывается при каждом сохранении channels.json).
+    Снимок порядка каналов делается один раз на версию реестра, поэтому
+    отрисовка страницы стоит O(page_size) независимо от числа каналов.
+    Статистика берется из готовых агрегатов metrics, после нового замера
+    кэш тоже нужно сбросить.
+    """
+
+    renderers: Dict[str, Renderer] = {
+        "list": _render_list,
+        "stats": _render_stats,
+        "delete": _render_delete,
+    }
+
+    def __init__(self, page_size: int = 10, metrics: Optional[MetricsStore] = None):
+        self.page_size = page_size
+        self.metrics = metrics
+        self._ids: Optional[List[str]] = None
+        self._pages: Dict[Tuple[str, int], Page] = {}
+
+    def invalidate(self) -> None:
+        """Сбрасывает кэш после изменения реестра каналов"""
+        self._ids = None
+        self._pages.clear()
+
+    def page_count(self, channels: dict) -> int:
+        return max(1, -(-len(channels) // self.page_size))
+
+    def render(self, kind: str, page: int, channels: dict) -> Page:
+        """Возвращает текст и клавиатуру страницы (номер страницы с нуля)"""
+        page = min(max(page, 0), self.page_count(channels) - 1)
+        cached = self._pages.get((kind, page))
+        if cached is not None:
+            return cached
+
+        if self._ids is None:
+            self._ids = list(channels)
+        start = page * self.page_size
+        ids = [cid for cid in self._ids[start:start + self.page_size] if cid in channels]
+
+        text, rows = self.renderers[kind](ids, channels, self.metrics)
+        rows.append(self._navigation(kind, page, self.page_count(channels)))
+        result = (text, InlineKeyboardMarkup(inline_keyboard=rows))
+        self._pages[(kind, page)] = result
+        return result
+
+    @staticmethod
+    def _navigation(kind: str, page: int, pages: int) -> List[InlineKeyboardButton]:
+        row = []
+        if page > 0:
+            row.append(InlineKeyboardButton(
+                text="◀️", callback_data=ChannelPageCallback(kind=kind, page=page - 1).pack()
+            ))
+        row.append(InlineKeyboardButton(text=f"{page + 1}/{pages}", callback_data=NOOP_CALLBACK))
+        if page < pages - 1:
+            row.append(InlineKeyboardButton(
+                text="▶️", callback_data=ChannelPageCallback(kind=kind, page=page + 1).pack()
+            ))
+        return row
@@ -0,0 +1,228 @@
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .checks import apply_moderation_decision
+from .findings import FINDING_FIELDS, as_list, finding_fragment
+
+logger = logging.getLogger(__name__)
+
+CheckFunc = Callable[[str], Awaitable[dict]]
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """Абзацы поста: непустые строки без лишних пробелов"""
+    return [" ".join(line.split()) for line in text.splitlines() if line.strip()]
+
+
+def paragraph_hash(paragraph: str) -> str:
+    return hashlib.blake2b(paragraph.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class ParagraphCheck:
+    """Результат проверки одного абзаца: находки по полям FINDING_FIELDS и читабельность"""
+
+    def __init__(self, paragraph: str, findings: Dict[str, List[str]], score: float):
+        self.hash = paragraph_hash(paragraph)
+        self.length = len(paragraph)
+        self.findings = findings
+        self.score = score
+
+    @classmethod
+    def from_state(cls, hash: str, length: int, findings: Dict[str, List[str]], score: float) -> "ParagraphCheck":
+        """Восстанавливает проверку абзаца из снимка (текст абзаца не хранится)"""
+        check = cls.__new__(cls)
+        check.hash, check.length, check.findings, check.score = hash, length, findings, score
+        return check
+
+
+class PostCheck:
+    """Закэшированная проверка поста: абзацы, тексты частей альбома и последний ответ GPT"""
+
+    def __init__(self, paragraphs: List[ParagraphCheck], parts: Dict[int, str], result: dict):
+        self.paragraphs = paragraphs
+        self.parts = parts
+        self.result = result
+
+
+def attribute_findings(paragraphs: List[str], result: dict) -> List[ParagraphCheck]:
+    """Раскладывает находки ответа GPT по абзацам, к которым они относятся.
+
+    Находка привязывается к абзацам, содержащим ее фрагмент; если фрагмент
+    не найден, она относится ко всем абзацам этой проверки и исчезнет
+    только когда все они изменятся.
+    """
+    lowered = [paragraph.casefold() for paragraph in paragraphs]
+    findings: List[Dict[str, List[str]]] = [{} for _ in paragraphs]
+    for section, key in FINDING_FIELDS:
+        for finding in as_list(result.get(section, {}).get(key)):
+            fragment = finding_fragment(finding)
+            targets = [
+                index for index, paragraph in enumerate(lowered)
+                if fragment and fragment.casefold() in paragraph
+            ] or range(len(paragraphs))
+            for index in targets:
+                findings[index].setdefault(key, []).append(finding)
+
+    score = result["categories"]["readability"]["score"]
+    return [
+        ParagraphCheck(paragraph, paragraph_findings, score)
+        for paragraph, paragraph_findings in zip(paragraphs, findings)
+    ]
+
+
+def merge_paragraph_checks(paragraphs: List[ParagraphCheck], latest: dict) -> dict:
+    """Собирает результат проверки всего поста из результатов по абзацам.
+
+    Находки объединяются без повторов, читабельность - среднее по абзацам
+    с весом по длине, общие рекомендации берутся из последнего ответа GPT.
+    """
+    merged_findings: Dict[str, List[str]] = {key: [] for _, key in FINDING_FIELDS}
+    for paragraph in paragraphs:
+        for key, items in paragraph.findings.items():
+            merged_findings[key].extend(items)
+    for key, items in merged_findings.items():
+        merged_findings[key] = list(dict.fromkeys(items))
+
+    total = sum(paragraph.length for paragraph in paragraphs)
+    if total:
+        score = round(sum(paragraph.score * paragraph.length for paragraph in paragraphs) / total, 1)
+    else:
+        score = latest["categories"]["readability"]["score"]
+
+    improvements = dict(latest.get("improvements", {}))
+    improvements["corrections"] = merged_findings["corrections"]
+    result = {
+        "categories": {
+            "spelling": bool(merged_findings["spelling_details"]),
+            "grammar": bool(merged_findings["grammar_details"]),
+            "readability": dict(latest["categories"]["readability"], score=score),
+        },
+        "details": {
+            "spelling_details": merged_findings["spelling_details"],
+            "grammar_details": merged_findings["grammar_details"],
+            "readability_details": latest.get("details", {}).get("readability_details", ""),
+        },
+        "improvements": improvements,
+    }
+    if latest.get("check_failed"):
+        result["check_failed"] = True
+    return apply_moderation_decision(result)
+
+
+class PostCheckCache:
+    """Кэш проверок постов для дешевой перепроверки после редактирования.
+
+    Для каждого поста хранятся хэши абзацев и привязанные к ним находки.
+    При редактировании в GPT уходят только новые и измененные абзацы, а
+    результат для остальных берется из кэша. Альбом хранится одной записью
+    по первому сообщению, части ссылаются на нее. Размер кэша ограничен
+    max_posts, вытесняются давно не редактированные посты.
+    """
+
+    def __init__(self, max_posts: int = 5000):
+        self.max_posts = max_posts
+        self._posts: "OrderedDict[Tuple[int, int], PostCheck]" = OrderedDict()
+        self._aliases: Dict[Tuple[int, int], int] = {}
+
+    def __len__(self) -> int:
+        return len(self._posts)
+
+    def _key(self, chat_id, message_ids) -> Tuple[int, int]:
+        chat_id = int(chat_id)
+        for message_id in message_ids:
+            first = self._aliases.get((chat_id, message_id))
+            if first is not None:
+                return chat_id, first
+        return chat_id, min(message_ids)
+
+    def _store(self, key: Tuple[int, int], check: PostCheck) -> None:
+        self._posts[key] = check
+        self._posts.move_to_end(key)
+        for message_id in check.parts:
+            self._aliases[(key[0], message_id)] = key[1]
+
+        while len(self._posts) > self.max_posts:
+            (chat_id, _), evicted = self._posts.popitem(last=False)
+            for message_id in evicted.parts:
+                self._aliases.pop((chat_id, message_id), None)
+
+    def remember(self, chat_id, parts: Dict[int, str], result: dict) -> None:
+        """Запоминает результат проверки поста; parts - тексты его сообщений по id"""
+        if result.get("check_failed"):
+            # Иначе неизмененные абзацы унаследуют пустой результат несостоявшейся проверки
+            return
+        text = "\n".join(parts[message_id] for message_id in sorted(parts))
+        key = self._key(chat_id, list(parts))
+        self._store(key, PostCheck(attribute_findings(split_paragraphs(text), result), dict(parts), result))
+
+    def dump_state(self) -> list:
+        """Содержимое кэша для снимка при остановке, от давно не редактированных постов к свежим"""
+        return [
+            [chat_id, first, {str(message_id): text for message_id, text in check.parts.items()}, check.result,
+             [[paragraph.hash, paragraph.length, paragraph.findings, paragraph.score] for paragraph in check.paragraphs]]
+            for (chat_id, first), check in self._posts.items()
+        ]
+
+    def load_state(self, state: list) -> None:
+        for chat_id, first, parts, result, paragraphs in state:
+            self._store((chat_id, first), PostCheck(
+                [ParagraphCheck.from_state(*paragraph) for paragraph in paragraphs],
+                {int(message_id): text for message_id, text in parts.items()}, result
+            ))
+
+    async def recheck(self, chat_id, parts: Dict[int, str],
+                      check: CheckFunc) -> Tuple[dict, Optional[dict], int]:
+        """Перепроверяет пост после изменения текста одной или нескольких его частей.
+
+        Возвращает новый результат, предыдущий результат (None, если пост не
+        был в кэше) и число абзацев, отправленных в GPT.
+        """
+        key = self._key(chat_id, list(parts))
+        cached = self._posts.get(key)
+        if cached is None:
+            text = "\n".join(parts[message_id] for message_id in sorted(parts))
+            result = await check(text)
+            self.remember(chat_id, parts, result)
+            return result, None, len(split_paragraphs(text))
+
+        all_parts = {**cached.parts, **parts}
+        paragraphs = split_paragraphs("\n".join(all_parts[message_id] for message_id in sorted(all_parts)))
+
+        # Абзацы с теми же хэшами переиспользуются (с учетом повторяющихся абзацев)
+        reusable: Dict[str, List[ParagraphCheck]] = {}
+        for paragraph in cached.paragraphs:
+            reusable.setdefault(paragraph.hash, []).append(paragraph)
+
+        checks: List[Optional[ParagraphCheck]] = []
+        changed: List[int] = []
+        for index, paragraph in enumerate(paragraphs):
+            candidates = reusable.get(paragraph_hash(paragraph))
+            if candidates:
+                checks.append(candidates.pop(0))
+            else:
+                checks.append(None)
+                changed.append(index)
+
+        if not changed and len(paragraphs) == len(cached.paragraphs):
+            self._store(key, PostCheck(checks, all_parts, cached.result))
+            return cached.result, cached.result, 0
+
+        latest = cached.result
+        if changed:
+            changed_paragraphs = [paragraphs[index] for index in changed]
+            latest = await check("\n".join(changed_paragraphs))
+            for index, paragraph_check in zip(changed, attribute_findings(changed_paragraphs, latest)):
+                checks[index] = paragraph_check
+
+        result = merge_paragraph_checks(checks, latest)
+        if result.get("check_failed"):
+            # В кэше остается прежний текст: при следующей правке измененные абзацы проверятся снова
+            return result, cached.result, len(changed)
+        self._store(key, PostCheck(checks, all_parts, result))
+        logger.info(
+            f"Перепроверка поста {key[1]} канала {key[0]}: "
+            f"изменено абзацев {len(changed)} из {len(paragraphs)}"
+        )
+        return result, cached.result, len(changed)
@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Функция в отчете: (файл, строка определения, имя)
+Function = Tuple[str, int, str]
+
+# Служебные потоки диагностики не попадают в профиль
+IGNORED_THREADS = {"stall-detector"}
+
+
+def _stack(frame) -> List[Function]:
+    """Стек кадра от внешнего вызова к текущему"""
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _function_name(function: Function) -> str:
+    filename, line, name = function
+    return f"{name} ({filename}:{line})"
+
+
+class StallDetector:
+    """Сторож event loop: пишет в лог стек кода, который держит loop дольше threshold секунд.
+
+    Корутина run в loop обновляет метку времени каждые interval секунд,
+    отдельный поток проверяет метку. Если loop не отвечает дольше
+    threshold, поток снимает стек потока loop через sys._current_frames -
+    то есть стек именно того вызова, который блокирует loop, пока он
+    еще выполняется. О каждой блокировке пишется один раз.
+    """
+
+    def __init__(self, threshold: float = 0.5, interval: float = 0.1):
+        self.threshold = threshold
+        self.interval = interval
+        self.stalls = 0
+        self.max_lag = 0.0
+        self._beat = time.monotonic()
+        self._loop_thread: Optional[int] = None
+        self._stop = threading.Event()
+
+    async def run(self) -> None:
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        watcher = threading.Thread(target=self._watch, name="stall-detector", daemon=True)
+        watcher.start()
+        try:
+            while True:
+                self._beat = time.monotonic()
+                await asyncio.sleep(self.interval)
+                # Опоздание sleep - задержка, которую видят все корутины
+                self.max_lag = max(self.max_lag, time.monotonic() - self._beat - self.interval)
+        finally:
+            self._stop.set()
+
+    def _watch(self) -> None:
+        reported_beat = None
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            lag = time.monotonic() - beat
+            if lag < self.threshold or beat == reported_beat:
+                continue
+            reported_beat = beat
+            self.stalls += 1
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "стек недоступен\n"
+            logger.warning(f"Event loop заблокирован уже {lag:.2f} с, выполняется:\n{stack}")
+
+    def stats(self) -> Dict[str, float]:
+        return {"stalls": self.stalls, "max_lag": self.max_lag, "threshold": self.threshold}
+
+
+class SamplingProfiler:
+    """Семплирующий профилировщик: раз в interval секунд снимает стеки всех потоков.
+
+    Работает в отдельном потоке и не требует перезапуска под профилировщиком;
+    нагрузка на бота - один обход стеков за интервал. Время функции
+    оценивается долей снимков: собственное - функция на вершине стека,
+    накопленное - функция где-либо в стеке.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+
+    def sample(self, seconds: float) -> "ProfileReport":
+        """Снимает стеки seconds секунд (блокирует вызывающий поток - запускать через to_thread)"""
+        own = threading.get_ident()
+        report = ProfileReport(self.interval)
+        names = {}
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            frames = sys._current_frames()
+            if not frames.keys() <= names.keys():
+                # Потоки to_thread создаются по мере нагрузки - имена обновляются при появлении новых
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in frames.items():
+                name = names.get(thread_id, str(thread_id))
+                if thread_id != own and name not in IGNORED_THREADS:
+                    report.add(name, _stack(frame))
+            time.sleep(self.interval)
+            report.duration = seconds - max(0.0, deadline - time.monotonic())
+        return report
+
+
+class ProfileReport:
+    """Результат семплирования: счетчики функций и свернутые стеки по потокам"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.duration = 0.0
+        self.samples: Counter = Counter()  # поток -> число снимков
+        self.self_samples: Counter = Counter()
+        self.cumulative: Counter = Counter()
+        self.folded: Counter = Counter()
+
+    def add(self, thread: str, stack: List[Function]) -> None:
+        if not stack:
+            return
+        self.samples[thread] += 1
+        self.self_samples[(thread, stack[-1])] += 1
+        for function in set(stack):
+            self.cumulative[(thread, function)] += 1
+        self.folded[";".join([thread] + [function[2] for function in stack])] += 1
+
+    def render(self, top: int = 40) -> str:
+        """Текстовый отчет: топ функций по накопленному времени и свернутые стеки для flamegraph"""
+        lines = [f"Семплирование {self.duration:.1f} с, интервал {self.interval * 1000:.0f} мс", ""]
+        for thread, total in self.samples.most_common():
+            lines.append(f"== Поток {thread}: снимков {total}")
+            lines.append(f"{'накопл.':>8} {'собств.':>8}  функция")
+            ranked = sorted(
+                ((count, function) for (name, function), count in self.cumulative.items() if name == thread),
+                key=lambda item: item[0], reverse=True
+            )[:top]
+            for count, function in ranked:
+                own = self.self_samples[(thread, function)]
+                lines.append(f"{count / total:>8.1%} {own / total:>8.1%}  {_function_name(function)}")
+            lines.append("")
+        lines.append("== Свернутые стеки (flamegraph.pl, speedscope)")
+        lines.extend(f"{stack} {count}" for stack, count in self.folded.most_common())
+        return "\n".join(lines) + "\n"
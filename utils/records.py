@@ -0,0 +1,133 @@
+import asyncio
+import contextlib
+import heapq
+import sys
+from typing import Dict, Iterator, List, Optional
+
+
+def channel_key(chat_id) -> str:
+    """chat_id канала как общая для всех структур строка.
+
+    Без интернирования каждый str(chat_id) - отдельная копия строки
+    на каждый пост в каждой структуре; интернированная строка одна на канал.
+    """
+    return sys.intern(str(chat_id))
+
+
+class MetricJob:
+    """Отложенная проверка метрик поста.
+
+    Название канала и список админов не копируются в каждую запись:
+    они берутся из реестра каналов в момент проверки. message_ids
+    заполняется только для альбомов.
+    """
+
+    __slots__ = ("chat_id", "message_id", "message_ids", "subscribers", "due_at", "posted_at", "text_checked")
+
+    def __init__(self, chat_id, message_id: int, subscribers: int, due_at: float,
+                 message_ids: Optional[List[int]] = None, posted_at: Optional[float] = None,
+                 text_checked: bool = False):
+        self.chat_id = channel_key(chat_id)
+        self.message_id = message_id
+        self.message_ids = tuple(message_ids) if message_ids and len(message_ids) > 1 else ()
+        self.subscribers = subscribers
+        self.due_at = due_at
+        self.posted_at = posted_at
+        self.text_checked = text_checked
+
+    def __lt__(self, other: "MetricJob") -> bool:
+        return self.due_at < other.due_at
+
+    @property
+    def ids(self) -> List[int]:
+        """Все сообщения поста (части альбома или одно сообщение)"""
+        return list(self.message_ids) if self.message_ids else [self.message_id]
+
+    def to_state(self) -> dict:
+        return {
+            "chat_id": self.chat_id, "message_id": self.message_id, "message_ids": self.ids,
+            "subscribers": self.subscribers, "due_at": self.due_at, "posted_at": self.posted_at,
+            "text_checked": self.text_checked,
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "MetricJob":
+        # Снимки прошлых версий содержат еще channel_title и admins - они берутся из реестра
+        return cls(state["chat_id"], state["message_id"], state["subscribers"], state["due_at"],
+                   state.get("message_ids"), state.get("posted_at"), state.get("text_checked", False))
+
+
+class MetricJobQueue:
+    """Очередь отложенных проверок метрик по сроку.
+
+    Вместо спящей сутки корутины на каждый пост - запись MetricJob в куче
+    и один цикл, который забирает наступившие проверки (pop_due) и спит
+    до ближайшего срока (wait). Запись остается в очереди до done, поэтому
+    проверка, прерванная остановкой бота, попадет в снимок.
+    """
+
+    def __init__(self):
+        self._heap: List[MetricJob] = []
+        self._jobs: Dict[str, Dict[int, MetricJob]] = {}
+        self._count = 0
+        self._changed: Optional[asyncio.Event] = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[MetricJob]:
+        for jobs in self._jobs.values():
+            yield from jobs.values()
+
+    def push(self, job: MetricJob) -> None:
+        jobs = self._jobs.setdefault(job.chat_id, {})
+        if job.message_id not in jobs:
+            self._count += 1
+        jobs[job.message_id] = job
+        heapq.heappush(self._heap, job)
+        # Новая проверка раньше ближайшей - будим цикл, чтобы он не проспал срок
+        if self._heap[0] is job and self._changed is not None:
+            self._changed.set()
+
+    def _current(self, job: MetricJob) -> bool:
+        return self._jobs.get(job.chat_id, {}).get(job.message_id) is job
+
+    def pop_due(self, now: float) -> List[MetricJob]:
+        """Проверки, срок которых наступил (из кучи; в очереди остаются до done)"""
+        due = []
+        while self._heap and self._heap[0].due_at <= now:
+            job = heapq.heappop(self._heap)
+            # Запись, замененная повторным push, пропускается
+            if self._current(job):
+                due.append(job)
+        return due
+
+    def done(self, job: MetricJob) -> None:
+        if self._current(job):
+            jobs = self._jobs[job.chat_id]
+            del jobs[job.message_id]
+            if not jobs:
+                del self._jobs[job.chat_id]
+            self._count -= 1
+
+    def next_due(self) -> Optional[float]:
+        return self._heap[0].due_at if self._heap else None
+
+    async def wait(self, now: float, max_delay: float) -> None:
+        """Спит до ближайшего срока (не дольше max_delay) или до push более ранней проверки"""
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        self._changed.clear()
+        next_due = self.next_due()
+        delay = max_delay if next_due is None else min(max_delay, max(0.0, next_due - now))
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self._changed.wait(), delay)
+
+    def dump_state(self) -> list:
+        return [job.to_state() for job in self]
+
+    def load_state(self, state: list) -> List[MetricJob]:
+        jobs = [MetricJob.from_state(item) for item in state]
+        for job in jobs:
+            self.push(job)
+        return jobs
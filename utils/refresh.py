@@ -0,0 +1,152 @@
+import heapq
+import random
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Обновлять канал, когда его число подписчиков ожидаемо изменится на эту долю (но не меньше чем на 1)
+TARGET_SHARE = 0.0002
+
+# Период полураспада веса старых замеров в оценке скорости изменения, секунд
+HALF_LIFE = 6 * 3600
+
+# Случайный разброс интервала, чтобы каналы с одинаковым ритмом не сходились в одну пачку
+JITTER = 0.1
+
+
+class ChannelRefresh:
+    """Состояние обновления одного канала"""
+
+    def __init__(self, due: float, count: int = 0, rate: Optional[float] = None):
+        self.due = due
+        self.count = count
+        self.checked_at: Optional[float] = None
+        # Затухающие суммы |Δ подписчиков| и Δt: их отношение - скорость в секунду
+        self.change = None if rate is None else rate * HALF_LIFE
+        self.elapsed = None if rate is None else HALF_LIFE
+
+    @property
+    def rate(self) -> Optional[float]:
+        return None if self.change is None else self.change / self.elapsed
+
+
+class RefreshScheduler:
+    """Расписание обновления числа подписчиков, свое для каждого канала.
+
+    Скорость изменения канала - отношение затухающих сумм |Δ подписчиков|
+    и Δt (вес замера падает вдвое за HALF_LIFE), так что короткий интервал
+    без изменений почти не влияет на оценку. Следующий запрос назначается
+    на момент, когда число ожидаемо сдвинется на TARGET_SHARE, в пределах
+    [min_interval, max_interval]: у спящего канала оценка скорости
+    затухает, и интервал растет до max_interval. Новый пост в канале
+    переносит обновление на min_interval вперед. Очередь - куча по
+    времени с ленивым удалением.
+    """
+
+    def __init__(self, min_interval: float, max_interval: float, initial_interval: float):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.initial_interval = initial_interval
+        self._channels: Dict[str, ChannelRefresh] = {}
+        self._queue: List[Tuple[float, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+    def _schedule(self, chat_id: str, state: ChannelRefresh, due: float) -> None:
+        state.due = due
+        heapq.heappush(self._queue, (due, chat_id))
+
+    def interval(self, chat_id) -> float:
+        """Интервал до следующего обновления при текущей оценке скорости"""
+        state = self._channels[str(chat_id)]
+        if state.rate is None:
+            return self.initial_interval
+        if state.rate <= 0:
+            return self.max_interval
+        target = max(1.0, state.count * TARGET_SHARE)
+        return min(self.max_interval, max(self.min_interval, target / state.rate))
+
+    def sync(self, counts: Dict[str, int], now: float,
+             rate_for: Optional[Callable[[str], Optional[float]]] = None) -> None:
+        """Добавляет новые каналы (chat_id -> известное число подписчиков) и забывает удаленные.
+
+        Первые обновления новых каналов равномерно распределяются по их
+        интервалу, а не выполняются все сразу. rate_for - начальная оценка
+        скорости канала (например, по истории подписчиков).
+        """
+        for chat_id in [chat_id for chat_id in self._channels if chat_id not in counts]:
+            del self._channels[chat_id]
+
+        added = sorted(chat_id for chat_id in counts if chat_id not in self._channels)
+        for position, chat_id in enumerate(added):
+            state = self._channels[chat_id] = ChannelRefresh(
+                now, counts[chat_id], rate_for(chat_id) if rate_for else None
+            )
+            self._schedule(chat_id, state, now + self.interval(chat_id) * position / len(added))
+
+    def dump_state(self) -> dict:
+        """Оценки скорости и время следующего обновления каналов для снимка при остановке"""
+        return {
+            chat_id: [state.due, state.count, state.checked_at, state.change, state.elapsed]
+            for chat_id, state in self._channels.items()
+        }
+
+    def load_state(self, state: dict) -> None:
+        """Восстанавливает расписание, чтобы после перезапуска не опрашивать все каналы заново"""
+        for chat_id, (due, count, checked_at, change, elapsed) in state.items():
+            channel = self._channels[chat_id] = ChannelRefresh(due, count)
+            channel.checked_at, channel.change, channel.elapsed = checked_at, change, elapsed
+            self._schedule(chat_id, channel, due)
+
+    def pop_due(self, now: float) -> List[str]:
+        """Каналы, которым пора обновиться"""
+        due = []
+        while self._queue and self._queue[0][0] <= now:
+            ts, chat_id = heapq.heappop(self._queue)
+            state = self._channels.get(chat_id)
+            if state is not None and state.due == ts:
+                due.append(chat_id)
+        return due
+
+    def next_due(self) -> Optional[float]:
+        """Время ближайшего обновления (None, если каналов нет)"""
+        while self._queue:
+            ts, chat_id = self._queue[0]
+            state = self._channels.get(chat_id)
+            if state is not None and state.due == ts:
+                return ts
+            heapq.heappop(self._queue)
+        return None
+
+    def record(self, chat_id, count: int, now: float) -> float:
+        """Учитывает новое значение и назначает следующее обновление; возвращает интервал"""
+        chat_id = str(chat_id)
+        state = self._channels.get(chat_id)
+        if state is None:
+            return self.initial_interval
+        if state.checked_at is not None and now > state.checked_at:
+            elapsed = now - state.checked_at
+            decay = 0.5 ** (elapsed / HALF_LIFE)
+            state.change = (state.change or 0) * decay + abs(count - state.count)
+            state.elapsed = (state.elapsed or 0) * decay + elapsed
+        state.count, state.checked_at = count, now
+        interval = self.interval(chat_id) * random.uniform(1 - JITTER, 1 + JITTER)
+        self._schedule(chat_id, state, now + interval)
+        return interval
+
+    def retry(self, chat_id, now: float) -> None:
+        """Обновление не удалось: повторяем через текущий интервал, оценку не меняем"""
+        chat_id = str(chat_id)
+        state = self._channels.get(chat_id)
+        if state is not None:
+            self._schedule(chat_id, state, now + self.interval(chat_id))
+
+    def touch(self, chat_id, now: float) -> None:
+        """В канале вышел пост: обновляем его не позже чем через min_interval"""
+        chat_id = str(chat_id)
+        state = self._channels.get(chat_id)
+        if state is not None and state.due > now + self.min_interval:
+            self._schedule(chat_id, state, now + self.min_interval)
+
+    def calls_per_hour(self) -> float:
+        """Ожидаемое число запросов к Bot API в час при текущих оценках"""
+        return sum(3600 / self.interval(chat_id) for chat_id in self._channels)
@@ -0,0 +1,77 @@
+from typing import Any, Callable, Dict, Optional, Union
+
+from aiogram.dispatcher.event.handler import CallableObject
+from aiogram.filters import BaseFilter
+from aiogram.types import Message
+
+# Ключ, под которым в узле trie хранится обработчик (не совпадает ни с одним символом)
+_HANDLER = ""
+
+
+class TextRouter:
+    """Маршрутизация нажатий кнопок по тексту сообщения.
+
+    Точные совпадения ищутся одним обращением к словарю, префиксные маршруты -
+    по trie (выигрывает самый длинный префикс). Сообщения без текста и без
+    подходящего маршрута пропускаются дальше, к обработчикам состояний.
+    Обработчики хранятся как CallableObject aiogram, поэтому получают только
+    те аргументы (state, bot и т.д.), которые объявлены в их сигнатуре.
+    """
+
+    def __init__(self):
+        self._exact: Dict[str, CallableObject] = {}
+        self._trie: Dict[str, Any] = {}
+
+    def exact(self, text: str):
+        """Декоратор: обработчик для кнопки с точным текстом"""
+        def decorator(handler: Callable) -> Callable:
+            if text in self._exact:
+                raise ValueError(f"Маршрут для текста {text!r} уже зарегистрирован")
+            self._exact[text] = CallableObject(handler)
+            return handler
+        return decorator
+
+    def prefix(self, prefix: str):
+        """Декоратор: обработчик для всех сообщений, начинающихся с prefix"""
+        if not prefix:
+            raise ValueError("Префикс маршрута не может быть пустым")
+
+        def decorator(handler: Callable) -> Callable:
+            node = self._trie
+            for char in prefix:
+                node = node.setdefault(char, {})
+            if _HANDLER in node:
+                raise ValueError(f"Маршрут для префикса {prefix!r} уже зарегистрирован")
+            node[_HANDLER] = CallableObject(handler)
+            return handler
+        return decorator
+
+    def resolve(self, text: Optional[str]) -> Optional[CallableObject]:
+        """Возвращает обработчик для текста или None"""
+        if not text:
+            return None
+
+        handler = self._exact.get(text)
+        if handler is not None:
+            return handler
+
+        node, found = self._trie, None
+        for char in text:
+            node = node.get(char)
+            if node is None:
+                break
+            found = node.get(_HANDLER, found)
+        return found
+
+
+class TextRouteFilter(BaseFilter):
+    """Фильтр aiogram: передает найденный обработчик в аргумент route"""
+
+    def __init__(self, router: TextRouter):
+        self.router = router
+
+    async def __call__(self, message: Message) -> Union[bool, Dict[str, Any]]:
+        handler = self.router.resolve(message.text)
+        if handler is None:
+            return False
+        return {"route": handler}
@@ -0,0 +1,157 @@
+import hashlib
+import logging
+import math
+import sqlite3
+from typing import Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Фильтр Блума на capacity ключей с долей ложных срабатываний error_rate"""
+
+    def __init__(self, capacity: int, error_rate: float, bits: Optional[bytes] = None, count: int = 0):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray(bits) if bits is not None else bytearray((self.size + 7) // 8)
+        self.count = count
+
+    def _positions(self, key: str) -> Iterator[int]:
+        # Двойное хеширование: k позиций из двух половин одного дайджеста
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class SeenPosts:
+    """Уже обработанные посты каналов: защита от повторной доставки одного поста.
+
+    Точный список (chat_id, message_id) хранится в SQLite, перед ним стоят
+    два поколения фильтра Блума. Если фильтр говорит «не видели», пост
+    новый наверняка и база не читается; положительный ответ проверяется
+    по базе. Когда в текущем поколении набирается capacity постов, оно
+    становится предыдущим, а посты позапрошлого поколения забываются.
+    Фильтры сохраняются в той же базе раз в SAVE_EVERY постов; при
+    запуске в них дописываются посты, добавленные после снимка, поэтому
+    после сбоя фильтр не теряет ни одного поста.
+    """
+
+    SAVE_EVERY = 1000
+
+    def __init__(self, path: str = "seen_posts.db", capacity: int = 100_000, error_rate: float = 0.001):
+        self.path = path
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.stats = {"new": 0, "duplicates": 0, "false_positives": 0}
+        self._unsaved = 0
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS seen_posts ("
+            " channel TEXT NOT NULL,"
+            " message_id INTEGER NOT NULL,"
+            " generation INTEGER NOT NULL,"
+            " PRIMARY KEY (channel, message_id))"
+        )
+        # upto - последний rowid seen_posts, учтенный в снимке фильтра
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS bloom_filters ("
+            " generation INTEGER PRIMARY KEY,"
+            " count INTEGER NOT NULL,"
+            " upto INTEGER NOT NULL,"
+            " bits BLOB NOT NULL)"
+        )
+        self._db.commit()
+        self._load()
+
+    def _load(self) -> None:
+        row = self._db.execute(
+            "SELECT MAX(generation) FROM (SELECT generation FROM seen_posts UNION ALL SELECT generation FROM bloom_filters)"
+        ).fetchone()
+        self.generation = row[0] or 0
+        self._filters: Dict[int, BloomFilter] = {}
+        for generation in (self.generation - 1, self.generation):
+            bloom, upto = BloomFilter(self.capacity, self.error_rate), 0
+            snapshot = self._db.execute(
+                "SELECT count, upto, bits FROM bloom_filters WHERE generation = ?", (generation,)
+            ).fetchone()
+            # Снимок с другими размерами (изменились настройки) пересобирается из базы
+            if snapshot and len(snapshot[2]) == len(bloom.bits):
+                bloom, upto = BloomFilter(self.capacity, self.error_rate, snapshot[2], snapshot[0]), snapshot[1]
+            for channel, message_id in self._db.execute(
+                "SELECT channel, message_id FROM seen_posts WHERE generation = ? AND rowid > ?", (generation, upto)
+            ):
+                bloom.add(f"{channel}:{message_id}")
+            self._filters[generation] = bloom
+        logger.info(f"Загружен список обработанных постов: поколение {self.generation}, "
+                    f"постов в поколении {self._filters[self.generation].count}")
+
+    def _save(self, generations) -> None:
+        upto = self._db.execute("SELECT COALESCE(MAX(rowid), 0) FROM seen_posts").fetchone()[0]
+        self._db.executemany(
+            "INSERT OR REPLACE INTO bloom_filters (generation, count, upto, bits) VALUES (?, ?, ?, ?)",
+            [(generation, self._filters[generation].count, upto, bytes(self._filters[generation].bits))
+             for generation in generations]
+        )
+        self._db.commit()
+        self._unsaved = 0
+
+    def _rotate(self) -> None:
+        self._save([self.generation])
+        self.generation += 1
+        self._filters = {
+            self.generation - 1: self._filters[self.generation - 1],
+            self.generation: BloomFilter(self.capacity, self.error_rate),
+        }
+        self._db.execute("DELETE FROM seen_posts WHERE generation < ?", (self.generation - 1,))
+        self._db.execute("DELETE FROM bloom_filters WHERE generation < ?", (self.generation - 1,))
+        self._save([self.generation])
+        logger.info(f"Список обработанных постов: новое поколение {self.generation}")
+
+    def __contains__(self, post: Tuple[int, int]) -> bool:
+        """Был ли пост (chat_id, message_id) уже обработан"""
+        channel, message_id = str(post[0]), post[1]
+        key = f"{channel}:{message_id}"
+        if any(key in bloom for bloom in self._filters.values()):
+            if self._db.execute(
+                "SELECT 1 FROM seen_posts WHERE channel = ? AND message_id = ?", (channel, message_id)
+            ).fetchone():
+                self.stats["duplicates"] += 1
+                return True
+            self.stats["false_positives"] += 1
+        return False
+
+    def add(self, chat_id, message_id: int) -> bool:
+        """Отмечает пост обработанным; False, если он уже был отмечен"""
+        channel = str(chat_id)
+        key = f"{channel}:{message_id}"
+        cursor = self._db.execute(
+            "INSERT OR IGNORE INTO seen_posts (channel, message_id, generation) VALUES (?, ?, ?)",
+            (channel, message_id, self.generation)
+        )
+        self._db.commit()
+        if cursor.rowcount == 0:
+            return False
+        current = self._filters[self.generation]
+        current.add(key)
+        self.stats["new"] += 1
+        self._unsaved += 1
+        if current.count >= self.capacity:
+            self._rotate()
+        elif self._unsaved >= self.SAVE_EVERY:
+            self._save([self.generation])
+        return True
+
+    def close(self) -> None:
+        if self._unsaved:
+            self._save([self.generation])
+        self._db.close()
@@ -0,0 +1,167 @@
+"""JSON для хранилищ, кэшей, снимков и ответов GPT.
+
+Если установлен orjson или msgspec, кодирование и разбор идут через
+него (в разы быстрее json из стандартной библиотеки), иначе - через json.
+Для ответа GPT на проверку текста есть типизированный разбор: поля
+проверяются по схеме, отсутствующие заполняются значениями по умолчанию,
+а ответ не той формы отбрасывается с DecodeError.
+"""
+import json
+from typing import Any, Dict, Union
+
+from .findings import as_list
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+msgspec = None
+if orjson is None:
+    try:
+        import msgspec
+    except ImportError:
+        pass
+
+if orjson is not None:
+    BACKEND = "orjson"
+    _DECODE_ERRORS = (orjson.JSONDecodeError,)
+elif msgspec is not None:
+    BACKEND = "msgspec"
+    _encoder = msgspec.json.Encoder()
+    _decoder = msgspec.json.Decoder()
+    _DECODE_ERRORS = (msgspec.DecodeError,)
+else:
+    BACKEND = "json"
+    _DECODE_ERRORS = (json.JSONDecodeError, UnicodeDecodeError)
+
+
+class DecodeError(ValueError):
+    """Невалидный JSON или ответ, не соответствующий схеме"""
+
+
+def dumps(obj: Any) -> bytes:
+    """Компактный JSON в UTF-8 (ключи-числа записываются строками, как в json)"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    if msgspec is not None:
+        return _encoder.encode(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_pretty(obj: Any) -> bytes:
+    """JSON с отступами для файлов, которые читают и правят вручную"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_INDENT_2)
+    if msgspec is not None:
+        return msgspec.json.format(_encoder.encode(obj), indent=4)
+    return json.dumps(obj, ensure_ascii=False, indent=4).encode("utf-8")
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    try:
+        if orjson is not None:
+            return orjson.loads(data)
+        if msgspec is not None:
+            return _decoder.decode(data)
+        return json.loads(data)
+    except _DECODE_ERRORS as e:
+        raise DecodeError(f"невалидный JSON: {e}") from e
+
+
+# Ответ GPT на проверку текста
+
+IMPROVEMENT_FIELDS = ("corrections", "structure", "readability", "engagement")
+
+
+def readability_level(score: float) -> str:
+    if score >= 7:
+        return "легкий"
+    return "средний" if score >= 4 else "сложный"
+
+
+def _object(data: dict, key: str, path: str) -> dict:
+    value = data.get(key)
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        raise DecodeError(f"{path}{key}: ожидался объект, получено {type(value).__name__}")
+    return value
+
+
+def _flag(data: dict, key: str, path: str) -> bool:
+    value = data.get(key, False)
+    if value is None:
+        return False
+    if not isinstance(value, bool):
+        raise DecodeError(f"{path}{key}: ожидалось true/false, получено {value!r}")
+    return value
+
+
+def _score(data: dict, key: str, path: str, default: float = 7) -> float:
+    value = data.get(key, default)
+    if value is None:
+        return default
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise DecodeError(f"{path}{key}: ожидалось число, получено {value!r}")
+    return min(10, max(0, value))
+
+
+def _text(data: dict, key: str, path: str) -> str:
+    value = data.get(key)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise DecodeError(f"{path}{key}: ожидалась строка, получено {type(value).__name__}")
+    return value
+
+
+def _items(data: dict, key: str, path: str) -> list:
+    value = data.get(key)
+    # Элементы списка приводит к строкам as_list у потребителей (findings, уведомления)
+    if type(value) is list:
+        return value
+    # GPT возвращает детали и списком, и одной строкой
+    if value is not None and not isinstance(value, str):
+        raise DecodeError(f"{path}{key}: ожидался список, получено {type(value).__name__}")
+    return as_list(value)
+
+
+def spelling_response_from(data: Dict[str, Any]) -> dict:
+    """Приводит разобранный ответ на проверку текста к схеме (без решения о модерации)"""
+    if not isinstance(data, dict):
+        raise DecodeError(f"ожидался JSON-объект, получено {type(data).__name__}")
+    categories = _object(data, "categories", "")
+    readability = _object(categories, "readability", "categories.")
+    details = _object(data, "details", "")
+    improvements = _object(data, "improvements", "")
+    score = _score(readability, "score", "categories.readability.")
+    return {
+        "categories": {
+            "spelling": _flag(categories, "spelling", "categories."),
+            "grammar": _flag(categories, "grammar", "categories."),
+            "readability": {
+                "score": score,
+                "level": _text(readability, "level", "categories.readability.") or readability_level(score),
+            },
+        },
+        "details": {
+            "spelling_details": _items(details, "spelling_details", "details."),
+            "grammar_details": _items(details, "grammar_details", "details."),
+            "readability_details": _text(details, "readability_details", "details."),
+        },
+        "improvements": {key: _items(improvements, key, "improvements.") for key in IMPROVEMENT_FIELDS},
+    }
+
+
+def decode_spelling_response(raw: Union[bytes, str]) -> dict:
+    """Разбирает ответ GPT на проверку текста (в том числе обернутый в ```json```) по схеме"""
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8", errors="replace")
+    raw = raw.strip()
+    # Ответ, обернутый в markdown-блок: первая строка ```json, последняя ```
+    if raw.startswith("```"):
+        raw = raw[raw.find("\n") + 1:] if "\n" in raw else raw[3:]
+        if raw.endswith("```"):
+            raw = raw[:-3]
+    return spelling_response_from(loads(raw))
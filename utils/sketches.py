@@ -0,0 +1,100 @@
+from bisect import bisect_right, insort
+from typing import List, Optional
+
+
+class P2Quantile:
+    """Потоковая оценка квантиля p алгоритмом P² (Jain, Chlamtac, 1985).
+
+    Хранит пять маркеров независимо от числа наблюдений, обновление O(1).
+    """
+
+    def __init__(self, p: float):
+        self.p = p
+        self.count = 0
+        self._heights: List[float] = []
+        self._positions = [0, 1, 2, 3, 4]
+        self._desired = [0, 2 * p, 4 * p, 2 + 2 * p, 4]
+        self._increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        heights = self._heights
+        if self.count <= 5:
+            insort(heights, value)
+            return
+
+        positions = self._positions
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = bisect_right(heights, value) - 1
+
+        for i in range(cell + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        # Сдвигаем средние маркеры к желаемым позициям
+        for i in (1, 2, 3):
+            delta = self._desired[i] - positions[i]
+            if (delta >= 1 and positions[i + 1] - positions[i] > 1) or \
+                    (delta <= -1 and positions[i - 1] - positions[i] < -1):
+                step = 1 if delta > 0 else -1
+                height = self._parabolic(i, step)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = heights[i] + step * (heights[i + step] - heights[i]) / (positions[i + step] - positions[i])
+                heights[i] = height
+                positions[i] += step
+
+    def _parabolic(self, i: int, step: int) -> float:
+        q, n = self._heights, self._positions
+        return q[i] + step / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def value(self) -> Optional[float]:
+        """Текущая оценка квантиля (None, если наблюдений нет)"""
+        if not self.count:
+            return None
+        if self.count <= 5:
+            return self._heights[min(len(self._heights) - 1, int(self.p * len(self._heights)))]
+        return self._heights[2]
+
+
+class RollingQuantile:
+    """Квантиль по последним наблюдениям: два P²-эскиза, сменяющих друг друга.
+
+    Текущий эскиз копит до window наблюдений и затем становится
+    предыдущим. Пока в текущем меньше min_samples наблюдений, ответ
+    берется из предыдущего, поэтому оценка всегда опирается на последние
+    от min_samples до window + min_samples наблюдений. Память постоянна.
+    """
+
+    def __init__(self, p: float, window: int = 500, min_samples: int = 30):
+        self.p = p
+        self.window = window
+        self.min_samples = min_samples
+        self._current = P2Quantile(p)
+        self._previous: Optional[P2Quantile] = None
+
+    @property
+    def count(self) -> int:
+        """Число наблюдений, на которые опирается оценка"""
+        if self._current.count < self.min_samples and self._previous is not None:
+            return self._previous.count
+        return self._current.count
+
+    def add(self, value: float) -> None:
+        self._current.add(value)
+        if self._current.count >= self.window:
+            self._previous, self._current = self._current, P2Quantile(self.p)
+
+    def value(self) -> Optional[float]:
+        if self._current.count < self.min_samples and self._previous is not None:
+            return self._previous.value()
+        return self._current.value()
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import os
+import struct
+import zlib
+from contextlib import contextmanager
+from typing import Any, Dict
+
+from .serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# Заголовок файла снимка: сигнатура, версия формата, CRC32 и длина сжатых данных
+MAGIC = b"WBSN"
+VERSION = 1
+HEADER = struct.Struct(">4sBII")
+
+
+def save_snapshot(path: str, sections: Dict[str, Any]) -> int:
+    """Записывает снимок состояния (разделы - JSON-совместимые значения); возвращает размер файла.
+
+    Данные сжимаются zlib, файл заменяется атомарно, чтобы сбой при
+    записи не оставил половину снимка.
+    """
+    payload = zlib.compress(dumps(sections), 6)
+    data = HEADER.pack(MAGIC, VERSION, zlib.crc32(payload), len(payload)) + payload
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+def load_snapshot(path: str) -> Dict[str, Any]:
+    """Читает снимок; если файла нет или он поврежден, возвращает пустой словарь"""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return {}
+
+    try:
+        magic, version, crc, length = HEADER.unpack_from(data)
+        payload = data[HEADER.size:]
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"неизвестный формат {magic!r} v{version}")
+        if len(payload) != length or zlib.crc32(payload) != crc:
+            raise ValueError("контрольная сумма не совпадает")
+        return loads(zlib.decompress(payload))
+    except Exception as e:
+        logger.error(f"Снимок состояния {path} не прочитан, запуск с холодными кэшами: {e}")
+        return {}
+
+
+class InFlight:
+    """Счетчик выполняющейся работы: при остановке бот дожидается ее завершения"""
+
+    def __init__(self):
+        self.count = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @contextmanager
+    def track(self):
+        self.count += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self.count -= 1
+            if not self.count:
+                self._idle.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """Ждет, пока работа закончится, не дольше timeout секунд; False, если не дождались"""
+        try:
+            await asyncio.wait_for(self._idle.wait(), max(0.0, timeout))
+            return True
+        except asyncio.TimeoutError:
+            return self.count == 0
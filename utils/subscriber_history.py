@@ -0,0 +1,248 @@
+from bisect import bisect_right
+from typing import Iterator, List, Optional, Tuple
+
+DAY = 86400
+
+# Замеров в одном блоке: ~10 дней при ежечасном обновлении
+BLOCK_SIZE = 256
+
+# Время замера округляется до минуты: иначе опоздание обновления на пару
+# секунд делает каждый интервал нерегулярным и удваивает размер записи
+RESOLUTION = 60
+
+# Виды записей в блоке (два младших бита заголовка)
+_REGULAR = 0    # интервал тот же, что у предыдущего замера; дальше - изменение числа подписчиков
+_IRREGULAR = 1  # то же, но следом идет изменение интервала
+_RUN = 2        # n замеров подряд с тем же интервалом и без изменения числа подписчиков
+
+
+def _zigzag(value: int) -> int:
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value: int) -> int:
+    return value >> 1 if not value & 1 else -(value >> 1) - 1
+
+
+def _write_varint(buffer: bytearray, value: int) -> None:
+    while value > 0x7F:
+        buffer.append(value & 0x7F | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class SubscriberBlock:
+    """Блок замеров подписчиков одного канала.
+
+    Первый замер хранится в заголовке, остальные - разностями: изменение
+    интервала (delta-of-delta) и изменение числа подписчиков, в varint с
+    zigzag. При ежечасном обновлении обычный замер занимает 1 байт, а
+    серия замеров без изменений - один байт на всю серию.
+    """
+
+    def __init__(self, start_ts: int, start_count: int):
+        self.start_ts = start_ts
+        self.start_count = start_count
+        self.end_ts = start_ts
+        self.end_count = start_count
+        self.samples = 1
+        self._body = bytearray()
+        self._interval = 0
+        self._run = 0
+
+    @classmethod
+    def from_row(cls, start_ts: int, start_count: int, end_ts: int, end_count: int,
+                 samples: int, data: bytes) -> "SubscriberBlock":
+        block = cls(start_ts, start_count)
+        block.end_ts, block.end_count, block.samples = end_ts, end_count, samples
+        block._body = bytearray(data)
+        return block
+
+    def append(self, ts: int, count: int) -> None:
+        interval = ts - self.end_ts
+        change = count - self.end_count
+        if interval == self._interval and change == 0:
+            self._run += 1
+        else:
+            self._flush_run()
+            if interval == self._interval:
+                _write_varint(self._body, _zigzag(change) << 2 | _REGULAR)
+            else:
+                _write_varint(self._body, _zigzag(change) << 2 | _IRREGULAR)
+                _write_varint(self._body, _zigzag(interval - self._interval))
+        self._interval = interval
+        self.end_ts, self.end_count = ts, count
+        self.samples += 1
+
+    def _flush_run(self) -> None:
+        if self._run:
+            _write_varint(self._body, self._run << 2 | _RUN)
+            self._run = 0
+
+    @property
+    def data(self) -> bytes:
+        """Закодированные замеры (без первого) вместе с незавершенной серией"""
+        if not self._run:
+            return bytes(self._body)
+        tail = bytearray()
+        _write_varint(tail, self._run << 2 | _RUN)
+        return bytes(self._body + tail)
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        ts, count, interval = self.start_ts, self.start_count, 0
+        yield ts, count
+        data, pos = self.data, 0
+        while pos < len(data):
+            header, pos = _read_varint(data, pos)
+            kind, value = header & 3, header >> 2
+            if kind == _RUN:
+                for _ in range(value):
+                    ts += interval
+                    yield ts, count
+                continue
+            if kind == _IRREGULAR:
+                change, pos = _read_varint(data, pos)
+                interval += _unzigzag(change)
+            ts += interval
+            count += _unzigzag(value)
+            yield ts, count
+
+
+class SubscriberSeries:
+    """История подписчиков канала: цепочка блоков, упорядоченная по времени.
+
+    Заполнен только последний блок, остальные не меняются. Запрос по
+    времени находит блок бинарным поиском по началам блоков и
+    раскодирует только его; блоки, целиком попавшие в один интервал
+    прореживания, не раскодируются вовсе.
+    """
+
+    def __init__(self, block_size: int = BLOCK_SIZE):
+        self.block_size = block_size
+        self.blocks: List[SubscriberBlock] = []
+        self._starts: List[int] = []
+
+    def __len__(self) -> int:
+        return sum(block.samples for block in self.blocks)
+
+    @property
+    def nbytes(self) -> int:
+        """Размер закодированной истории в байтах (без заголовков блоков)"""
+        return sum(len(block.data) for block in self.blocks)
+
+    @property
+    def last(self) -> Optional[Tuple[int, int]]:
+        return (self.blocks[-1].end_ts, self.blocks[-1].end_count) if self.blocks else None
+
+    def load_block(self, block: SubscriberBlock) -> None:
+        """Добавляет блок, прочитанный из базы (блоки идут по возрастанию времени)"""
+        self.blocks.append(block)
+        self._starts.append(block.start_ts)
+
+    def reopen(self) -> None:
+        """Восстанавливает состояние кодировщика последнего блока после загрузки"""
+        if not self.blocks or self.blocks[-1].samples >= self.block_size:
+            return
+        samples = iter(self.blocks[-1])
+        tail = SubscriberBlock(*next(samples))
+        for ts, count in samples:
+            tail.append(ts, count)
+        self.blocks[-1] = tail
+
+    def append(self, ts: float, count: int) -> List[SubscriberBlock]:
+        """Добавляет замер и возвращает изменившиеся блоки (замеры из прошлого пропускаются)"""
+        ts = int(ts) // RESOLUTION * RESOLUTION
+        if self.blocks and ts < self.blocks[-1].end_ts:
+            return []
+        if not self.blocks or self.blocks[-1].samples >= self.block_size:
+            block = SubscriberBlock(ts, count)
+            self.load_block(block)
+            return [block]
+        self.blocks[-1].append(ts, count)
+        return [self.blocks[-1]]
+
+    def value_at(self, ts: float) -> Optional[int]:
+        """Число подписчиков по последнему замеру не позже ts (None, если замеров еще не было)"""
+        index = bisect_right(self._starts, ts) - 1
+        if index < 0:
+            return None
+        block = self.blocks[index]
+        if ts >= block.end_ts:
+            return block.end_count
+        value = block.start_count
+        for sample_ts, count in block:
+            if sample_ts > ts:
+                break
+            value = count
+        return value
+
+    def samples(self, start: float, end: float) -> Iterator[Tuple[int, int]]:
+        """Замеры в интервале [start, end]"""
+        index = max(0, bisect_right(self._starts, start) - 1)
+        for block in self.blocks[index:]:
+            if block.start_ts > end:
+                return
+            if block.end_ts < start:
+                continue
+            for ts, count in block:
+                if ts > end:
+                    return
+                if ts >= start:
+                    yield ts, count
+
+    def downsample(self, start: float, end: float, step: float) -> List[Tuple[float, int]]:
+        """Последний замер в каждом интервале длины step от start до end (пустые интервалы пропускаются)"""
+        result: List[Tuple[float, int]] = []
+
+        def put(bucket: float, count: int) -> None:
+            if result and result[-1][0] == bucket:
+                result[-1] = (bucket, count)
+            else:
+                result.append((bucket, count))
+
+        index = max(0, bisect_right(self._starts, start) - 1)
+        for block in self.blocks[index:]:
+            if block.start_ts > end:
+                break
+            if block.end_ts < start:
+                continue
+            first = start + (block.start_ts - start) // step * step
+            if block.start_ts >= start and block.end_ts <= end and first + step > block.end_ts:
+                put(first, block.end_count)
+                continue
+            for ts, count in block:
+                if ts > end:
+                    break
+                if ts >= start:
+                    put(start + (ts - start) // step * step, count)
+        return result
+
+    def delta(self, days: int, now: float) -> Optional[int]:
+        """Прирост подписчиков за days дней до now (None, если замеров за период нет)"""
+        start = now - days * DAY
+        if not self.blocks or self.blocks[-1].end_ts < start:
+            return None
+        base = self.value_at(start)
+        if base is None:
+            base = self.blocks[0].start_count
+        return self.blocks[-1].end_count - base
+
+    def trim(self, cutoff: float) -> Optional[int]:
+        """Удаляет блоки, не нужные для запросов после cutoff; возвращает начало первого оставшегося блока"""
+        keep = max(0, bisect_right(self._starts, cutoff) - 1)
+        if not keep:
+            return None
+        del self.blocks[:keep]
+        del self._starts[:keep]
+        return self._starts[0]
@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import logging
+import time
+from bisect import bisect_right
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Точек на кольце на одну сессию: чем больше, тем ровнее делятся каналы
+REPLICAS = 64
+
+
+def flood_wait_seconds(error: Exception) -> Optional[int]:
+    """Сколько ждать при FloodWait (None, если ошибка другая)"""
+    seconds = getattr(error, "seconds", None)
+    if type(error).__name__.startswith("FloodWait") and seconds is not None:
+        return int(seconds)
+    return None
+
+
+def _ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class PoolSession:
+    """Клиент Telethon в пуле и его счетчики"""
+
+    def __init__(self, name: str, client, concurrency: int):
+        self.name = name
+        self.client = client
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.cooldown_until = 0.0
+        self.in_flight = 0
+        self.requests = 0
+        self.flood_waits = 0
+        self.errors = 0
+        self.share = 0.0  # доля каналов, закрепленных за сессией
+
+    def available(self, now: float) -> bool:
+        return now >= self.cooldown_until
+
+
+class ClientPool:
+    """Несколько авторизованных сессий Telethon для чтения каналов.
+
+    Каналы закрепляются за сессиями согласованным хешированием: сессия
+    канала - первая по кольцу после хеша его chat_id. Так канал всегда
+    читается одной сессией (ее кэш сущностей остается теплым), а при
+    добавлении сессии переезжает только ~1/n каналов. Сессия, получившая
+    FloodWait, уходит на паузу на указанное время, и ее каналы читаются
+    следующими по кольцу сессиями. Одновременно на сессию идет не больше
+    concurrency запросов, поэтому пропускная способность растет с числом
+    сессий.
+    """
+
+    def __init__(self, clients: Dict[str, Any], concurrency: int = 4):
+        if not clients:
+            raise ValueError("В пуле Telethon должна быть хотя бы одна сессия")
+        self.sessions = {name: PoolSession(name, client, concurrency) for name, client in clients.items()}
+        ring = sorted((_ring_hash(f"{name}#{replica}"), name) for name in self.sessions for replica in range(REPLICAS))
+        self._ring_keys = [key for key, _ in ring]
+        self._ring_names = [name for _, name in ring]
+
+        # Доля кольца, которую покрывает каждая сессия (дуга от предыдущей точки)
+        previous = self._ring_keys[-1] - 2 ** 64
+        for key, name in ring:
+            self.sessions[name].share += (key - previous) / 2 ** 64
+            previous = key
+
+    @classmethod
+    def from_config(cls, settings: dict, api_id, api_hash) -> "ClientPool":
+        """Пул из файлов сессий settings["SESSIONS"] (telethon импортируется только здесь)"""
+        from telethon import TelegramClient
+
+        # Иначе Telethon молча спит внутри запроса при FloodWait до 60 с (flood_sleep_threshold
+        # по умолчанию), держа слот сессии, и пул не переводит каналы на другие сессии
+        return cls(
+            {name: TelegramClient(name, api_id, api_hash,
+                                  flood_sleep_threshold=settings.get("FLOOD_SLEEP_THRESHOLD", 0))
+             for name in settings["SESSIONS"]},
+            settings["CONCURRENCY"]
+        )
+
+    def _preference(self, chat_id) -> List[PoolSession]:
+        """Сессии в порядке обхода кольца от хеша канала"""
+        start = bisect_right(self._ring_keys, _ring_hash(str(chat_id)))
+        order: List[PoolSession] = []
+        for offset in range(len(self._ring_names)):
+            session = self.sessions[self._ring_names[(start + offset) % len(self._ring_names)]]
+            if session not in order:
+                order.append(session)
+                if len(order) == len(self.sessions):
+                    break
+        return order
+
+    def session_for(self, chat_id, now: Optional[float] = None) -> PoolSession:
+        """Первая доступная сессия канала; если все на паузе - та, что освободится раньше"""
+        now = time.time() if now is None else now
+        order = self._preference(chat_id)
+        for session in order:
+            if session.available(now):
+                return session
+        return min(order, key=lambda session: session.cooldown_until)
+
+    def client_for(self, chat_id):
+        return self.session_for(chat_id).client
+
+    def cooldown(self, session: PoolSession, seconds: float) -> None:
+        """Ставит сессию на паузу после FloodWait"""
+        session.flood_waits += 1
+        session.cooldown_until = max(session.cooldown_until, time.time() + seconds)
+        logger.warning(f"FloodWait у сессии {session.name}: пауза {seconds} с, каналы переходят к другим сессиям")
+
+    async def call(self, chat_id, request: Callable[[Any], Awaitable]):
+        """Выполняет request(client) на сессии канала; при FloodWait повторяет на следующей.
+
+        Если на паузе все сессии, ждет ближайшую. Прочие ошибки пробрасываются.
+        """
+        while True:
+            session = self.session_for(chat_id)
+            wait = session.cooldown_until - time.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            async with session.semaphore:
+                # Пока запрос ждал очереди, сессия могла уйти на паузу
+                if not session.available(time.time()):
+                    continue
+                session.in_flight += 1
+                session.requests += 1
+                try:
+                    return await request(session.client)
+                except Exception as e:
+                    seconds = flood_wait_seconds(e)
+                    if seconds is None:
+                        session.errors += 1
+                        raise
+                    self.cooldown(session, seconds)
+                finally:
+                    session.in_flight -= 1
+
+    def health(self) -> List[dict]:
+        """Состояние и нагрузка каждой сессии"""
+        now = time.time()
+        return [
+            {
+                "name": session.name,
+                "available": session.available(now),
+                "cooldown": max(0.0, session.cooldown_until - now),
+                "in_flight": session.in_flight,
+                "requests": session.requests,
+                "flood_waits": session.flood_waits,
+                "errors": session.errors,
+                "share": session.share,
+            }
+            for session in self.sessions.values()
+        ]
+
+    def dump_state(self) -> dict:
+        """Паузы сессий после FloodWait: после перезапуска они продолжают действовать"""
+        return {name: session.cooldown_until for name, session in self.sessions.items() if session.cooldown_until}
+
+    def load_state(self, state: dict) -> None:
+        for name, cooldown_until in state.items():
+            if name in self.sessions:
+                self.sessions[name].cooldown_until = max(self.sessions[name].cooldown_until, cooldown_until)
+
+    async def start(self) -> None:
+        for session in self.sessions.values():
+            await session.client.start()
+
+    async def disconnect(self) -> None:
+        for session in self.sessions.values():
+            try:
+                await session.client.disconnect()
+            except Exception as e:
+                logger.error(f"Ошибка при отключении сессии {session.name}: {e}")